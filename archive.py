@@ -0,0 +1,331 @@
+"""Архивация старых сессий: один сжатый файл на месяц вместо тысяч пар CSV
+
+    python archive.py --days 30 [--samples samples]
+
+Формат файла samples/archive/sessions_YYYY-MM.baa:
+    заголовок: b'BAAR', версия (u8), смещение индекса (u64 LE), длина индекса (u32 LE)
+    блоки: для каждой сессии отдельно best и history — zlib от подряд записанных
+           колонок (колоночный формат, типы как в ingest.py)
+    индекс: zlib(JSON) {ID: {'mtime', 'best': блок, 'history': блок}},
+            блок — {'offset', 'length', 'rows', 'columns': [[имя, dtype], ...]}
+Любой сессии хватает одного seek и одного чтения; сводке для каталога —
+только блока best и числа строк истории из индекса.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ingest import BEST_COLUMNS, HISTORY_METRICS, read_best, read_history
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+ARCHIVE_MAGIC = b'BAAR'
+ARCHIVE_VERSION = 1
+ARCHIVE_HEADER = struct.Struct('<4sBQI')
+ARCHIVE_DIR = "archive"
+ARCHIVE_PATTERN = "sessions_*.baa"
+
+# Типы строк best_bpm_ur хранятся кодами uint8
+BEST_TYPES = ('BPM', 'UR', 'ZX')
+
+COMPRESS_LEVEL = 6
+
+
+def month_of(session_id):
+    """Месяц сессии по ее ID (Unix timestamp)"""
+    return datetime.fromtimestamp(int(session_id)).strftime("%Y-%m")
+
+
+def archive_path(samples_dir, month):
+    return Path(samples_dir) / ARCHIVE_DIR / f"sessions_{month}.baa"
+
+
+def _encode_frame(df, attrs=None):
+    """DataFrame -> (сжатый блок, описание колонок)"""
+    columns = []
+    buffers = []
+    for name in df.columns:
+        values = df[name]
+        if name == 'Type':
+            values = pd.Categorical(values.astype(str), categories=BEST_TYPES)
+            if (values.codes < 0).any():
+                raise ValueError(f"Неизвестный тип в best_bpm_ur: {set(df['Type'].astype(str)) - set(BEST_TYPES)}")
+            array = values.codes.astype(np.uint8)
+        else:
+            array = np.ascontiguousarray(values.to_numpy())
+        columns.append([name, array.dtype.str])
+        buffers.append(array.tobytes())
+    meta = {'rows': len(df), 'columns': columns}
+    if attrs:
+        meta['attrs'] = dict(attrs)
+    return zlib.compress(b''.join(buffers), COMPRESS_LEVEL), meta
+
+
+def _decode_frame(raw, meta):
+    """Сжатый блок -> DataFrame с исходными типами"""
+    buffer = zlib.decompress(raw)
+    rows = meta['rows']
+    data = {}
+    offset = 0
+    for name, dtype in meta['columns']:
+        dtype = np.dtype(dtype)
+        array = np.frombuffer(buffer, dtype=dtype, count=rows, offset=offset)
+        offset += rows * dtype.itemsize
+        if name == 'Type':
+            data[name] = pd.Categorical.from_codes(array.astype(np.int8), categories=BEST_TYPES)
+        else:
+            data[name] = array
+    df = pd.DataFrame(data)
+    df.attrs.update(meta.get('attrs', {}))
+    return df
+
+
+class ArchiveFile:
+    """Месячный архив сессий с ленивым перечитыванием индекса
+
+    Индекс держится в памяти и перечитывается, только если файл на диске
+    заменили (архивация и удаление переписывают его атомарно через os.replace).
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._index = {}
+
+    @staticmethod
+    def _file_stamp(f):
+        stat = os.fstat(f.fileno())
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _load_index(self, f):
+        stamp = self._file_stamp(f)
+        if stamp == self._stamp:
+            return
+        f.seek(0)
+        magic, version, index_offset, index_length = ARCHIVE_HEADER.unpack(f.read(ARCHIVE_HEADER.size))
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            raise ValueError(f"Неверный формат архива {self.path}")
+        f.seek(index_offset)
+        self._index = json.loads(zlib.decompress(f.read(index_length)))
+        self._stamp = stamp
+
+    def entries(self):
+        """{ID: запись индекса} для всех сессий архива"""
+        with self._lock, open(self.path, 'rb') as f:
+            self._load_index(f)
+            return dict(self._index)
+
+    def _read_block(self, session_id, section):
+        with self._lock, open(self.path, 'rb') as f:
+            # Блок читаем из того же открытого файла, по которому сверен индекс
+            self._load_index(f)
+            entry = self._index.get(str(session_id))
+            if entry is None:
+                raise KeyError(session_id)
+            block = entry.get(section)
+            if block is None:
+                return None, None
+            f.seek(block['offset'])
+            return f.read(block['length']), block
+
+    def read_best(self, session_id):
+        raw, meta = self._read_block(session_id, 'best')
+        return None if raw is None else _decode_frame(raw, meta)
+
+    def read_history(self, session_id):
+        raw, meta = self._read_block(session_id, 'history')
+        return None if raw is None else _decode_frame(raw, meta)
+
+    def read_raw(self, session_id):
+        """Запись индекса и сжатые блоки сессии как есть (для перезаписи архива)"""
+        with self._lock, open(self.path, 'rb') as f:
+            self._load_index(f)
+            entry = self._index[str(session_id)]
+            blocks = {}
+            for section in ('best', 'history'):
+                if entry.get(section) is not None:
+                    f.seek(entry[section]['offset'])
+                    blocks[section] = f.read(entry[section]['length'])
+            return entry, blocks
+
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+def open_archive(path):
+    """Общий объект ArchiveFile на путь (индекс кешируется между вызовами)"""
+    path = str(path)
+    with _archives_lock:
+        archive = _archives.get(path)
+        if archive is None:
+            archive = _archives[path] = ArchiveFile(path)
+        return archive
+
+
+def write_archive(path, sessions):
+    """Атомарная запись архива
+
+    sessions: {ID: (запись индекса, {'best': блок, 'history': блок})}, где блоки
+    уже сжаты; смещения в записях пересчитываются.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    index = {}
+    with open(tmp_path, 'wb') as f:
+        f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, 0, 0))
+        for session_id in sorted(sessions, key=int):
+            entry, blocks = sessions[session_id]
+            entry = dict(entry)
+            for section in ('best', 'history'):
+                block = blocks.get(section)
+                if block is None:
+                    entry[section] = None
+                    continue
+                entry[section] = dict(entry[section], offset=f.tell(), length=len(block))
+                f.write(block)
+            index[str(session_id)] = entry
+        index_raw = zlib.compress(json.dumps(index).encode(), COMPRESS_LEVEL)
+        index_offset = f.tell()
+        f.write(index_raw)
+        f.seek(0)
+        f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, index_offset, len(index_raw)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class _ArchiveLock:
+    """Межпроцессная блокировка записи архивов (монитор и команда архивации)"""
+
+    def __init__(self, samples_dir):
+        self.path = Path(samples_dir) / ARCHIVE_DIR / ".lock"
+        self._file = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+def _existing_sessions(path):
+    """Сессии уже записанного архива в виде для write_archive"""
+    if not os.path.exists(path):
+        return {}
+    archive = open_archive(path)
+    return {session_id: archive.read_raw(session_id) for session_id in archive.entries()}
+
+
+def pack_csv_pair(best_path, history_path):
+    """Пара CSV -> (запись индекса, сжатые блоки)"""
+    entry = {'mtime': 0, 'best': None, 'history': None}
+    blocks = {}
+    if best_path and os.path.exists(best_path):
+        blocks['best'], entry['best'] = _encode_frame(read_best(best_path)[list(BEST_COLUMNS)])
+        entry['mtime'] = max(entry['mtime'], os.path.getmtime(best_path))
+    if history_path and os.path.exists(history_path):
+        history = read_history(history_path)
+        blocks['history'], entry['history'] = _encode_frame(
+            history[['Press', 'Interval_ms', *HISTORY_METRICS]], history.attrs)
+        entry['mtime'] = max(entry['mtime'], os.path.getmtime(history_path))
+    return entry, blocks
+
+
+def archive_sessions(samples_dir="samples", older_than_days=30, now=None):
+    """Перенос пар CSV старше older_than_days в месячные архивы
+
+    CSV удаляются только после атомарной записи архива. mtime пары
+    сохраняется в индексе, поэтому каталог монитора сессию не переиндексирует.
+    """
+    samples_dir = Path(samples_dir)
+    cutoff = (now or time.time()) - older_than_days * 86400
+    by_month = {}
+    for path in glob.glob(str(samples_dir / "*.csv")):
+        match = re.search(r'(best_bpm_ur|stats_history)_(\d+)\.csv$', path)
+        if not match or int(match.group(2)) >= cutoff:
+            continue
+        session_id = match.group(2)
+        pair = by_month.setdefault(month_of(session_id), {}).setdefault(session_id, {'best': None, 'history': None})
+        pair['best' if match.group(1) == 'best_bpm_ur' else 'history'] = path
+
+    archived = 0
+    with _ArchiveLock(samples_dir):
+        for month, pairs in sorted(by_month.items()):
+            path = archive_path(samples_dir, month)
+            sessions = _existing_sessions(path)
+            packed = []
+            for session_id, pair in pairs.items():
+                try:
+                    sessions[session_id] = pack_csv_pair(pair['best'], pair['history'])
+                    packed.append(pair)
+                except Exception as e:
+                    print(f"Пропуск сессии {session_id}: {e}")
+            if not packed:
+                continue
+            write_archive(path, sessions)
+            for pair in packed:
+                for file_path in (pair['best'], pair['history']):
+                    if file_path:
+                        os.remove(file_path)
+            archived += len(packed)
+            print(f"{path.name}: добавлено {len(packed)}, всего {len(sessions)} сессий")
+    return archived
+
+
+def remove_session(samples_dir, archive_file, session_id):
+    """Удаление сессии из архива (файл перезаписывается без нее)"""
+    return bool(remove_sessions(samples_dir, archive_file, [session_id]))
+
+
+def remove_sessions(samples_dir, archive_file, session_ids):
+    """Удаление нескольких сессий из одного архива за одну перезапись
+
+    Возвращает множество ID, которые действительно были в архиве.
+    """
+    with _ArchiveLock(samples_dir):
+        sessions = _existing_sessions(archive_file)
+        removed = {str(session_id) for session_id in session_ids if sessions.pop(str(session_id), None)}
+        if not removed:
+            return removed
+        if sessions:
+            write_archive(archive_file, sessions)
+        else:
+            os.remove(archive_file)
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', default='samples', help='папка с CSV сессий')
+    parser.add_argument('--days', type=int, default=30, help='архивировать сессии старше стольких дней')
+    args = parser.parse_args()
+    archived = archive_sessions(args.samples, args.days)
+    print(f"Заархивировано сессий: {archived}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""Офлайн бенчмарки Python-части анализатора
+
+    python bench.py ingest --sessions 200 --presses 5000
+    python bench.py coalesce --clients 10 --sessions 8
+    python bench.py summary --sessions 500
+    python bench.py segments --presses 1000000
+    python bench.py sketch --sessions 2000
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import ingest
+from catalog import RECORD_WINDOW_SIZES, SessionCatalog
+from quantiles import KLLSketch
+from segments import distorted_mask, interval_jitter, segment_history, segments_payload
+from summary import SessionSummary
+
+
+# Размеры окон, как в src/export.rs
+WIN_SIZES = [20, 40, 60, 80, 100, 120, 140, 160, 180, 200,
+             250, 300, 350, 400, 450, 500, 600, 700, 800, 900, 1000, 1500, 2000]
+
+
+def window_stats(intervals, is_z, window):
+    """BPM/UR/ZX всех окон заданного размера (как calc_stats_windows с шагом 1)"""
+    sums = np.convolve(intervals, np.ones(window), 'valid')
+    sq_sums = np.convolve(intervals.astype(np.float64) ** 2, np.ones(window), 'valid')
+    z_sums = np.convolve(np.where(is_z, intervals, 0), np.ones(window), 'valid')
+    avg = sums // window
+    sq_dev = sq_sums - 2 * avg * sums + window * avg ** 2
+    ur = np.sqrt(np.maximum(sq_dev, 0) / (window - 1)) * 10.0
+    with np.errstate(divide='ignore'):
+        bpm = np.where(avg > 0, 60000.0 / avg / 4.0, 0.0)
+    zx = (sums - z_sums) / sums - 0.5
+    return bpm, ur, zx
+
+
+def write_synthetic_session(samples_dir, session_id, presses, rng, base_interval=None):
+    """Пара CSV в формате src/export.rs со случайными интервалами"""
+    samples_dir = Path(samples_dir)
+    base_interval = base_interval or rng.choice([55, 60, 65, 70, 75])
+    intervals = np.maximum(20, rng.normal(base_interval, 8, presses)).astype(np.int64)
+    is_z = np.arange(presses) % 2 == 0
+
+    with open(samples_dir / f"best_bpm_ur_{session_id}.csv", 'w') as f:
+        f.write("Window Size,Type,BPM,UR,ZX\n")
+        for win_size in WIN_SIZES:
+            if presses <= win_size:
+                continue
+            bpm, ur, zx = window_stats(intervals, is_z, win_size)
+            for type_name, idx in (('BPM', np.argmax(bpm)), ('UR', np.argmin(ur)), ('ZX', np.argmin(np.abs(zx)))):
+                f.write(f"{win_size},{type_name},{bpm[idx]:.3f},{ur[idx]:.3f},{zx[idx] * 100:.3f}\n")
+
+    bpm, ur, zx = window_stats(intervals, is_z, 8)
+    with open(samples_dir / f"stats_history_{session_id}.csv", 'w') as f:
+        f.write("Press,Interval_ms,BPM_avg8,UR_avg8,ZX_avg8\n")
+        for i in range(presses):
+            if i >= 7:
+                f.write(f"{i + 1},{intervals[i]},{bpm[i - 7]:.3f},{ur[i - 7]:.3f},{zx[i - 7] * 100:.3f}\n")
+            else:
+                f.write(f"{i + 1},{intervals[i]},,,\n")
+
+
+def make_samples(samples_dir, sessions, presses, seed=0, first_id=1_700_000_000):
+    """Синтетическая папка samples/ на sessions сессий"""
+    rng = np.random.default_rng(seed)
+    Path(samples_dir).mkdir(parents=True, exist_ok=True)
+    ids = []
+    for i in range(sessions):
+        session_id = first_id + i * 3600
+        write_synthetic_session(samples_dir, session_id, presses, rng)
+        ids.append(session_id)
+    return ids
+
+
+def _throughput(label, paths, read_fn, repeats):
+    total_bytes = sum(p.stat().st_size for p in paths)
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for path in paths:
+            read_fn(path)
+        best = min(best, time.perf_counter() - start)
+    mb = total_bytes / 1024 / 1024
+    print(f"{label:<32} {mb:8.1f} MB  {best:7.3f} s  {mb / best:8.1f} MB/s")
+
+
+def bench_ingest(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        make_samples(tmp, args.sessions, args.presses)
+        history_paths = sorted(Path(tmp).glob("stats_history_*.csv"))
+
+        def legacy_read(path):
+            # Старый путь: вывод типов при чтении + to_numeric при каждом рисовании
+            df = pd.read_csv(path)
+            stats = df[df['BPM_avg8'] != ''].copy()
+            for column in ('BPM_avg8', 'UR_avg8', 'ZX_avg8'):
+                stats[column] = pd.to_numeric(stats[column])
+            return stats
+
+        print(f"История: {len(history_paths)} файлов по {args.presses} нажатий")
+        _throughput("pd.read_csv (вывод типов)", history_paths, legacy_read, args.repeats)
+        _throughput("ingest.read_history [авто]", history_paths, ingest.read_history, args.repeats)
+
+        engine, min_bytes = ingest.CSV_ENGINE, ingest.PYARROW_MIN_BYTES
+        ingest.CSV_ENGINE = 'c'
+        _throughput("ingest.read_history [c]", history_paths, ingest.read_history, args.repeats)
+        if engine == 'pyarrow':
+            ingest.CSV_ENGINE, ingest.PYARROW_MIN_BYTES = 'pyarrow', 0
+            _throughput("ingest.read_history [pyarrow]", history_paths, ingest.read_history, args.repeats)
+        else:
+            print("pyarrow не установлен — движок pyarrow пропущен")
+        ingest.CSV_ENGINE, ingest.PYARROW_MIN_BYTES = engine, min_bytes
+
+
+def bench_coalesce(args):
+    """N клиентов одновременно опрашивают /api/data, пока все графики не готовы
+
+    Время до готовности страницы и число рендеров и вычислений ответов.
+    Ровно один рендер на версию проверяет tests/test_render_queue.py.
+    """
+    import gui
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_samples(Path(tmp) / "samples", args.sessions, args.presses)
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        monitor = None
+        try:
+            monitor = gui.WebCSVMonitor(args.port, open_browser=False, peers_file="")
+            deadline = time.time() + 60
+            while monitor.catalog.count_sessions() < args.sessions and time.time() < deadline:
+                time.sleep(0.2)
+
+            renders = Counter()
+            renders_lock = threading.Lock()
+            create_plot_image = monitor.create_plot_image
+
+            def counting_render(data, filename):
+                with renders_lock:
+                    renders[(data['id'], data['mtime'])] += 1
+                return create_plot_image(data, filename)
+
+            monitor.create_plot_image = counting_render
+            url = f"http://localhost:{args.port}/api/data?limit={args.sessions}"
+            barrier = threading.Barrier(args.clients)
+            polls = Counter()
+
+            def client(index):
+                barrier.wait()
+                while time.time() < deadline + 120:
+                    try:
+                        with urllib.request.urlopen(url) as response:
+                            data = json.loads(response.read())
+                    except OSError as e:
+                        print(f"Клиент {index}: ошибка запроса: {e}")
+                        return
+                    polls[index] += 1
+                    if not any(plot['pending'] for plot in data['plots']):
+                        return
+                    time.sleep(args.interval)
+
+            started = time.perf_counter()
+            threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            flights = monitor.flights.stats()
+            print(f"Клиентов: {args.clients}, сессий: {args.sessions}, опросов: {sum(polls.values())}, "
+                  f"за {elapsed:.2f} с")
+            print(f"Рендеров: {sum(renders.values())} на {len(renders)} версий сессий, "
+                  f"максимум на версию: {max(renders.values(), default=0)}")
+            print(f"Вычислений ответов: {flights['executed']}, получили готовый: {flights['shared']}")
+        finally:
+            if monitor is not None:
+                monitor.monitoring = False
+                monitor.live_server.stop()
+                monitor.render_scheduler.stop()
+            os.chdir(cwd)
+
+
+def legacy_split_best(best_df):
+    """Прежнее хранение лучших окон: три DataFrame-среза одной таблицы"""
+    best_df = best_df.sort_values('Type', kind='stable')
+    types = best_df['Type'].to_numpy()
+
+    def type_slice(type_name):
+        positions = (types == type_name).nonzero()[0]
+        if len(positions) == 0:
+            return best_df.iloc[0:0]
+        return best_df.iloc[positions[0]:positions[-1] + 1]
+
+    return {'bpm_data': type_slice('BPM'), 'ur_data': type_slice('UR'), 'xz_data': type_slice('ZX'),
+            'source': best_df}
+
+
+def _measure(label, build, derive, items, repeats):
+    """Память, оставшаяся после построения структур, и стоимость производных значений на опрос"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    built = [build(item) for item in items]
+    build_s = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for value in built:
+            derive(value)
+        best = min(best, time.perf_counter() - start)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    count = len(items)
+    print(f"{label:<28} {retained / count / 1024:8.1f} KiB/сессия  построение {build_s / count * 1e6:8.1f} мкс  "
+          f"опрос {best / count * 1e6:8.2f} мкс/сессия  пик опроса {(peak - before) / 1024:8.1f} KiB")
+    return built
+
+
+def bench_summary(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        make_samples(tmp, args.sessions, args.presses)
+        frames = [ingest.read_best(path) for path in sorted(Path(tmp).glob("best_bpm_ur_*.csv"))]
+
+    def legacy_derive(best_data):
+        # Как раньше на каждый опрос: фильтр по окну и среднее по столбцу
+        ur_data = best_data['ur_data']
+        for window_size in RECORD_WINDOW_SIZES:
+            ur = ur_data[ur_data['Window Size'] == window_size]['UR']
+            _ = None if ur.empty else float(ur.iloc[0])
+        _ = float(best_data['bpm_data']['BPM'].astype('float64').round(3).mean())
+
+    def summary_derive(summary):
+        for window_size in RECORD_WINDOW_SIZES:
+            summary.ur_at(window_size)
+        _ = summary.mean_bpm, summary.bpm_bucket
+
+    print(f"Лучшие окна: {len(frames)} сессий по {len(frames[0])} строк")
+    _measure("DataFrame (split_best)", legacy_split_best, legacy_derive, frames, args.repeats)
+    _measure("SessionSummary", lambda df: SessionSummary.from_best_df('0', 0, df, args.presses),
+             summary_derive, frames, args.repeats)
+
+
+def bench_segments(args):
+    rng = np.random.default_rng(0)
+    intervals = rng.normal(65, 8, args.presses).clip(20)
+    # Паузы от 1 до 60 с в случайных местах
+    pauses = rng.choice(args.presses, args.pauses, replace=False)
+    intervals[pauses] = rng.uniform(1000, 60000, args.pauses)
+    zx = rng.normal(0, 5, args.presses)
+
+    def best_time(fn):
+        best = float('inf')
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - start)
+        return result, best
+
+    (streams, break_ms), segment_s = best_time(lambda: segment_history(intervals, zx))
+    _, mask_s = best_time(lambda: distorted_mask(intervals, break_ms, 8))
+    payload, payload_s = best_time(lambda: segments_payload(streams, break_ms))
+    print(f"{args.presses} нажатий, {args.pauses} пауз: порог {break_ms:.1f} мс, {len(streams)} серий "
+          f"(коротких {payload['short_streams']})")
+    print(f"segment_history  {segment_s * 1000:8.2f} мс")
+    print(f"distorted_mask   {mask_s * 1000:8.2f} мс")
+    print(f"segments_payload {payload_s * 1000:8.2f} мс")
+
+
+def bench_sketch(args):
+    """Скетчи каталога против точных распределений: ошибка ранга, размер, время запроса"""
+    rng = np.random.default_rng(0)
+    catalog = SessionCatalog(":memory:")
+    exact_ur = []
+    exact_jitter = []
+    start = time.perf_counter()
+    for index in range(args.sessions):
+        session_id = 1_700_000_000 + index * 3600
+        intervals = rng.normal(65, rng.uniform(5, 12), args.presses).clip(20)
+        ur = float(np.std(intervals[:200], ddof=1) * 10)
+        jitter = interval_jitter(intervals, 1000.0)
+        exact_ur.append(ur)
+        exact_jitter.append(jitter)
+        sketch = KLLSketch()
+        sketch.update_many(jitter)
+        catalog.upsert_session({'id': session_id, 'mtime': 1.0, 'mean_bpm': 230.0, 'press_count': args.presses,
+                                'best': [('UR', 200, 230.0, ur, 0.0)], 'sketches': {'jitter': sketch.to_bytes()}})
+    update_s = time.perf_counter() - start
+
+    exact_ur = np.sort(exact_ur)
+    exact_jitter = np.sort(np.concatenate(exact_jitter))
+    for metric, exact in (('ur_200', exact_ur), ('jitter', exact_jitter)):
+        sketch = catalog.distribution(metric, 230)
+        errors = [abs(np.searchsorted(exact, sketch.quantile(q)) / len(exact) - q) for q in np.linspace(0.01, 0.99, 99)]
+        start = time.perf_counter()
+        for _ in range(args.queries):
+            sketch.rank(exact[len(exact) // 3])
+        query_s = (time.perf_counter() - start) / args.queries
+        print(f"{metric:<7} значений {len(exact):>10}  скетч {len(sketch.to_bytes()) / 1024:6.1f} KiB "
+              f"(точно {exact.nbytes / 1024:9.1f} KiB)  ошибка ранга макс {max(errors) * 100:5.2f}%  "
+              f"запрос {query_s * 1e6:6.1f} мкс")
+    print(f"Добавление сессии с обновлением скетчей: {update_s / args.sessions * 1000:.2f} мс")
+    catalog.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='bench', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='скорость разбора stats_history (MB/s)')
+    ingest_parser.add_argument('--sessions', type=int, default=100)
+    ingest_parser.add_argument('--presses', type=int, default=5000)
+    ingest_parser.add_argument('--repeats', type=int, default=3)
+    ingest_parser.set_defaults(func=bench_ingest)
+
+    coalesce_parser = subparsers.add_parser('coalesce', help='одновременные опросы: рендеров на версию сессии')
+    coalesce_parser.add_argument('--clients', type=int, default=10)
+    coalesce_parser.add_argument('--sessions', type=int, default=8)
+    coalesce_parser.add_argument('--presses', type=int, default=2000)
+    coalesce_parser.add_argument('--interval', type=float, default=0.1, help='пауза между опросами клиента, с')
+    coalesce_parser.add_argument('--port', type=int, default=8765)
+    coalesce_parser.set_defaults(func=bench_coalesce)
+
+    summary_parser = subparsers.add_parser('summary', help='память и стоимость опроса: DataFrame против SessionSummary')
+    summary_parser.add_argument('--sessions', type=int, default=500)
+    summary_parser.add_argument('--presses', type=int, default=2500)
+    summary_parser.add_argument('--repeats', type=int, default=3)
+    summary_parser.set_defaults(func=bench_summary)
+
+    segments_parser = subparsers.add_parser('segments', help='разбиение истории на серии по паузам')
+    segments_parser.add_argument('--presses', type=int, default=1_000_000)
+    segments_parser.add_argument('--pauses', type=int, default=2000)
+    segments_parser.add_argument('--repeats', type=int, default=5)
+    segments_parser.set_defaults(func=bench_segments)
+
+    sketch_parser = subparsers.add_parser('sketch', help='квантильные скетчи каталога: точность и память')
+    sketch_parser.add_argument('--sessions', type=int, default=1000)
+    sketch_parser.add_argument('--presses', type=int, default=2000)
+    sketch_parser.add_argument('--queries', type=int, default=10000)
+    sketch_parser.set_defaults(func=bench_sketch)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Файлы кеша в папке cache/: запись с хешем содержимого и лимиты размера
+
+Текстовый файл кеша (base64 картинки) начинается строкой с sha256 самого
+текста:
+    <sha256 hex>\\n<base64>
+Запись атомарная (временный файл и os.replace), а при чтении хеш сверяется с
+содержимым: обрезанный или испорченный файл не отдается клиенту, даже если
+в нем целый PNG. Файлы прежнего формата без хеша считаются испорченными и
+перерисовываются.
+
+У каждого вида файлов свой лимит (prune_cache), чтобы графики рекордов и
+пирамиды не вытесняли графики сессий и наоборот.
+"""
+import hashlib
+import os
+
+
+RECORDS_PREFIX = "records_"
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def write_cache_text(path, text):
+    """Атомарная запись текста с хешем"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(f"{content_hash(text)}\n{text}")
+    os.replace(tmp_path, path)
+
+
+def read_cache_text(path):
+    """Текст файла кеша; ValueError — хеш не совпал с содержимым"""
+    with open(path, 'r') as f:
+        digest, _, text = f.read().partition('\n')
+    text = text.strip()
+    if digest != content_hash(text):
+        raise ValueError(f"хеш содержимого не совпадает: {path.name}")
+    return text
+
+
+def is_plot_file(name):
+    """График сессии: <ID>_<ключ>.txt"""
+    return name.endswith('.txt') and not name.startswith(RECORDS_PREFIX)
+
+
+def is_records_file(name):
+    return name.startswith(RECORDS_PREFIX) and name.endswith('.txt')
+
+
+def is_pyramid_file(name):
+    return name.endswith('.pyr')
+
+
+def prune_cache(cache_dir, max_files, match, batch=20):
+    """Удаление самых старых (по mtime) файлов вида match сверх max_files
+
+    Удаляется сразу на batch больше лишних, чтобы не сортировать папку после
+    каждой записи. Возвращает имена удаленных файлов.
+    """
+    entries = [entry for entry in os.scandir(cache_dir) if match(entry.name)]
+    if len(entries) <= max_files:
+        return []
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    # При маленьком лимите запас не должен съедать свежие файлы
+    batch = min(batch, max_files // 4)
+    removed = []
+    for entry in entries[:len(entries) - max_files + batch]:
+        try:
+            os.unlink(entry.path)
+            removed.append(entry.name)
+        except FileNotFoundError:
+            pass
+    return removed
@@ -0,0 +1,585 @@
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from quantiles import KLLSketch
+
+
+# Размеры окон, по которым строится таблица рекордов
+RECORD_WINDOW_SIZES = (100, 200, 500, 1000)
+
+# Допустимые сортировки списка сессий (все опираются на индексы)
+SESSION_SORTS = {
+    'newest': 'mtime DESC, id DESC',
+    'oldest': 'mtime ASC, id ASC',
+    'bpm_desc': 'mean_bpm DESC, id DESC',
+    'bpm_asc': 'mean_bpm ASC, id ASC',
+}
+
+
+# Распределения по BPM окнам: лучший UR сессии на окнах рекордов (значение на
+# сессию) и разброс интервалов (скетч истории сессии, см. segments.interval_jitter)
+HISTORY_SKETCH_METRICS = ('jitter',)
+SKETCH_METRICS = tuple(f'ur_{w}' for w in RECORD_WINDOW_SIZES) + HISTORY_SKETCH_METRICS
+
+# Периоды сводок прогресса и их длина в днях
+ROLLUP_PERIODS = {'day': 1, 'week': 7}
+
+
+def day_for(session_id):
+    """Локальная дата сессии по ее ID (Unix timestamp)"""
+    return datetime.fromtimestamp(int(session_id)).strftime("%Y-%m-%d")
+
+
+def period_start(day, period):
+    """Начало периода, в который попадает день: сам день или понедельник недели"""
+    if period == 'day':
+        return day
+    date = datetime.strptime(day, "%Y-%m-%d")
+    return (date - timedelta(days=date.weekday())).strftime("%Y-%m-%d")
+
+
+def bpm_bucket_for(mean_bpm):
+    """BPM окно сессии (шаг 10, центрированное)"""
+    if mean_bpm is None:
+        return None
+    return round(mean_bpm / 10) * 10
+
+
+class SessionCatalog:
+    """Локальный SQLite каталог со сводками по сессиям"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY,
+            created INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            mtime REAL NOT NULL,
+            name TEXT,
+            mean_bpm REAL,
+            bpm_bucket INTEGER,
+            press_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS session_best (
+            session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+            type TEXT NOT NULL,
+            window_size INTEGER NOT NULL,
+            bpm REAL,
+            ur REAL,
+            zx REAL,
+            PRIMARY KEY (session_id, type, window_size)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS rollups (
+            period TEXT NOT NULL,
+            start TEXT NOT NULL,
+            sessions INTEGER NOT NULL,
+            presses INTEGER NOT NULL,
+            best_bpm REAL,
+            mean_bpm REAL,
+            zx_balance REAL,
+            best_ur_100 REAL,
+            mean_ur_100 REAL,
+            best_ur_200 REAL,
+            mean_ur_200 REAL,
+            best_ur_500 REAL,
+            mean_ur_500 REAL,
+            best_ur_1000 REAL,
+            mean_ur_1000 REAL,
+            ur_sessions_100 INTEGER NOT NULL DEFAULT 0,
+            ur_sessions_200 INTEGER NOT NULL DEFAULT 0,
+            ur_sessions_500 INTEGER NOT NULL DEFAULT 0,
+            ur_sessions_1000 INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, start)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS tombstones (
+            id INTEGER PRIMARY KEY,
+            seq INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sync_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS sketches (
+            metric TEXT NOT NULL,
+            bpm_bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            sketch BLOB NOT NULL,
+            PRIMARY KEY (metric, bpm_bucket)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS session_sketches (
+            session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+            metric TEXT NOT NULL,
+            sketch BLOB NOT NULL,
+            PRIMARY KEY (session_id, metric)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_sessions_bucket ON sessions(bpm_bucket);
+        CREATE INDEX IF NOT EXISTS idx_sessions_day ON sessions(day);
+        CREATE INDEX IF NOT EXISTS idx_sessions_mtime ON sessions(mtime, id);
+        CREATE INDEX IF NOT EXISTS idx_sessions_bpm ON sessions(mean_bpm, id);
+        CREATE INDEX IF NOT EXISTS idx_best_window ON session_best(type, window_size);
+        CREATE INDEX IF NOT EXISTS idx_tombstones_seq ON tombstones(seq);
+    """
+
+    def __init__(self, db_path="catalog.sqlite3"):
+        self.db_path = str(db_path)
+        # Одно соединение на процесс, доступ из потоков сериализуем блокировкой
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # Разобранные скетчи BPM окон для запросов; растет при каждой их записи
+        self._sketch_cache = {}
+        self.sketch_version = 0
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._migrate_rollups()
+            self._conn.executescript(self.SCHEMA)
+            self._migrate_sync()
+            # Каталог из прошлой версии: сводки строим один раз по всем дням
+            has_sessions = self._conn.execute("SELECT 1 FROM sessions LIMIT 1").fetchone()
+            has_rollups = self._conn.execute("SELECT 1 FROM rollups LIMIT 1").fetchone()
+            if has_sessions and not has_rollups:
+                days = [r[0] for r in self._conn.execute("SELECT DISTINCT day FROM sessions")]
+                self._refresh_rollups(days)
+            # Скетчи UR строятся по лучшим окнам; скетчи истории — при переиндексации сессий монитором
+            has_sketches = self._conn.execute("SELECT 1 FROM sketches LIMIT 1").fetchone()
+            if has_sessions and not has_sketches:
+                buckets = {r[0] for r in self._conn.execute(
+                    "SELECT DISTINCT bpm_bucket FROM sessions WHERE bpm_bucket IS NOT NULL")}
+                self._refresh_sketches({}, buckets)
+
+    def _migrate_rollups(self):
+        """Сводки прошлой версии без числа сессий с UR пересобираются заново"""
+        columns = {r['name'] for r in self._conn.execute("PRAGMA table_info(rollups)")}
+        if columns and 'ur_sessions_100' not in columns:
+            self._conn.execute("DROP TABLE rollups")
+
+    def _migrate_sync(self):
+        """Номер изменения (seq) у каждой сессии для выдачи изменений по курсору
+
+        Каталогу из прошлой версии все сессии достаются с seq = 1. epoch
+        меняется при создании каталога заново, чтобы курсор от старого файла
+        не пропустил изменения нового.
+        """
+        columns = {r['name'] for r in self._conn.execute("PRAGMA table_info(sessions)")}
+        if 'seq' not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN seq INTEGER NOT NULL DEFAULT 1")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_seq ON sessions(seq)")
+        self._conn.execute("INSERT OR IGNORE INTO sync_meta VALUES ('epoch', ?)", (uuid.uuid4().hex[:12],))
+        self._conn.execute("INSERT OR IGNORE INTO sync_meta VALUES ('seq', '1')")
+
+    def next_boot(self):
+        """Номер запуска монитора: хранится в каталоге и растет при каждом вызове"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO sync_meta VALUES ('boot', '0')")
+            boot = int(self._conn.execute("SELECT value FROM sync_meta WHERE key = 'boot'").fetchone()[0]) + 1
+            self._conn.execute("UPDATE sync_meta SET value = ? WHERE key = 'boot'", (str(boot),))
+        return boot
+
+    def _next_seq(self, count):
+        """Резервирует count номеров изменений; возвращает первый (внутри транзакции)"""
+        last = int(self._conn.execute("SELECT value FROM sync_meta WHERE key = 'seq'").fetchone()[0])
+        self._conn.execute("UPDATE sync_meta SET value = ? WHERE key = 'seq'", (str(last + count),))
+        return last + 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def upsert_session(self, summary):
+        """Добавление или обновление сводки по сессии
+
+        summary: {'id', 'mtime', 'name', 'mean_bpm', 'press_count',
+                  'best': [(type, window_size, bpm, ur, zx), ...],
+                  'sketches': {метрика: KLLSketch.to_bytes()} — необязательно}
+        """
+        self.upsert_sessions([summary])
+
+    def upsert_sessions(self, summaries):
+        """Пакетное добавление или обновление сводок в одной транзакции"""
+        if not summaries:
+            return
+        with self._lock, self._conn:
+            seq = self._next_seq(len(summaries))
+            added = {}
+            rebuild = set()
+            for offset, summary in enumerate(summaries):
+                self._upsert(summary, seq + offset, added, rebuild)
+            self._refresh_rollups({day_for(summary['id']) for summary in summaries})
+            self._refresh_sketches(added, rebuild)
+
+    def _upsert(self, summary, seq, added, rebuild):
+        """Запись сводки; added и rebuild собирают изменения скетчей BPM окон
+
+        Новая сессия добавляется в скетчи своего окна (added), а измененная
+        требует пересборки старого и нового окна (rebuild): из скетча нельзя
+        убрать значение.
+        """
+        session_id = int(summary['id'])
+        created = session_id
+        day = day_for(session_id)
+        mean_bpm = summary.get('mean_bpm')
+        bucket = bpm_bucket_for(mean_bpm)
+        previous = self._conn.execute(
+            "SELECT mtime, bpm_bucket FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        self._conn.execute(
+            """
+            INSERT INTO sessions (id, created, day, mtime, name, mean_bpm, bpm_bucket, press_count, seq)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                mtime = excluded.mtime,
+                name = COALESCE(excluded.name, sessions.name),
+                mean_bpm = excluded.mean_bpm,
+                bpm_bucket = excluded.bpm_bucket,
+                press_count = excluded.press_count,
+                seq = excluded.seq
+            """,
+            (session_id, created, day, summary.get('mtime', 0), summary.get('name'),
+             mean_bpm, bucket, summary.get('press_count', 0), seq),
+        )
+        self._conn.execute("DELETE FROM tombstones WHERE id = ?", (session_id,))
+        self._conn.execute("DELETE FROM session_best WHERE session_id = ?", (session_id,))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO session_best VALUES (?, ?, ?, ?, ?, ?)",
+            [(session_id, t, int(w), bpm, ur, zx) for t, w, bpm, ur, zx in summary.get('best', [])],
+        )
+
+        sketches = summary.get('sketches') or {}
+        if previous is not None and previous['mtime'] != summary.get('mtime', 0) and not sketches:
+            # Файлы сессии изменились — скетчи старой истории больше не подходят
+            self._conn.execute("DELETE FROM session_sketches WHERE session_id = ?", (session_id,))
+        self._conn.executemany("INSERT OR REPLACE INTO session_sketches VALUES (?, ?, ?)",
+                               [(session_id, metric, blob) for metric, blob in sketches.items()])
+        if previous is not None:
+            rebuild.update(b for b in (previous['bpm_bucket'], bucket) if b is not None)
+        elif bucket is not None:
+            for t, w, _, ur, _ in summary.get('best', []):
+                if t == 'UR' and int(w) in RECORD_WINDOW_SIZES and ur is not None:
+                    added.setdefault((f'ur_{int(w)}', bucket), []).append(ur)
+            for metric, blob in sketches.items():
+                added.setdefault((metric, bucket), []).append(KLLSketch.from_bytes(blob))
+
+    def delete_session(self, session_id):
+        self.delete_sessions([session_id])
+
+    def delete_sessions(self, session_ids):
+        """Пакетное удаление сессий; сводки пересчитываются один раз на пакет"""
+        ids = [int(session_id) for session_id in session_ids]
+        if not ids:
+            return
+        with self._lock, self._conn:
+            days = set()
+            buckets = set()
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = self._conn.execute(
+                    f"SELECT id, day, bpm_bucket FROM sessions WHERE id IN ({placeholders})", chunk).fetchall()
+                if not rows:
+                    continue
+                days.update(r['day'] for r in rows)
+                buckets.update(r['bpm_bucket'] for r in rows if r['bpm_bucket'] is not None)
+                self._conn.execute(f"DELETE FROM sessions WHERE id IN ({placeholders})", chunk)
+                # Надгробия — чтобы читатели изменений по курсору узнали об удалении
+                seq = self._next_seq(len(rows))
+                self._conn.executemany("INSERT OR REPLACE INTO tombstones VALUES (?, ?)",
+                                       [(r['id'], seq + offset) for offset, r in enumerate(rows)])
+            self._refresh_rollups(days)
+            self._refresh_sketches({}, buckets)
+
+    def _refresh_rollups(self, days):
+        """Пересчет сводок только тех дней и недель, в которые попали изменения
+
+        Каждая строка сводки агрегируется заново по сессиям своего периода
+        (диапазон по индексу day), поэтому минимумы и максимумы остаются
+        точными и после удаления. Вызывается внутри транзакции изменения.
+        """
+        touched = {(period, period_start(day, period)) for day in days for period in ROLLUP_PERIODS}
+        for period, start in touched:
+            end = (datetime.strptime(start, "%Y-%m-%d")
+                   + timedelta(days=ROLLUP_PERIODS[period])).strftime("%Y-%m-%d")
+            row = self._conn.execute(self._ROLLUP_QUERY, (start, end)).fetchone()
+            if row['sessions'] == 0:
+                self._conn.execute("DELETE FROM rollups WHERE period = ? AND start = ?", (period, start))
+                continue
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO rollups VALUES ({', '.join('?' for _ in range(7 + 3 * len(RECORD_WINDOW_SIZES)))})",
+                (period, start, *row),
+            )
+
+    def _refresh_sketches(self, added, rebuild):
+        """Обновление скетчей BPM окон внутри транзакции изменения
+
+        added — {(метрика, окно): [значения и KLLSketch]} новых сессий,
+        rebuild — окна, скетчи которых собираются заново по всем их сессиям.
+        """
+        for bucket in rebuild:
+            for w in RECORD_WINDOW_SIZES:
+                sketch = KLLSketch()
+                sketch.update_many([r[0] for r in self._conn.execute(
+                    """
+                    SELECT b.ur FROM sessions s
+                    JOIN session_best b ON b.session_id = s.id AND b.type = 'UR' AND b.window_size = ?
+                    WHERE s.bpm_bucket = ? AND b.ur IS NOT NULL
+                    """,
+                    (w, bucket),
+                )])
+                self._store_sketch(f'ur_{w}', bucket, sketch)
+            for metric in HISTORY_SKETCH_METRICS:
+                sketch = KLLSketch.merged(KLLSketch.from_bytes(r[0]) for r in self._conn.execute(
+                    """
+                    SELECT k.sketch FROM sessions s
+                    JOIN session_sketches k ON k.session_id = s.id AND k.metric = ?
+                    WHERE s.bpm_bucket = ?
+                    """,
+                    (metric, bucket),
+                ))
+                self._store_sketch(metric, bucket, sketch)
+
+        for (metric, bucket), items in added.items():
+            if bucket in rebuild:
+                continue
+            row = self._conn.execute(
+                "SELECT sketch FROM sketches WHERE metric = ? AND bpm_bucket = ?", (metric, bucket)).fetchone()
+            sketch = KLLSketch.from_bytes(row[0]) if row else KLLSketch()
+            sketch.update_many([item for item in items if not isinstance(item, KLLSketch)])
+            for item in items:
+                if isinstance(item, KLLSketch):
+                    sketch.merge(item)
+            self._store_sketch(metric, bucket, sketch)
+
+    def _store_sketch(self, metric, bucket, sketch):
+        if sketch.n:
+            self._conn.execute("INSERT OR REPLACE INTO sketches VALUES (?, ?, ?, ?)",
+                               (metric, bucket, sketch.n, sketch.to_bytes()))
+        else:
+            self._conn.execute("DELETE FROM sketches WHERE metric = ? AND bpm_bucket = ?", (metric, bucket))
+        self._sketch_cache.pop((metric, bucket), None)
+        self.sketch_version += 1
+
+    # Сводка по сессиям одного периода. Для каждой сессии сначала собираются
+    # ее UR на окнах рекордов, лучший BPM и баланс ZX (ZX лучшего BPM на самом
+    # большом окне — ближе всего к балансу всей сессии), затем агрегируются.
+    _ROLLUP_QUERY = f"""
+        SELECT COUNT(*) AS sessions,
+               COALESCE(SUM(press_count), 0) AS presses,
+               MAX(best_bpm) AS best_bpm,
+               AVG(mean_bpm) AS mean_bpm,
+               SUM(zx_balance * press_count) / SUM(CASE WHEN zx_balance IS NOT NULL THEN press_count END) AS zx_balance,
+               {", ".join(f"MIN(ur_{w}) AS best_ur_{w}, AVG(ur_{w}) AS mean_ur_{w}" for w in RECORD_WINDOW_SIZES)},
+               {", ".join(f"COUNT(ur_{w}) AS ur_sessions_{w}" for w in RECORD_WINDOW_SIZES)}
+        FROM (
+            SELECT s.id, s.press_count, s.mean_bpm,
+                   MAX(CASE WHEN b.type = 'BPM' THEN b.bpm END) AS best_bpm,
+                   (SELECT zx FROM session_best z
+                    WHERE z.session_id = s.id AND z.type = 'BPM'
+                    ORDER BY z.window_size DESC LIMIT 1) AS zx_balance,
+                   {", ".join(f"MAX(CASE WHEN b.type = 'UR' AND b.window_size = {w} THEN b.ur END) AS ur_{w}" for w in RECORD_WINDOW_SIZES)}
+            FROM sessions s
+            LEFT JOIN session_best b ON b.session_id = s.id
+            WHERE s.day >= ? AND s.day < ?
+            GROUP BY s.id
+        )
+    """
+
+    def trends(self, period='day', limit=None):
+        """Готовые сводки прогресса по дням или неделям (последние limit периодов)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM (SELECT * FROM rollups WHERE period = ? ORDER BY start DESC LIMIT ?) ORDER BY start",
+                (period, -1 if limit is None else limit),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def session_sketch(self, session_id, metric):
+        """Скетч истории одной сессии или None"""
+        with self._lock:
+            row = self._conn.execute("SELECT sketch FROM session_sketches WHERE session_id = ? AND metric = ?",
+                                     (int(session_id), metric)).fetchone()
+        return KLLSketch.from_bytes(row[0]) if row else None
+
+    def distribution(self, metric, bucket):
+        """Скетч метрики по сессиям BPM окна или None; разобранный скетч кешируется до изменения"""
+        key = (metric, bucket)
+        with self._lock:
+            if key not in self._sketch_cache:
+                row = self._conn.execute(
+                    "SELECT sketch FROM sketches WHERE metric = ? AND bpm_bucket = ?", key).fetchone()
+                self._sketch_cache[key] = KLLSketch.from_bytes(row[0]) if row else None
+            return self._sketch_cache[key]
+
+    def set_name(self, session_id, name):
+        self.set_names({session_id: name})
+
+    def set_names(self, names):
+        """Пакетное переименование {ID: имя} в одной транзакции"""
+        with self._lock, self._conn:
+            seq = self._next_seq(len(names))
+            self._conn.executemany(
+                "UPDATE sessions SET name = ?, seq = ? WHERE id = ?",
+                [(name, seq + offset, int(session_id)) for offset, (session_id, name) in enumerate(names.items())],
+            )
+
+    def sync_state(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def set_sync_state(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO sync_meta VALUES (?, ?)", (key, value))
+
+    def changes(self, since=0, limit=500):
+        """Изменения после номера since: (сводки, удаленные ID, последний seq, есть ли еще)
+
+        Сводки — в формате upsert_session. Выдается не больше limit изменений
+        подряд по seq; следующий запрос продолжает с возвращенного seq.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT seq, id, 0 AS deleted FROM sessions WHERE seq > ?
+                UNION ALL
+                SELECT seq, id, 1 AS deleted FROM tombstones WHERE seq > ?
+                ORDER BY seq LIMIT ?
+                """,
+                (since, since, limit + 1),
+            ).fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            upserted = [r['id'] for r in rows if not r['deleted']]
+            sessions = {}
+            best = {}
+            sketches = {}
+            for start in range(0, len(upserted), 500):
+                chunk = upserted[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                for r in self._conn.execute(f"SELECT * FROM sessions WHERE id IN ({placeholders})", chunk):
+                    sessions[r['id']] = r
+                for r in self._conn.execute(
+                        f"SELECT * FROM session_best WHERE session_id IN ({placeholders})", chunk):
+                    best.setdefault(r['session_id'], []).append(
+                        (r['type'], r['window_size'], r['bpm'], r['ur'], r['zx']))
+                for r in self._conn.execute(
+                        f"SELECT * FROM session_sketches WHERE session_id IN ({placeholders})", chunk):
+                    sketches.setdefault(r['session_id'], {})[r['metric']] = r['sketch']
+
+        summaries = [
+            {
+                'id': str(session_id),
+                'mtime': sessions[session_id]['mtime'],
+                'name': sessions[session_id]['name'],
+                'mean_bpm': sessions[session_id]['mean_bpm'],
+                'press_count': sessions[session_id]['press_count'],
+                'best': best.get(session_id, []),
+                'sketches': sketches.get(session_id, {}),
+            }
+            for session_id in upserted
+        ]
+        deleted = [str(r['id']) for r in rows if r['deleted']]
+        last_seq = rows[-1]['seq'] if rows else since
+        return summaries, deleted, last_seq, has_more
+
+    def unsketched(self):
+        """ID сессий без какого-либо скетча истории (из каталога прошлой версии)"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT id FROM sessions s
+                WHERE (SELECT COUNT(*) FROM session_sketches k WHERE k.session_id = s.id
+                       AND k.metric IN ({', '.join('?' for _ in HISTORY_SKETCH_METRICS)})) < ?
+                """,
+                (*HISTORY_SKETCH_METRICS, len(HISTORY_SKETCH_METRICS)),
+            ).fetchall()
+        return {str(r['id']) for r in rows}
+
+    def mtimes(self):
+        """Словарь id -> mtime для инкрементального обновления монитором"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, mtime FROM sessions").fetchall()
+        return {str(r['id']): r['mtime'] for r in rows}
+
+    def seq(self):
+        """Номер последнего изменения (растет в той же транзакции, что и само изменение)"""
+        with self._lock:
+            return int(self._conn.execute("SELECT value FROM sync_meta WHERE key = 'seq'").fetchone()[0])
+
+    def count_sessions(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def list_sessions(self, limit=None, offset=0, sort='newest', ids=None):
+        """Страница списка сессий с UR на окнах рекордов
+
+        ids — необязательный список ID, которым ограничивается выборка.
+        """
+        order = SESSION_SORTS[sort]
+        where = ""
+        params = []
+        if ids is not None:
+            where = f"WHERE id IN ({', '.join('?' for _ in ids)})"
+            params = [int(i) for i in ids]
+        ur_columns = ", ".join(
+            f"MAX(CASE WHEN b.window_size = {w} THEN b.ur END) AS ur_{w}"
+            for w in RECORD_WINDOW_SIZES
+        )
+        query = f"""
+            SELECT s.*, {ur_columns}
+            FROM (SELECT * FROM sessions {where} ORDER BY {order} LIMIT ? OFFSET ?) s
+            LEFT JOIN session_best b ON b.session_id = s.id AND b.type = 'UR'
+            GROUP BY s.id
+            ORDER BY {", ".join("s." + part for part in order.split(", "))}
+        """
+        with self._lock:
+            rows = self._conn.execute(query, (*params, -1 if limit is None else limit, offset)).fetchall()
+        return [dict(r) for r in rows]
+
+    def best_windows(self, session_ids):
+        """Кривые лучших окон сессий: {ID: {'BPM': [(окно, BPM, UR, ZX), ...], 'UR': ..., 'ZX': ...}}"""
+        ids = [int(session_id) for session_id in session_ids]
+        curves = {str(session_id): {'BPM': [], 'UR': [], 'ZX': []} for session_id in ids}
+        if not ids:
+            return curves
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT session_id, type, window_size, bpm, ur, zx FROM session_best
+                WHERE session_id IN ({', '.join('?' for _ in ids)})
+                ORDER BY session_id, type, window_size
+                """,
+                ids,
+            ).fetchall()
+        for r in rows:
+            curves[str(r['session_id'])].setdefault(r['type'], []).append(
+                (r['window_size'], r['bpm'], r['ur'], r['zx']))
+        return curves
+
+    def records(self):
+        """Лучшие UR по BPM окнам (±5) для таблицы рекордов"""
+        ur_columns = ", ".join(
+            f"MIN(CASE WHEN b.window_size = {w} THEN b.ur END) AS best_ur_{w}"
+            for w in RECORD_WINDOW_SIZES
+        )
+        query = f"""
+            SELECT s.bpm_bucket AS center, COUNT(DISTINCT s.id) AS count, {ur_columns}
+            FROM sessions s
+            JOIN session_best b ON b.session_id = s.id AND b.type = 'UR'
+            WHERE s.bpm_bucket IS NOT NULL
+            GROUP BY s.bpm_bucket
+            ORDER BY s.bpm_bucket
+        """
+        with self._lock:
+            rows = self._conn.execute(query).fetchall()
+
+        records_data = []
+        for r in rows:
+            record = {
+                'bpm_center': r['center'],
+                'center_bpm': r['center'],
+                'count': r['count'],
+            }
+            for w in RECORD_WINDOW_SIZES:
+                record[f'best_ur_{w}'] = r[f'best_ur_{w}']
+            records_data.append(record)
+        return records_data
@@ -1,135 +1,329 @@
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Используем backend без GUI
 import threading
 import time
 from pathlib import Path
 import glob
 import webbrowser
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import json
 from urllib.parse import urlparse, parse_qs
 from datetime import datetime
-import io
 import base64
 import hashlib
+from collections import OrderedDict
+
+from catalog import RECORD_WINDOW_SIZES, ROLLUP_PERIODS, SESSION_SORTS, SKETCH_METRICS, bpm_bucket_for
+from archive import ARCHIVE_DIR, ARCHIVE_PATTERN, archive_path, month_of, open_archive, remove_sessions
+from cache_files import (is_plot_file, is_pyramid_file, is_records_file, prune_cache, read_cache_text,
+                         write_cache_text)
+from http_compress import CompressionCache, encode_response
+from ingest import read_best, read_history, read_intervals
+from live import LiveIngestServer, LiveSession
+from names_store import NamesStore
+from peers import PEERS_FILE, PeerSync, load_peers, sync_payload
+from players import DEFAULT_PLAYER, PlayerCatalog, is_session_id, load_players, split_session_id
+from plots import PLOT_VERSION, figure_bytes, records_figure, session_figure, setup_dark_style
+from quantiles import KLLSketch
+from pyramid import PYRAMID_VERSION, PyramidFile, build_pyramid, write_pyramid
+from rolling import RollingStatsEngine
+from segments import break_threshold, interval_jitter, segment_history, segments_payload
+from session_store import SessionStore
+from snapshot import SnapshotPublisher, first_version
+from summary import SessionSummary
+from singleflight import SingleFlight
+from render_queue import RenderScheduler, PRIORITY_VISIBLE, PRIORITY_RECORDS, PRIORITY_BACKFILL
+from warmup import CacheWarmup
+from web_assets import WebAssets, etag_matches
+
+# Максимум ID в одном пакетном запросе переименования или удаления
+MAX_BATCH_SIZE = 5000
 
 class WebCSVMonitor:
-    def __init__(self):
+    def __init__(self, port=8000, open_browser=True, peers_file=PEERS_FILE, host='localhost'):
         # Стили для темной темы
         self.setup_matplotlib_styles()
 
-        # Словарь для хранения данных файлов
-        self.file_data = {}
+        # Загруженные данные сессий: LRU с бюджетом памяти
+        self.memory_budget_mb = 256
+        self.file_data = SessionStore(self.memory_budget_mb * 1024 * 1024)
+        # Пути к файлам каждой сессии (заполняется монитором)
+        self.session_files = {}
+        # Размер страницы сессий по умолчанию
         self.max_files = 20
 
         # Папка для кеша изображений
         self.cache_dir = Path("cache")
         self.cache_dir.mkdir(exist_ok=True)
-
-        # Загрузка имен
+        # Лимиты файлов кеша по видам: графики сессий, графики рекордов, пирамиды
+        self.cache_max_files = 500
+        self.records_cache_max_files = 32
+        self.pyramid_cache_max_files = 100
+        # Пирамиды для масштабируемого графика интервалов строятся по одной за раз
+        self._pyramid_lock = threading.Lock()
+        # Готовые ответы сравнения: ключ — набор (ID, mtime) и разрешение
+        self.compare_cache = OrderedDict()
+        self.compare_cache_size = 32
+        self._compare_lock = threading.Lock()
+        # Собранные страницы /api/data по ключу (версия снимка, параметры):
+        # новая вкладка получает те же байты без чтения картинок с диска
+        self.page_cache = OrderedDict()
+        self.page_cache_size = 8
+        self._page_lock = threading.Lock()
+        # Сколько самых новых сессий дорисовывать в фоне
+        self.backfill_limit = 200
+
+        # Стабильность записи: пара файлов должна не меняться quiet_period секунд;
+        # если второй файл пары так и не появился — ждем не дольше pair_timeout.
+        # Всплески изменений объединяются, но не дольше max_batch_delay
+        self.quiet_period = 1.0
+        self.pair_timeout = 10.0
+        self.max_batch_delay = 10.0
+
+        # Имена сессий: снимок names.json и журнал изменений
         self.names_file = "names.json"
-        self.names = self.load_names()
-
-        # Создаем директории
-        os.makedirs("samples", exist_ok=True)
-        os.makedirs("web_output", exist_ok=True)
-
-        # Создаем начальную HTML страницу
-        self.generate_initial_html()
+        self.names = NamesStore(self.names_file, "names.journal")
+
+        # Игроки: у каждого папка сессий, свой каталог сводок и свой сканер.
+        # Каталог отдает сессии всех игроков с ID "<игрок>.<timestamp>"
+        self.catalog = PlayerCatalog(load_players())
+
+        # Очередь рендеринга: видимые сессии, затем рекорды, затем фон
+        self.render_scheduler = RenderScheduler()
+        # Одновременные одинаковые запросы (две вкладки опрашивают одну
+        # страницу, загрузка одной сессии из рендера и из API) считаются один раз
+        self.flights = SingleFlight()
+
+        # Сжатые тела ответов API: опрос без изменений не сжимает заново
+        self.compression_cache = CompressionCache()
+        # Снимки имен и рекордов для обработчиков. Версия снимка меняется только
+        # вместе с самими данными, поэтому повторный опрос получает те же байты
+        # (и тот же сжатый ответ) или 304 по ETag. Номер запуска из каталога
+        # в старших битах — версия растет и между перезапусками (см. snapshot.py)
+        self.snapshots = SnapshotPublisher(self.catalog, self.names, first_version(self.catalog.next_boot()))
+
+        # Создаем директории (у игроков других мониторов папок нет)
+        for player in self.players.values():
+            if player.samples_dir is not None:
+                player.samples_dir.mkdir(parents=True, exist_ok=True)
+
+        # Режим агрегатора: сводки сессий с других мониторов из peers.json
+        peers = load_peers(peers_file)
+        self.peer_sync = PeerSync(self, peers) if peers else None
+
+        # Интерфейс собирается один раз и отдается из памяти
+        self.web_assets = WebAssets()
+        self.build_web_assets()
+
+        # Живая сессия: нажатия в реальном времени от анализатора
+        self.live_session = LiveSession()
+        self.live_stats = RollingStatsEngine()
+        self.live_session.add_listener(self.live_stats.feed)
+        self.live_server = LiveIngestServer(self.live_session, "live.sock")
+        self.live_server.start()
 
         # Запускаем веб-сервер
+        self.server_host = host
+        self.server_port = port
+        self.open_browser = open_browser
         self.start_web_server()
 
-        # Запускаем мониторинг в отдельном потоке
+        # Запускаем мониторинг: по потоку на папку игрока, чтобы медленная
+        # папка (сетевой диск, распаковка архива) не задерживала остальные
         self.monitoring = True
-        self.monitor_thread = threading.Thread(target=self.monitor_directory, daemon=True)
-        self.monitor_thread.start()
+        self.monitor_threads = []
+        # Первая индексация каждой папки (после нее известны пути к файлам и сводки сессий)
+        self._first_scans = {}
+        for player in self.players.values():
+            if player.samples_dir is None:
+                continue
+            self._first_scans[player.name] = threading.Event()
+            thread = threading.Thread(target=self.monitor_directory, args=(player,), daemon=True)
+            thread.start()
+            self.monitor_threads.append(thread)
+        if self.peer_sync is not None:
+            self.peer_sync.start()
+
+        # Прогрев кешей по сохраненному каталогу (см. warmup.py)
+        self.warmup = CacheWarmup(self)
+        self.warmup.start()
+
+    def wait_first_scan(self, timeout=None):
+        """Ждет первой индексации всех папок (проход без пар в ожидании); False, если не дождались"""
+        deadline = None if timeout is None else time.time() + timeout
+        for event in list(self._first_scans.values()):
+            if not event.wait(None if deadline is None else max(0.0, deadline - time.time())):
+                return False
+        return True
 
-    def load_names(self):
-        try:
-            if os.path.exists(self.names_file):
-                with open(self.names_file, 'r', encoding='utf-8') as f:
-                    names = json.load(f)
-                    # Приводим ключи к строковому типу, если они числовые
-                    return {str(k): v for k, v in names.items()}
-        except (IOError, json.JSONDecodeError) as e:
-            print(f"Ошибка загрузки файла имен: {e}")
-        return {}
-
-    def save_names(self):
-        try:
-            with open(self.names_file, 'w', encoding='utf-8') as f:
-                json.dump(self.names, f, indent=4, ensure_ascii=False)
-        except IOError as e:
-            print(f"Ошибка сохранения файла имен: {e}")
+    @property
+    def players(self):
+        """Игроки каталога (набор пополняется игроками других мониторов)"""
+        return self.catalog.players
 
     def rename_session(self, session_id, new_name):
         """Переименование сессии"""
+        return self.rename_sessions({str(session_id): new_name})
+
+    def rename_sessions(self, names):
+        """Пакетное переименование {ID: имя}: одна запись в журнал и одна транзакция
+
+        Страницу не перестраиваем — имена приходят клиенту через /api/data.
+        """
         try:
-            self.names[str(session_id)] = new_name
-            self.save_names()
-            # Принудительно обновляем HTML для отображения нового имени
-            self.generate_html_page()
+            names = {str(session_id): name for session_id, name in names.items()}
+            self.names.set_many(names)
+            self.catalog.set_names(names)
+            for session_id in names:
+                # Имя входит в ключ кеша графика — прошлый рендер больше не подходит
+                self.render_scheduler.cancel(session_id)
+            self.touch_data()
             return True
         except Exception as e:
-            print(f"Ошибка переименования сессии: {e}")
+            print(f"Ошибка переименования сессий: {e}")
             return False
 
     def setup_matplotlib_styles(self):
         """Настройка стилей для темной темы"""
-        plt.style.use('dark_background')
-        plt.rcParams['figure.facecolor'] = '#2b2b2b'
-        plt.rcParams['axes.facecolor'] = '#363636'
-        plt.rcParams['axes.edgecolor'] = '#666666'
-        plt.rcParams['axes.labelcolor'] = '#cccccc'
-        plt.rcParams['text.color'] = '#cccccc'
-        plt.rcParams['xtick.color'] = '#cccccc'
-        plt.rcParams['ytick.color'] = '#cccccc'
-        plt.rcParams['grid.color'] = '#555555'
-
-    def monitor_directory(self):
-        """Мониторинг директории samples"""
-        samples_dir = Path("samples")
-        processed_files = set()
+        setup_dark_style()
+
+    def monitor_directory(self, player):
+        """Мониторинг папки сессий игрока
+
+        Пара попадает в каталог только после того, как ее файлы перестали
+        меняться (размер и mtime) в течение quiet_period и появились оба файла
+        (или истек pair_timeout). Всплески новых файлов (например, копирование
+        архива) объединяются в одно пакетное обновление.
+        """
+        samples_dir = player.samples_dir
+        # После перезапуска каталог уже заполнен, но рекорды и фон нужно запланировать
+        first_scan = True
+        # ID -> {'pair', 'signature', 'changed_at', 'first_seen'} для пар, ожидающих стабильности
+        pending = {}
+        # ID -> сигнатура пары, разбор которой закончился ошибкой (не повторяем, пока файлы не изменятся)
+        failed = {}
+        last_change = 0
+        # Сессии из каталога прошлой версии без скетчей истории переиндексируются
+        # один раз: список считается при запуске и только сокращается
+        unsketched = self.catalog.unsketched(player.name)
 
         while self.monitoring:
             try:
+                now = time.time()
                 if samples_dir.exists():
                     # Ищем все CSV файлы с паттернами best_bpm_ur_*.csv и stats_history_*.csv
                     best_files = glob.glob(str(samples_dir / "best_bpm_ur_*.csv"))
                     history_files = glob.glob(str(samples_dir / "stats_history_*.csv"))
                     
                     # Группируем файлы по ID (цифре в названии)
-                    file_pairs = self.group_files_by_id(best_files, history_files)
-                    
-                    # Сортируем по времени изменения
-                    file_pairs.sort(key=lambda x: max(
-                        os.path.getmtime(x['best']) if x['best'] else 0,
-                        os.path.getmtime(x['history']) if x['history'] else 0
-                    ), reverse=True)
-
-                    # Проверяем новые или измененные пары файлов
+                    file_pairs = self.group_files_by_id(best_files, history_files, player)
+                    # Сессии из месячных архивов — если нет таких же CSV
+                    loose_ids = {pair['id'] for pair in file_pairs}
+                    archive_files = glob.glob(str(samples_dir / ARCHIVE_DIR / ARCHIVE_PATTERN))
+                    file_pairs.extend(pair for pair in self.group_archived_sessions(archive_files, player)
+                                      if pair['id'] not in loose_ids)
+
+                    # Проверяем новые или измененные пары файлов.
+                    # Полные данные сессий грузятся лениво, при запросе страницы
                     updated = False
+                    indexed_mtimes = self.catalog.mtimes(player.name)
                     for pair in file_pairs:
                         pair_id = pair['id']
-                        if self.should_update_pair(pair, processed_files):
-                            self.load_csv_pair(pair)
-                            processed_files.add(pair_id)
+                        self.session_files[pair_id] = pair
+                        signature = self.pair_signature(pair)
+                        if signature is None or failed.get(pair_id) == signature:
+                            continue
+                        if pair_id not in unsketched and not self.should_update_pair(signature, indexed_mtimes.get(pair_id)):
+                            pending.pop(pair_id, None)
+                            continue
+                        state = pending.get(pair_id)
+                        if state is None or state['signature'] != signature:
+                            pending[pair_id] = {
+                                'pair': pair,
+                                'signature': signature,
+                                'changed_at': now,
+                                'first_seen': state['first_seen'] if state else now,
+                            }
+                            last_change = now
+
+                    # Пока идет всплеск изменений, ждем тишины (но не дольше max_batch_delay)
+                    burst_settled = now - last_change >= self.quiet_period
+                    burst_too_long = pending and now - min(s['first_seen'] for s in pending.values()) >= self.max_batch_delay
+                    if burst_settled or burst_too_long:
+                        ready = [state for state in pending.values() if self.is_pair_stable(state, now)]
+                        if ready:
+                            ready.sort(key=lambda state: max(state['signature'][1], state['signature'][3]), reverse=True)
+                            for pair_id, error_signature in self.index_csv_pairs([state['pair'] for state in ready]).items():
+                                failed[pair_id] = error_signature
+                            for state in ready:
+                                pending.pop(state['pair']['id'], None)
+                                unsketched.discard(state['pair']['id'])
                             updated = True
 
-                    if updated:
-                        self.generate_html_page()
+                    # Убираем из каталога сессии, файлы которых исчезли
+                    present_ids = {pair['id'] for pair in file_pairs}
+                    stale_ids = set(indexed_mtimes) - present_ids
+                    self.catalog.delete_sessions(stale_ids)
+                    for stale_id in stale_ids:
+                        unsketched.discard(stale_id)
+                        self.file_data.pop(stale_id, None)
+                        self.session_files.pop(stale_id, None)
+                        self.render_scheduler.cancel(stale_id)
+                        updated = True
+                    for gone_id in (set(pending) | set(failed)) - present_ids:
+                        pending.pop(gone_id, None)
+                        failed.pop(gone_id, None)
 
-                time.sleep(2)  # Проверяем каждые 2 секунды
+                    if updated:
+                        self.catalog.bump(player.name)
+                        self.touch_data()
+                    if updated or (first_scan and player.catalog.count_sessions()):
+                        self.schedule_records_chart(player.name)
+                        self.schedule_records_chart()
+                        self.schedule_backfill()
+                    first_scan = False
+                # Первая индексация закончена, когда не осталось пар в ожидании
+                # стабильности: при свежем запуске все пары проходят через pending
+                if not pending:
+                    self._first_scans[player.name].set()
+
+                # Пока есть пары в ожидании, проверяем чаще
+                time.sleep(self.quiet_period / 2 if pending else 2)
             except Exception as e:
-                print(f"Ошибка мониторинга: {e}")
+                print(f"Ошибка мониторинга {player.name}: {e}")
+                self._first_scans[player.name].set()
                 time.sleep(5)
 
-    def group_files_by_id(self, best_files, history_files):
-        """Группируем файлы по ID в названии"""
+    def pair_signature(self, pair):
+        """(размер best, mtime best, размер history, mtime history); None для отсутствующих файлов"""
+        if pair.get('archive'):
+            # Архив пишется атомарно, поэтому сигнатура берется из его индекса
+            entry = pair['entry']
+            return tuple(value for section in ('best', 'history') for value in (
+                (entry[section]['length'], entry['mtime']) if entry.get(section) else (None, 0)))
+        signature = []
+        for key in ('best', 'history'):
+            try:
+                stat = os.stat(pair[key]) if pair[key] else None
+            except FileNotFoundError:
+                stat = None
+            signature.extend((stat.st_size, stat.st_mtime) if stat else (None, 0))
+        if signature[0] is None and signature[2] is None:
+            return None
+        return tuple(signature)
+
+    def is_pair_stable(self, state, now):
+        """Файлы пары не менялись quiet_period и либо оба на месте, либо истек pair_timeout"""
+        if now - state['changed_at'] < self.quiet_period:
+            return False
+        signature = state['signature']
+        both_present = signature[0] is not None and signature[2] is not None
+        return both_present or now - state['first_seen'] >= self.pair_timeout
+
+    def group_files_by_id(self, best_files, history_files, player=None):
+        """Группируем файлы по ID в названии
+
+        'id' пары — публичный ID сессии игрока, 'local_id' — timestamp из имени файла.
+        """
         import re
         pairs = {}
         
@@ -139,7 +333,7 @@ class WebCSVMonitor:
             if match:
                 file_id = match.group(1)
                 if file_id not in pairs:
-                    pairs[file_id] = {'id': file_id, 'best': None, 'history': None}
+                    pairs[file_id] = self._new_pair(player, file_id)
                 pairs[file_id]['best'] = file_path
         
         # Обрабатываем history файлы
@@ -148,29 +342,112 @@ class WebCSVMonitor:
             if match:
                 file_id = match.group(1)
                 if file_id not in pairs:
-                    pairs[file_id] = {'id': file_id, 'best': None, 'history': None}
+                    pairs[file_id] = self._new_pair(player, file_id)
                 pairs[file_id]['history'] = file_path
         
         return list(pairs.values())
 
-    def should_update_pair(self, pair, processed_files):
-        """Проверяем нужно ли обновлять пару файлов"""
-        pair_id = pair['id']
-        if pair_id not in processed_files:
+    def _new_pair(self, player, local_id):
+        player = player or self.players[DEFAULT_PLAYER]
+        return {'id': player.session_id(local_id), 'local_id': local_id, 'player': player.name,
+                'best': None, 'history': None}
+
+    def group_archived_sessions(self, archive_files, player=None):
+        """Сессии из месячных архивов в виде пар: {'id', 'local_id', 'archive', 'entry'}"""
+        pairs = []
+        for archive_file in sorted(archive_files):
+            try:
+                entries = open_archive(archive_file).entries()
+            except (OSError, ValueError) as e:
+                print(f"Ошибка чтения архива {archive_file}: {e}")
+                continue
+            for session_id, entry in entries.items():
+                pairs.append(dict(self._new_pair(player, session_id), archive=archive_file, entry=entry))
+        return pairs
+
+    def should_update_pair(self, signature, indexed_mtime):
+        """Проверяем нужно ли обновлять пару файлов в каталоге"""
+        if indexed_mtime is None:
             return True
-            
-        # Проверяем время модификации файлов
-        stored_data = self.file_data.get(pair_id, {})
-        current_mtime = 0
-        
+        return indexed_mtime < max(signature[1], signature[3])
+
+    def summarize_csv_pair(self, pair):
+        """Сводка пары для каталога без загрузки полной истории
+
+        Из истории читаются только интервалы: по ним число нажатий и скетчи
+        истории, которые записываются в каталог вместе со сводкой.
+        """
+        intervals = None
+        if pair.get('archive'):
+            # Число нажатий есть в индексе архива
+            entry = pair['entry']
+            archive = open_archive(pair['archive'])
+            best_df = archive.read_best(pair['local_id'])
+            press_count = entry['history']['rows'] if entry.get('history') else 0
+            if entry.get('history'):
+                intervals = archive.read_history(pair['local_id'])['Interval_ms'].to_numpy()
+            summary = self._session_summary(SessionSummary.from_best_df(pair['id'], entry['mtime'], best_df, press_count))
+            summary['sketches'] = self._history_sketches(intervals)
+            return summary
+
+        best_df = None
+        press_count = 0
+        mtime = 0
+
         if pair['best'] and os.path.exists(pair['best']):
-            current_mtime = max(current_mtime, os.path.getmtime(pair['best']))
-        if pair['history'] and os.path.exists(pair['history']):
-            current_mtime = max(current_mtime, os.path.getmtime(pair['history']))
-            
-        return stored_data.get('mtime', 0) < current_mtime
+            best_df = read_best(pair['best'])
+            mtime = max(mtime, os.path.getmtime(pair['best']))
 
-    def load_csv_pair(self, pair):
+        if pair['history'] and os.path.exists(pair['history']):
+            intervals = read_intervals(pair['history'])
+            press_count = len(intervals)
+            mtime = max(mtime, os.path.getmtime(pair['history']))
+
+        summary = self._session_summary(SessionSummary.from_best_df(pair['id'], mtime, best_df, press_count))
+        summary['sketches'] = self._history_sketches(intervals)
+        return summary
+
+    def _history_sketches(self, intervals):
+        """Скетчи истории для каталога: разброс соседних интервалов внутри серий"""
+        jitter = KLLSketch()
+        if intervals is not None:
+            jitter.update_many(interval_jitter(intervals, break_threshold(intervals)))
+        return {'jitter': jitter.to_bytes()}
+
+    def index_csv_pairs(self, pairs):
+        """Пакетное обновление сводок в каталоге (одна транзакция)
+
+        Возвращает {ID: сигнатура} для пар, которые не удалось разобрать.
+        """
+        summaries = []
+        failed = {}
+        for pair in pairs:
+            try:
+                summaries.append(self.summarize_csv_pair(pair))
+            except Exception as e:
+                print(f"Ошибка индексации пары {pair['id']}: {e}")
+                failed[pair['id']] = self.pair_signature(pair)
+
+        self.catalog.upsert_sessions(summaries)
+        for summary in summaries:
+            # Загруженные ранее данные устарели
+            self.file_data.pop(summary['id'], None)
+        if len(pairs) > 1:
+            print(f"Проиндексировано пар: {len(summaries)}, с ошибками: {len(failed)}")
+        return failed
+
+    def get_session_data(self, session_id, mtime):
+        """Данные сессии, при необходимости лениво загружаемые с диска"""
+        data = self.file_data.get(session_id)
+        if data is not None and data['mtime'] >= mtime:
+            return data
+        pair = self.session_files.get(session_id)
+        if pair is None:
+            return None
+        self.flights.do(('load', session_id, mtime), lambda: self.load_csv_pair(pair))
+        return self.file_data.get(session_id)
+
+    def load_csv_pair(self, pair, store=True):
         """Загрузка пары CSV файлов"""
         try:
             pair_id = pair['id']
@@ -178,73 +455,67 @@ class WebCSVMonitor:
             
             data = {
                 'id': pair_id,
-                'best_data': None,
+                'summary': None,
                 'history_data': None,
                 'mtime': 0,
-                'filename': datetime.fromtimestamp(int(pair_id)).strftime("%Y-%m-%d %H:%M:%S")
+                'filename': datetime.fromtimestamp(int(pair['local_id'])).strftime("%Y-%m-%d %H:%M:%S")
             }
             
+            if pair.get('archive'):
+                archive = open_archive(pair['archive'])
+                best_df = archive.read_best(pair['local_id'])
+                data['history_data'] = archive.read_history(pair['local_id'])
+                data['mtime'] = pair['entry']['mtime']
+                print(f"Сессия загружена из архива {os.path.basename(pair['archive'])}")
+
+            else:
+                best_df = None
+
             # Загружаем best файл
             if pair['best'] and os.path.exists(pair['best']):
-                best_df = pd.read_csv(pair['best'])
-                data['best_data'] = {
-                    'bpm_data': best_df[best_df['Type'] == 'BPM'].copy(),
-                    'ur_data': best_df[best_df['Type'] == 'UR'].copy(), 
-                    'xz_data': best_df[best_df['Type'] == 'ZX'].copy()
-                }
+                best_df = read_best(pair['best'])
                 data['mtime'] = max(data['mtime'], os.path.getmtime(pair['best']))
-                print(f"Best файл загружен: BPM={len(data['best_data']['bpm_data'])}, UR={len(data['best_data']['ur_data'])}, ZX={len(data['best_data']['xz_data'])}")
+                print(f"Best файл загружен: строк={len(best_df)}")
             
             # Загружаем history файл
             if pair['history'] and os.path.exists(pair['history']):
-                history_df = pd.read_csv(pair['history'])
+                history_df = read_history(pair['history'])
                 data['history_data'] = history_df
                 data['mtime'] = max(data['mtime'], os.path.getmtime(pair['history']))
                 print(f"History файл загружен: строк={len(history_df)}")
-            
-            self.file_data[pair_id] = data
+
+            # Таблицы лучших окон и производные значения считаются один раз
+            press_count = len(data['history_data']) if data['history_data'] is not None else 0
+            data['summary'] = SessionSummary.from_best_df(pair_id, data['mtime'], best_df, press_count)
+            # Серии между паузами с порогом по умолчанию — для графика и API
+            if data['history_data'] is not None:
+                intervals = data['history_data']['Interval_ms'].to_numpy()
+                data['segments'] = segment_history(intervals, data['history_data']['ZX_avg'].to_numpy())
+
+            if store:
+                self.file_data[pair_id] = data
+            return data
             
         except Exception as e:
             print(f"Ошибка загрузки пары {pair_id}: {e}")
+            return None
 
-    def load_csv_data(self, file_path, mtime):
-        """Загрузка данных из CSV файла"""
-        try:
-            df = pd.read_csv(file_path)
-            print(f"Загружен файл: {os.path.basename(file_path)}")
-            print(f"Столбцы CSV: {list(df.columns)}")
-            print(f"Типы данных: {df['Type'].unique() if 'Type' in df.columns else 'Нет столбца Type'}")
-            print(f"Количество строк: {len(df)}")
-
-            # Разделяем данные на BPM, UR и ZX
-            bpm_data = df[df['Type'] == 'BPM'].copy()
-            ur_data = df[df['Type'] == 'UR'].copy()
-            xz_data = df[df['Type'] == 'ZX'].copy()
-
-            print(f"BPM строк: {len(bpm_data)}, UR строк: {len(ur_data)}, ZX строк: {len(xz_data)}")
-
-            self.file_data[file_path] = {
-                'bpm_data': bpm_data,
-                'ur_data': ur_data,
-                'xz_data': xz_data,
-                'mtime': mtime,
-                'filename': os.path.basename(file_path)
-            }
-        except Exception as e:
-            print(f"Ошибка загрузки {file_path}: {e}")
+    def _session_summary(self, summary):
+        """Сводка по сессии для каталога"""
+        return summary.catalog_summary(self.names.get(str(summary.id)))
 
     def create_plot_image(self, data, filename):
         """Создание изображения графика с 4 подграфиками с кешированием"""
 
         # Создаем ключ кеша на основе данных и времени модификации
-        cache_key = self._generate_cache_key(data, filename)
-        cache_file = self.cache_dir / f"{cache_key}.txt"
+        press_count = len(data['history_data']) if data.get('history_data') is not None else 0
+        cache_key = self._generate_cache_key(data.get('id', ''), data.get('mtime', 0), filename, press_count)
+        cache_file = self._cache_file(data.get('id', ''), cache_key)
 
         # Проверяем кеш в файле
         if cache_file.exists():
             try:
-                with open(cache_file, 'r') as f:
-                    cached_base64 = f.read().strip()
+                cached_base64 = read_cache_text(cache_file)
                 print(f"Используем кешированное изображение для {filename}")
                 return cached_base64
             except Exception as e:
@@ -254,243 +525,22 @@ class WebCSVMonitor:
         
         print(f"Создаю график для {filename}")
         
-        if data.get('best_data'):
-            best_data = data['best_data']
-            print(f"Best данных: BPM={len(best_data['bpm_data'])}, UR={len(best_data['ur_data'])}, ZX={len(best_data['xz_data'])}")
+        summary = data.get('summary')
+        if summary is not None and summary.has_best:
+            print(f"Best данных: BPM={len(summary.best_bpm)}, UR={len(summary.best_ur)}, ZX={len(summary.best_zx)}")
         if data.get('history_data') is not None:
             print(f"History данных: {len(data['history_data'])} строк")
 
         try:
-            # Создаем фигуру с 4 графиками в layout 2x2
-            fig = plt.figure(figsize=(16, 10), facecolor='#2b2b2b')
-
-            # Настраиваем layout для 4 графиков: 2 строки, 2 столбца
-            gs = fig.add_gridspec(2, 2, hspace=0.3, wspace=0.3)
-
-            # График 1 (верх-слева): История статистик со скользящим средним
-            ax1 = fig.add_subplot(gs[0, 0])
-            if data.get('history_data') is not None and not data['history_data'].empty:
-                history_df = data['history_data']
-                # Определяем какие столбцы есть в данных (поддержка старого и нового формата)
-                if 'BPM_avg8' in history_df.columns:
-                    bpm_col, ur_col, xz_col = 'BPM_avg8', 'UR_avg8', 'ZX_avg8'
-                    avg_window = 8
-                else:
-                    bpm_col, ur_col, xz_col = 'BPM_avg4', 'UR_avg4', 'ZX_avg4'
-                    avg_window = 4
-                
-                # Фильтруем данные где есть статистики
-                stats_data = history_df[history_df[bpm_col] != ''].copy()
-                if not stats_data.empty:
-                    # Преобразуем строки в числа
-                    stats_data[bpm_col] = pd.to_numeric(stats_data[bpm_col])
-                    stats_data[ur_col] = pd.to_numeric(stats_data[ur_col])
-                    stats_data[xz_col] = pd.to_numeric(stats_data[xz_col])
-                    
-                    # UR на вторичной оси (рисуем сначала, чтобы был сзади)
-                    ax1_ur = ax1.twinx()
-                    ax1_ur.plot(stats_data['Press'], stats_data['UR_avg8'], 
-                               color='#40e0d0', linewidth=1, label='UR (avg8)', alpha=0.5)
-                    
-                    # BPM (рисуем поверх UR)
-                    ax1.plot(stats_data['Press'], stats_data['BPM_avg8'], 
-                            color='#ff69b4', linewidth=2, label='BPM (avg8)', alpha=0.8)
-                    
-                    # Горизонтальная пунктирная линия среднего BPM
-                    avg_bpm = stats_data['BPM_avg8'].mean()
-                    ax1.axhline(y=avg_bpm, color='#ff69b4', linestyle='--', linewidth=1.5, alpha=0.7)
-                    ax1.text(0.02, avg_bpm + 2, f'Avg: {avg_bpm:.1f} BPM', 
-                            transform=ax1.get_yaxis_transform(), 
-                            color='#ff69b4', fontsize=12, alpha=0.9, weight='bold')
-                    
-                    # Display Best UR at max window size
-                    if data.get('best_data') and not data['best_data']['ur_data'].empty:
-                        best_ur_data = data['best_data']['ur_data']
-                        best_ur_at_max_window = best_ur_data.loc[best_ur_data['Window Size'].idxmax()]
-                        best_ur_val = best_ur_at_max_window['UR']
-                        
-                        ax1_ur.axhline(y=best_ur_val, color='#40e0d0', linestyle='--', linewidth=1.5, alpha=0.7)
-                        ax1_ur.text(0.98, best_ur_val + 5, f'Best UR (max win): {best_ur_val:.1f}',
-                                   transform=ax1_ur.get_yaxis_transform(),
-                                   color='#40e0d0', fontsize=12, alpha=0.9, weight='bold',
-                                   horizontalalignment='right')
-                    else:
-                        # Fallback to mean if no best UR data is available
-                        avg_ur = stats_data['UR_avg8'].mean()
-                        ax1_ur.axhline(y=avg_ur, color='#40e0d0', linestyle='--', linewidth=1.5, alpha=0.7)
-                        ax1_ur.text(0.98, avg_ur + 5, f'Avg: {avg_ur:.1f} UR', 
-                                   transform=ax1_ur.get_yaxis_transform(), 
-                                   color='#40e0d0', fontsize=12, alpha=0.9, weight='bold',
-                                   horizontalalignment='right')
-                    
-                    # Устанавливаем скейл BPM
-                    bpm_max = max(280, stats_data['BPM_avg8'].max() * 1.1) if not stats_data['BPM_avg8'].empty else 280
-                    ax1.set_ylim(0, bpm_max)
-                    
-                    # Устанавливаем скейл UR (до 300, больше игнорируем)
-                    ax1_ur.set_ylim(0, 300)
-                    ax1_ur.set_ylabel('UR', color='#40e0d0', fontsize=9)
-                    ax1_ur.tick_params(axis='y', labelcolor='#40e0d0', labelsize=7)
-            
-            ax1.set_xlabel('Button Press #', color='#cccccc', fontsize=10)
-            ax1.set_ylabel('BPM', color='#ff69b4', fontsize=10)
-            ax1.set_title('STATS HISTORY (Moving Avg 8)', color='#ffaa44', fontsize=12, pad=10, weight='bold')
-            ax1.grid(True, alpha=0.3)
-            ax1.set_facecolor('#363636')
-            ax1.tick_params(labelsize=8, colors='#cccccc')
-
-            # График 2 (верх-справа): Сырые интервалы между нажатиями
-            ax2 = fig.add_subplot(gs[0, 1])
-            if data.get('history_data') is not None and not data['history_data'].empty:
-                history_df = data['history_data']
-                # Рисуем сырые интервалы
-                ax2.plot(history_df['Press'], history_df['Interval_ms'], 
-                        color='#88ccff', linewidth=1.5, alpha=0.7, marker='.', markersize=3)
-                
-                # Устанавливаем скейл интервалов
-                ax2.set_ylim(0, 200)
-                
-                # Добавляем ZX баланс на вторичной оси (только где есть данные)
-                # Определяем какие столбцы есть в данных
-                if 'ZX_avg8' in history_df.columns:
-                    xz_col = 'ZX_avg8'
-                else:
-                    xz_col = 'ZX_avg4'
-                    
-                stats_data = history_df[history_df[xz_col] != ''].copy()
-                if not stats_data.empty:
-                    stats_data[xz_col] = pd.to_numeric(stats_data[xz_col])
-                    ax2_xz = ax2.twinx()
-                    ax2_xz.plot(stats_data['Press'], stats_data[xz_col], 
-                               color='#cc8800', linewidth=2, alpha=0.8)
-                    
-                    # Устанавливаем симметричный скейл ZX
-                    xz_abs_max = max(20, abs(stats_data[xz_col]).max() * 1.1) if not stats_data[xz_col].empty else 20
-                    ax2_xz.set_ylim(-xz_abs_max, xz_abs_max)
-                    ax2_xz.set_ylabel('ZX %', color='#cc8800', fontsize=9)
-                    ax2_xz.tick_params(axis='y', labelcolor='#cc8800', labelsize=7)
-            
-            ax2.set_xlabel('Button Press #', color='#cccccc', fontsize=10)
-            ax2.set_ylabel('Interval (ms)', color='#88ccff', fontsize=10)
-            ax2.set_title('RAW INTERVALS', color='#ffaa44', fontsize=12, pad=10, weight='bold')
-            ax2.grid(True, alpha=0.3)
-            ax2.set_facecolor('#363636')
-            ax2.tick_params(labelsize=8, colors='#cccccc')
-
-            # График 3 (низ-слева): Лучший BPM с ZX
-            ax3 = fig.add_subplot(gs[1, 0])
-            if data.get('best_data') and not data['best_data']['bpm_data'].empty:
-                best_data = data['best_data']
-                ax3.plot(best_data['bpm_data']['Window Size'],
-                        best_data['bpm_data']['BPM'],
-                        color='#ff69b4',
-                        linewidth=2,
-                        marker='o',
-                        markersize=4)
-                
-                # Устанавливаем скейл BPM
-                bpm_max = max(280, best_data['bpm_data']['BPM'].max() * 1.1) if not best_data['bpm_data'].empty else 280
-                ax3.set_ylim(0, bpm_max)
-                
-                # Добавляем ZX как вторичную метрику
-                if 'ZX' in best_data['bpm_data'].columns:
-                    ax3_xz = ax3.twinx()
-                    ax3_xz.plot(best_data['bpm_data']['Window Size'],
-                               best_data['bpm_data']['ZX'],
-                               color='#cc8800',
-                               linewidth=1.5,
-                               marker='s',
-                               markersize=3,
-                               alpha=0.7)
-                    
-                    # Устанавливаем симметричный скейл ZX
-                    xz_abs_max = max(20, abs(best_data['bpm_data']['ZX']).max() * 1.1) if not best_data['bpm_data']['ZX'].empty else 20
-                    ax3_xz.set_ylim(-xz_abs_max, xz_abs_max)
-                    ax3_xz.set_ylabel('ZX %', color='#cc8800', fontsize=9)
-                    ax3_xz.tick_params(axis='y', labelcolor='#cc8800', labelsize=7)
-            
-            ax3.set_xlabel('Window Size', color='#cccccc', fontsize=10)
-            ax3.set_ylabel('Best BPM', color='#ff69b4', fontsize=10)
-            ax3.set_title('BEST BPM Distribution', color='#ffaa44', fontsize=12, pad=10, weight='bold')
-            ax3.grid(True, alpha=0.3)
-            ax3.set_facecolor('#363636')
-            ax3.tick_params(labelsize=8, colors='#cccccc')
-            
-            # График 4 (низ-справа): Лучший UR с ZX
-            ax4 = fig.add_subplot(gs[1, 1])
-            if data.get('best_data') and not data['best_data']['ur_data'].empty:
-                best_data = data['best_data']
-                ax4.plot(best_data['ur_data']['Window Size'],
-                        best_data['ur_data']['UR'],
-                        color='#40e0d0',
-                        linewidth=2,
-                        marker='o',
-                        markersize=4)
-                
-                # Устанавливаем скейл UR
-                ur_max = max(250, best_data['ur_data']['UR'].max() * 1.1) if not best_data['ur_data'].empty else 250
-                ax4.set_ylim(0, ur_max)
-                
-                # Добавляем метки для UR на 100 и 200 нажатий
-                ur_100 = best_data['ur_data'][best_data['ur_data']['Window Size'] == 100]['UR']
-                ur_200 = best_data['ur_data'][best_data['ur_data']['Window Size'] == 200]['UR']
-                
-                if not ur_100.empty:
-                    ur_100_val = ur_100.iloc[0]
-                    ax4.axhline(y=ur_100_val, color='#40e0d0', linestyle=':', linewidth=2, alpha=0.8)
-                    ax4.text(0.02, ur_100_val + ur_max*0.02, f'UR@100: {ur_100_val:.1f}',
-                            transform=ax4.get_yaxis_transform(),
-                            color='#40e0d0', fontsize=11, weight='bold', alpha=0.9)
-                
-                if not ur_200.empty:
-                    ur_200_val = ur_200.iloc[0]
-                    ax4.axhline(y=ur_200_val, color='#40e0d0', linestyle='-.', linewidth=2, alpha=0.8)
-                    ax4.text(0.02, ur_200_val + ur_max*0.02, f'UR@200: {ur_200_val:.1f}',
-                            transform=ax4.get_yaxis_transform(),
-                            color='#40e0d0', fontsize=11, weight='bold', alpha=0.9)
-                
-                # Добавляем ZX как вторичную метрику
-                if 'ZX' in best_data['ur_data'].columns:
-                    ax4_xz = ax4.twinx()
-                    ax4_xz.plot(best_data['ur_data']['Window Size'],
-                               best_data['ur_data']['ZX'],
-                               color='#cc8800',
-                               linewidth=1.5,
-                               marker='s',
-                               markersize=3,
-                               alpha=0.7)
-                    
-                    # Устанавливаем симметричный скейл ZX
-                    xz_abs_max = max(20, abs(best_data['ur_data']['ZX']).max() * 1.1) if not best_data['ur_data']['ZX'].empty else 20
-                    ax4_xz.set_ylim(-xz_abs_max, xz_abs_max)
-                    ax4_xz.set_ylabel('ZX %', color='#cc8800', fontsize=9)
-                    ax4_xz.tick_params(axis='y', labelcolor='#cc8800', labelsize=7)
-            
-            ax4.set_xlabel('Window Size', color='#cccccc', fontsize=10)
-            ax4.set_ylabel('Best UR', color='#40e0d0', fontsize=10)
-            ax4.set_title('BEST UR Distribution', color='#ffaa44', fontsize=12, pad=10, weight='bold')
-            ax4.grid(True, alpha=0.3)
-            ax4.set_facecolor('#363636')
-            ax4.tick_params(labelsize=8, colors='#cccccc')
-
-            # Добавляем общий заголовок
-            fig.suptitle(f"{filename}", color='#cccccc', fontsize=14, y=0.95, weight='bold')
-
             # Сохраняем в base64 для встраивания в HTML
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', facecolor='#2b2b2b', bbox_inches='tight', dpi=100)
-            buffer.seek(0)
-            plot_data = buffer.getvalue()
-            buffer.close()
-            plt.close(fig)
+            plot_data = figure_bytes(session_figure(data, filename))
 
             print(f"График создан успешно, размер: {len(plot_data)} байт")
             plot_base64 = base64.b64encode(plot_data).decode()
 
-            # Сохраняем в файл кеша
+            # Сохраняем в файл кеша (через временный файл: при сбое не останется обрезанной картинки)
             try:
-                with open(cache_file, 'w') as f:
-                    f.write(plot_base64)
+                write_cache_text(cache_file, plot_base64)
                 print(f"График сохранен в кеш: {cache_file}")
             except Exception as e:
                 print(f"Ошибка сохранения в кеш для {filename}: {e}")
@@ -504,27 +554,22 @@ class WebCSVMonitor:
             print(f"Ошибка создания графика: {e}")
             return ""
 
-    def _generate_cache_key(self, data, filename):
-        """Генерация ключа кеша на основе данных файла"""
+    def _generate_cache_key(self, session_id, mtime, filename, press_count):
+        """Генерация ключа кеша на основе сводки сессии
+
+        Ключ считается без загрузки CSV, чтобы наличие готового графика можно
+        было проверить по одной строке каталога.
+        """
         try:
             # Создаем строку для хеширования из основных данных
             cache_data = {
-                'mtime': data.get('mtime', 0),
+                'mtime': mtime,
                 'filename': filename,
-                'id': data.get('id', ''),
+                'id': str(session_id),
+                'history_size': press_count,
+                'plot_version': PLOT_VERSION,
             }
 
-            # Добавляем размеры данных для быстрого сравнения
-            if data.get('best_data'):
-                cache_data['best_sizes'] = {
-                    'bpm': len(data['best_data']['bpm_data']),
-                    'ur': len(data['best_data']['ur_data']),
-                    'xz': len(data['best_data']['xz_data'])
-                }
-
-            if data.get('history_data') is not None:
-                cache_data['history_size'] = len(data['history_data'])
-
             # Создаем хеш из JSON представления данных
             cache_str = json.dumps(cache_data, sort_keys=True)
             return hashlib.md5(cache_str.encode()).hexdigest()
@@ -534,190 +579,624 @@ class WebCSVMonitor:
             # Если не можем создать хеш, возвращаем уникальный ключ на основе времени
             return f"fallback_{int(time.time() * 1000000)}"
 
-    def _cleanup_cache(self):
-        """Очистка старых файлов кеша"""
-        try:
-            cache_files = list(self.cache_dir.glob("*.txt"))
-
-            # Если файлов кеша больше 100, удаляем самые старые
-            if len(cache_files) > 100:
-                # Сортируем по времени модификации (старые сначала)
-                cache_files.sort(key=lambda f: f.stat().st_mtime)
-
-                # Удаляем 20 самых старых файлов
-                files_to_remove = cache_files[:20]
-                for cache_file in files_to_remove:
-                    try:
-                        cache_file.unlink()
-                        print(f"Удален старый файл кеша: {cache_file.name}")
-                    except Exception as e:
-                        print(f"Ошибка удаления файла кеша {cache_file}: {e}")
+    def _cache_file(self, session_id, cache_key):
+        """Файл кеша графика; ID в начале имени позволяет чистить кеш одной сессии"""
+        return self.cache_dir / f"{session_id}_{cache_key}.txt"
 
-        except Exception as e:
+    def _plot_cache_file(self, session, name):
+        """Файл кеша графика для строки каталога"""
+        cache_key = self._generate_cache_key(session['id'], session['mtime'], name, session['press_count'])
+        return self._cache_file(session['id'], cache_key)
+
+    def get_plot_image(self, session, name, priority=PRIORITY_VISIBLE):
+        """Готовый график сессии из кеша; если его нет — ставим рендеринг в очередь
+
+        Возвращает None, пока график рисуется.
+        """
+        cache_file = self._plot_cache_file(session, name)
+        if cache_file.exists():
+            try:
+                return read_cache_text(cache_file)
+            except Exception as e:
+                print(f"Ошибка чтения кеша для {name}: {e}")
+                cache_file.unlink(missing_ok=True)
+
+        remote = self._remote_player(session)
+        if remote is not None:
+            # Сессия другого монитора: готовый график скачивается с него
+            self.peer_sync.fetch_plot(remote, split_session_id(session['id'])[1], cache_file)
+            return None
+
+        session_id = str(session['id'])
+        if self.render_scheduler.result(session_id, session['mtime']):
+            # Рендер был, но файл кеша с тех пор удален
+            self.render_scheduler.cancel(session_id)
+        self.schedule_plot(session, name, priority)
+        return None
+
+    def _remote_player(self, session):
+        """Игрок другого монитора, которому принадлежит сессия, или None"""
+        player = self.players.get(session.get('player'))
+        if player is None or player.peer is None or self.peer_sync is None:
+            return None
+        return player
+
+    def schedule_plot(self, session, name, priority, order=0):
+        """Постановка рендеринга графика сессии в очередь"""
+        session_id = str(session['id'])
+        mtime = session['mtime']
+        # Видимые сессии оставляем в памяти, фоновые — только рисуем
+        keep = priority == PRIORITY_VISIBLE
+        self.render_scheduler.submit(
+            session_id, mtime, priority,
+            lambda: self._render_session(session_id, mtime, name, keep),
+            order=order,
+        )
+
+    def _render_session(self, session_id, mtime, name, keep):
+        """Задание очереди: загрузка сессии и рендеринг графика в кеш"""
+        if keep:
+            data = self.get_session_data(session_id, mtime)
+        else:
+            data = self.file_data.get(session_id)
+            if data is None or data['mtime'] < mtime:
+                pair = self.session_files.get(session_id)
+                data = self.load_csv_pair(pair, store=False) if pair else None
+        if data is None:
+            return False
+        rendered = bool(self.create_plot_image(data, name))
+        # Пирамида для масштабирования строится заранее, пока данные в памяти
+        self.ensure_pyramid(session_id, mtime, data)
+        if rendered:
+            # Ожидающий график готов — клиенту нужно перечитать страницу
+            self.touch_data()
+        return rendered
+
+    def _pyramid_file(self, session_id, mtime):
+        """Файл пирамиды сессии в папке кеша (ID в начале имени, как у графиков)"""
+        key = hashlib.md5(json.dumps({'id': str(session_id), 'mtime': mtime, 'pyramid': PYRAMID_VERSION},
+                                     sort_keys=True).encode()).hexdigest()
+        return self.cache_dir / f"{session_id}_{key}.pyr"
+
+    def ensure_pyramid(self, session_id, mtime, data=None):
+        """Пирамида min/max/mean по истории сессии; строится при первом обращении"""
+        path = self._pyramid_file(session_id, mtime)
+        with self._pyramid_lock:
+            if path.exists():
+                # Время использования для лимита пирамид: вытесняются давно не открытые
+                os.utime(path)
+            else:
+                if data is None:
+                    data = self.get_session_data(session_id, mtime)
+                if data is None or data.get('history_data') is None:
+                    return None
+                try:
+                    write_pyramid(path, build_pyramid(data['history_data']))
+                except Exception as e:
+                    print(f"Ошибка построения пирамиды для {session_id}: {e}")
+                    return None
+                # Пирамиды прошлых версий файлов сессии больше не нужны
+                for stale in self.cache_dir.glob(f"{session_id}_*.pyr"):
+                    if stale != path:
+                        stale.unlink(missing_ok=True)
+                self._cleanup_cache(is_pyramid_file, self.pyramid_cache_max_files)
+        return PyramidFile(path)
+
+    def generate_series_data(self, session_id, start=0, stop=None, px=1000):
+        """Ряды интервалов и avg-метрик для диапазона нажатий в разрешении px точек"""
+        sessions = self.catalog.list_sessions(ids=[session_id])
+        if not sessions:
+            return None
+        session = sessions[0]
+        remote = self._remote_player(session)
+        if remote is not None:
+            return self.peer_sync.fetch_series(remote, split_session_id(session['id'])[1], start, stop, px)
+        pyramid = self.ensure_pyramid(str(session['id']), session['mtime'])
+        if pyramid is None:
+            return None
+        data = pyramid.query(start, pyramid.press_count if stop is None else stop, px)
+        data['id'] = str(session['id'])
+        return data
+
+    def generate_segments_data(self, session_id, break_ms=None, break_factor=None):
+        """Серии нажатий между паузами; без параметров — готовое разбиение из загрузки"""
+        sessions = self.catalog.list_sessions(ids=[session_id])
+        if not sessions:
+            return None
+        session = sessions[0]
+        remote = self._remote_player(session)
+        if remote is not None:
+            return self.peer_sync.fetch_session_json(remote, split_session_id(session['id'])[1], 'segments',
+                                                     {'break_ms': break_ms, 'factor': break_factor})
+        data = self.get_session_data(str(session['id']), session['mtime'])
+        if data is None or data.get('history_data') is None:
+            return None
+        if break_ms is None and break_factor is None and data.get('segments') is not None:
+            streams, threshold = data['segments']
+        else:
+            history_df = data['history_data']
+            options = {'break_ms': break_ms}
+            if break_factor is not None:
+                options['break_factor'] = break_factor
+            streams, threshold = segment_history(history_df['Interval_ms'].to_numpy(),
+                                                 history_df['ZX_avg'].to_numpy(), **options)
+        payload = segments_payload(streams, threshold)
+        payload['id'] = str(session['id'])
+        payload['press_count'] = len(data['history_data'])
+        return payload
+
+    def generate_distribution_data(self, metric, bpm, value=None, player=None):
+        """Квантили метрики по сессиям BPM окна и, если задано value, его процентиль"""
+        bucket = bpm_bucket_for(bpm)
+        sketch = self.catalog.distribution(metric, bucket, player)
+        data = {
+            "metric": metric,
+            "bpm_center": bucket,
+            "player": player,
+            "count": sketch.n if sketch is not None else 0,
+            "quantiles": {f"p{q}": self._quantile(sketch, q / 100) for q in (5, 25, 50, 75, 95)},
+        }
+        if value is not None:
+            data["percentile"] = self._percentile(sketch, value)
+        return data
+
+    @staticmethod
+    def _quantile(sketch, q):
+        """Значение квантиля распределения или None"""
+        return round(sketch.quantile(q), 3) if sketch is not None else None
+
+    @staticmethod
+    def _percentile(sketch, value):
+        """Процент значений распределения ниже value или None"""
+        if sketch is None or value is None:
+            return None
+        return round(sketch.rank(value) * 100, 1)
+
+    def generate_percentiles_data(self, session_id):
+        """Место сессии в распределениях своего игрока при ее BPM
+
+        Для UR на окнах рекордов — процент сессий с меньшим UR; для разброса
+        интервалов — медиана сессии и ее процентиль среди всех нажатий окна
+        (скетч истории появляется, когда сессия загружена хотя бы раз).
+        """
+        sessions = self.catalog.list_sessions(ids=[session_id])
+        if not sessions:
+            return None
+        session = sessions[0]
+        bucket = session['bpm_bucket']
+        data = {"id": str(session['id']), "player": session['player'], "bpm_center": bucket}
+        for window_size in RECORD_WINDOW_SIZES:
+            value = session[f'ur_{window_size}']
+            sketch = self.catalog.distribution(f'ur_{window_size}', bucket, session['player'])
+            data[f"ur_{window_size}"] = {
+                "value": value,
+                "percentile": self._percentile(sketch, value),
+                "median": self._quantile(sketch, 0.5),
+                "count": sketch.n if sketch is not None else 0,
+            }
+        own = self.catalog.session_sketch(str(session['id']), 'jitter')
+        sketch = self.catalog.distribution('jitter', bucket, session['player'])
+        own_median = self._quantile(own, 0.5)
+        data["jitter"] = {
+            "value": own_median,
+            "percentile": self._percentile(sketch, own_median),
+            "median": self._quantile(sketch, 0.5),
+            "count": sketch.n if sketch is not None else 0,
+        }
+        return data
+
+    def generate_compare_data(self, session_ids, px=600):
+        """Наложение нескольких сессий: ряды на общей сетке нажатий и кривые лучших окон
+
+        Ответ кешируется по набору ID и mtime их файлов, поэтому повторное
+        открытие того же сравнения ничего не пересчитывает. Возвращает JSON (bytes)
+        или None, если какой-то сессии нет в каталоге.
+        """
+        session_ids = list(dict.fromkeys(str(i) for i in session_ids))
+        return self.flights.do(('compare', tuple(session_ids), px),
+                               lambda: self._compare_data(session_ids, px))
+
+    def _compare_data(self, session_ids, px):
+        sessions = {str(s['id']): s for s in self.catalog.list_sessions(ids=session_ids)}
+        if len(sessions) != len(session_ids):
+            return None
+        # Имена тоже в ключе: переименование не должно отдавать старую подпись
+        cache_key = (tuple((i, sessions[i]['mtime'], self.names.get(i)) for i in session_ids), px)
+        with self._compare_lock:
+            cached = self.compare_cache.get(cache_key)
+            if cached is not None:
+                self.compare_cache.move_to_end(cache_key)
+                return cached
+
+        pyramids = {}
+        for session_id in session_ids:
+            pyramid = self.ensure_pyramid(session_id, sessions[session_id]['mtime'])
+            if pyramid is None:
+                return None
+            pyramids[session_id] = pyramid
+
+        # Общий уровень по самой длинной сессии — корзины всех рядов одного размера
+        longest = max(pyramids.values(), key=lambda p: p.press_count)
+        level = longest.level_for(0, longest.press_count, px)
+        best = self.catalog.best_windows(session_ids)
+
+        compare = []
+        for session_id in session_ids:
+            series = pyramids[session_id].query(0, pyramids[session_id].press_count, px, level)
+            filename = datetime.fromtimestamp(sessions[session_id]['created']).strftime("%Y-%m-%d %H:%M:%S")
+            compare.append({
+                "id": session_id,
+                "player": sessions[session_id]['player'],
+                "name": self.names.get(session_id, filename),
+                "mean_bpm": sessions[session_id]['mean_bpm'],
+                "press_count": series['press_count'],
+                "bucket": series['bucket'],
+                "x_start": series['x_start'],
+                "bpm": series['series']['BPM_avg']['mean'],
+                "ur": series['series']['UR_avg']['mean'],
+                "interval": series['series']['Interval_ms']['mean'],
+                "best_bpm": [[w, bpm] for w, bpm, ur, zx in best[session_id]['BPM']],
+                "best_ur": [[w, ur] for w, bpm, ur, zx in best[session_id]['UR']],
+            })
+
+        body = json.dumps({"px": px, "sessions": compare}).encode()
+        with self._compare_lock:
+            self.compare_cache[cache_key] = body
+            while len(self.compare_cache) > self.compare_cache_size:
+                self.compare_cache.popitem(last=False)
+        return body
+
+    @property
+    def snapshot(self):
+        """Текущий неизменяемый снимок данных (см. snapshot.py)"""
+        return self.snapshots.current
+
+    @property
+    def data_version(self):
+        return self.snapshots.current.version
+
+    @property
+    def data_updated_at(self):
+        return self.snapshots.current.updated_at
+
+    def page_version(self, snapshot, player=None):
+        """Версия ответа, читающего каталог на ходу: версия снимка и номер изменения каталога"""
+        return f"{snapshot.version}-{self.catalog.seq(player)}"
+
+    def consistent_build(self, snapshot, player, build, attempts=3):
+        """(версия, build()) без записей в каталог во время сборки
+
+        Снимок не содержит список сессий, поэтому build читает каталог на ходу.
+        Номер изменения растет в транзакции записи: если он тот же до и после
+        сборки, ответ точно соответствует версии. Если каталог все попытки
+        менялся, версия None — такой ответ отдается без ETag.
+        """
+        for _ in range(attempts):
+            version = self.page_version(snapshot, player)
+            result = build(version)
+            if self.page_version(snapshot, player) == version:
+                return version, result
+        return None, result
+
+    def touch_data(self):
+        """Отметка об изменении данных: публикация нового снимка"""
+        self.snapshots.publish()
+
+    def schedule_backfill(self):
+        """Фоновая дорисовка графиков самых новых сессий с низким приоритетом"""
+        sessions = self.catalog.list_sessions(limit=min(self.backfill_limit, self.cache_max_files // 2))
+        for order, session in enumerate(sessions):
+            if self._remote_player(session) is not None:
+                # Графики других мониторов скачиваются только по запросу
+                continue
+            name = self.display_name(session)
+            if not self._plot_cache_file(session, name).exists():
+                self.schedule_plot(session, name, PRIORITY_BACKFILL, order=order)
+
+    def display_name(self, session, names=None):
+        """Имя сессии: из словаря, с другого монитора (в каталоге) или дата"""
+        names = self.names if names is None else names
+        return (names.get(str(session['id'])) or session['name']
+                or datetime.fromtimestamp(session['created']).strftime("%Y-%m-%d %H:%M:%S"))
+
+    def _records_key(self, player=None):
+        """Ключ графика рекордов в очереди: общий или одного игрока"""
+        return 'records' if player is None else f'records:{player}'
+
+    def schedule_records_chart(self, player=None):
+        """Постановка графика рекордов (общего или игрока) в очередь для текущей версии каталога"""
+        self.render_scheduler.submit(
+            self._records_key(player), self.catalog.version(player), PRIORITY_RECORDS,
+            lambda: self.create_records_charts(self.generate_records_data(player)),
+        )
+
+    def get_records_payload(self, player=None, snapshot=None):
+        """Таблица рекордов из снимка и график (последний готовый, если актуальный еще рисуется)"""
+        snapshot = snapshot or self.snapshot
+        key = ('records', player, snapshot.version)
+        return self.flights.do(key, lambda: self._records_payload(player, snapshot))
+
+    def records_chart_ready(self, player=None):
+        """Нарисован ли график рекордов для текущей версии каталога"""
+        return self.render_scheduler.result(self._records_key(player), self.catalog.version(player)) is not None
+
+    def _records_payload(self, player, snapshot):
+        records_data = snapshot.records.get(player, ())
+        key = self._records_key(player)
+        charts = self.render_scheduler.result(key, self.catalog.version(player))
+        if charts is None:
+            self.schedule_records_chart(player)
+            charts = self.render_scheduler.latest_result(key) or ""
+        return records_data, charts
+
+    def _cleanup_cache(self, match=is_plot_file, max_files=None):
+        """Очистка старых файлов кеша одного вида (по умолчанию — графиков сессий)"""
+        try:
+            for name in prune_cache(self.cache_dir, self.cache_max_files if max_files is None else max_files, match):
+                print(f"Удален старый файл кеша: {name}")
+        except OSError as e:
             print(f"Ошибка очистки кеша: {e}")
 
     def _cleanup_cache_for_session(self, session_id):
         """Очистка файлов кеша для конкретной сессии"""
+        self._cleanup_cache_for_sessions([session_id])
+
+    def _cleanup_cache_for_sessions(self, session_ids):
+        """Очистка файлов кеша для набора сессий за один проход по папке кеша
+
+        Остальные графики не трогаем: ID сессии записан в начале имени файла.
+        """
+        session_ids = {str(session_id) for session_id in session_ids}
         try:
-            cache_files = list(self.cache_dir.glob("*.txt"))
             removed_count = 0
-
-            for cache_file in cache_files:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.split('_', 1)[0] not in session_ids:
+                    continue
                 try:
-                    # Читаем содержимое файла, чтобы проверить связь с сессией
-                    # Альтернативно можно использовать имя файла, если в нём есть ID
-                    # Но для надежности удаляем все файлы кеша при удалении сессии
-                    cache_file.unlink()
+                    os.unlink(entry.path)
                     removed_count += 1
                 except Exception as e:
-                    print(f"Ошибка удаления файла кеша {cache_file}: {e}")
+                    print(f"Ошибка удаления файла кеша {entry.name}: {e}")
 
             if removed_count > 0:
-                print(f"Удалено {removed_count} файлов кеша для сессии {session_id}")
+                print(f"Удалено {removed_count} файлов кеша для {len(session_ids)} сессий")
 
         except Exception as e:
-            print(f"Ошибка очистки кеша для сессии {session_id}: {e}")
-
-    def generate_initial_html(self):
-        """Создание начальной HTML страницы"""
-        html_content = f"""
-<!DOCTYPE html>
+            print(f"Ошибка очистки кеша для сессий: {e}")
+
+    def build_web_assets(self):
+        """Страница, стили и скрипт интерфейса — собираются один раз при запуске
+
+        Изменяемое состояние страница получает только через API, поэтому
+        монитору не нужно ничего перезаписывать на диске для интерфейса.
+        """
+        css_path = self.web_assets.add_immutable(
+            "app", ".css", self._page_css().encode(), 'text/css; charset=utf-8')
+        js_path = self.web_assets.add_immutable(
+            "app", ".js", self._page_js().encode(), 'application/javascript; charset=utf-8')
+        self.web_assets.add("/", self._page_html(css_path, js_path).encode(), 'text/html; charset=utf-8')
+        self.web_assets.alias("/index.html", "/")
+
+    def _page_html(self, css_path, js_path):
+        """Разметка страницы с вкладками"""
+        # Выбор игрока виден, только если игроков несколько; в режиме
+        # агрегатора список пополняется на лету (см. syncPlayers)
+        options = "".join(f'<option value="{name}">{name}</option>' for name in self.players)
+        hidden = '' if len(self.players) > 1 else ' style="display: none"'
+        player_filter = f"""
+        <div class="player-filter"{hidden}>
+            <label for="player-select">Игрок:</label>
+            <select id="player-select" onchange="changePlayer(this.value)">
+                <option value="">Все игроки</option>{options}
+            </select>
+        </div>"""
+        return f"""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <meta http-equiv="cache-control" content="no-cache">
-    <meta http-equiv="expires" content="0">
-    <meta http-equiv="pragma" content="no-cache">
     <title>BPM/UR Stats Monitor</title>
-    <style>
-        body {{
-            background-color: #2b2b2b;
-            color: #cccccc;
-            font-family: Arial, sans-serif;
-            margin: 0;
-            padding: 20px;
-            text-align: center;
-        }}
-        .header {{
-            margin-bottom: 30px;
-        }}
-        .waiting {{
-            background-color: #363636;
-            border-radius: 10px;
-            padding: 30px;
-            margin: 20px auto;
-            max-width: 600px;
-            box-shadow: 0 4px 8px rgba(0,0,0,0.3);
-        }}
-        .bpm-color {{ color: #ff69b4; }}
-        .ur-color {{ color: #40e0d0; }}
-        .xz-color {{ color: #cc8800; }}
-        .loading {{
-            animation: pulse 2s infinite;
-        }}
-        @keyframes pulse {{
-            0% {{ opacity: 1; }}
-            50% {{ opacity: 0.5; }}
-            100% {{ opacity: 1; }}
-        }}
-        .delete-btn {{
-            position: absolute;
-            top: 10px;
-            right: 10px;
-            background: #d32f2f;
-            color: white;
-            border: none;
-            border-radius: 3px;
-            padding: 5px 8px;
-            font-size: 12px;
-            cursor: pointer;
-            opacity: 0.7;
-            transition: opacity 0.3s;
-        }}
-        .delete-btn:hover {{
-            opacity: 1;
-        }}
-        .plot-container {{
-            position: relative;
-        }}
-    </style>
+    <link rel="stylesheet" href="{css_path}">
 </head>
 <body>
     <div class="header">
         <h1>BPM/UR Stats Analyzer</h1>
-        <p><span class="bpm-color">● BPM Performance</span> | <span class="ur-color">● UR Performance</span> | <span class="xz-color">● ZX Balance</span></p>
+        <div class="stats">
+            <span class="bpm-color">● BPM Performance</span> |
+            <span class="ur-color">● UR Performance</span> |
+            <span class="xz-color">● ZX Balance</span>
+        </div>{player_filter}
     </div>
 
-    <div class="waiting">
-        <h2 class="loading">Ожидание данных...</h2>
-        <p>Мониторинг папки <code>samples/</code></p>
-        <p>Запустите вашу Rust программу для генерации CSV файлов</p>
-        <p>Страница обновляется автоматически каждые 2 секунды</p>
-        <p style="margin-top: 20px; color: #888; font-size: 0.9em;">
-            Время запуска: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-        </p>
+    <div class="tabs">
+        <button class="tab active" onclick="showTab('sessions')">Сессии</button>
+        <button class="tab" onclick="showTab('records')">Таблица рекордов</button>
+        <button class="tab" onclick="showTab('trends')">Прогресс</button>
+        <button class="tab" onclick="showTab('live')">Live</button>
     </div>
-</body>
-</html>
-"""
 
-        # Сохраняем HTML файл
-        with open("web_output/index.html", "w", encoding="utf-8") as f:
-            f.write(html_content)
+    <div class="tab-content">
+        <!-- Вкладка сессий -->
+        <div id="sessions-tab" class="tab-pane active">
+            <div class="sessions-toolbar">
+                <button id="compare-selected" class="toolbar-btn compare-btn" onclick="openCompare()" disabled>Сравнить выбранные</button>
+                <button id="delete-selected" class="toolbar-btn" onclick="deleteSelected()" disabled>Удалить выбранные</button>
+                <label for="sort-select">Сортировка:</label>
+                <select id="sort-select" onchange="changeSort(this.value)">
+                    <option value="newest">Сначала новые</option>
+                    <option value="oldest">Сначала старые</option>
+                    <option value="bpm_desc">BPM по убыванию</option>
+                    <option value="bpm_asc">BPM по возрастанию</option>
+                </select>
+            </div>
+            <div class="grid" id="plots-container">
+                <div class="waiting">
+                    <h2 class="loading">Загрузка данных...</h2>
+                    <p>Ожидание графиков</p>
+                </div>
+            </div>
+            <div id="plots-sentinel"></div>
+        </div>
 
-    def generate_html_page(self):
-        """Генерация HTML страницы с вкладками"""
-        # Сортируем файлы по времени изменения (новые сверху)
-        sorted_files = sorted(self.file_data.items(),
-                            key=lambda x: x[1]['mtime'],
-                            reverse=True)
+        <!-- Вкладка прогресса -->
+        <div id="trends-tab" class="tab-pane">
+            <div class="sessions-toolbar">
+                <label for="period-select">Период:</label>
+                <select id="period-select" onchange="changePeriod(this.value)">
+                    <option value="day">По дням</option>
+                    <option value="week">По неделям</option>
+                </select>
+            </div>
+            <div class="waiting" id="trends-waiting">
+                <h2 class="loading">Загрузка прогресса...</h2>
+                <p>Сводки по дням и неделям</p>
+            </div>
+            <div id="trends-content" style="display: none;">
+                <canvas id="trends-chart" class="live-chart" width="1200" height="320"></canvas>
+                <table class="records-table">
+                    <thead>
+                        <tr>
+                            <th>Период</th>
+                            <th>Сессий</th>
+                            <th>Нажатий</th>
+                            <th>Лучший BPM</th>
+                            <th>Лучший UR@100</th>
+                            <th>Лучший UR@200</th>
+                            <th>Лучший UR@500</th>
+                            <th>Лучший UR@1000</th>
+                            <th>ZX баланс</th>
+                        </tr>
+                    </thead>
+                    <tbody id="trends-tbody">
+                    </tbody>
+                </table>
+            </div>
+        </div>
 
-        # Ограничиваем количество отображаемых файлов
-        files_to_show = sorted_files[:self.max_files]
+        <!-- Вкладка живой сессии -->
+        <div id="live-tab" class="tab-pane">
+            <div class="waiting" id="live-waiting">
+                <h2 class="loading">Ожидание нажатий...</h2>
+                <p>Запустите анализатор: нажатия приходят через <code>live.sock</code></p>
+            </div>
+            <div id="live-content" style="display: none;">
+                <div class="stats" id="live-summary"></div>
+                <canvas id="live-chart" class="live-chart" width="1200" height="320"></canvas>
+                <table class="records-table">
+                    <thead>
+                        <tr>
+                            <th>Окно</th>
+                            <th>Текущий BPM</th>
+                            <th>Текущий UR</th>
+                            <th>Интервал мин/макс</th>
+                            <th>Лучший BPM</th>
+                            <th>Лучший UR</th>
+                            <th>Лучший ZX</th>
+                        </tr>
+                    </thead>
+                    <tbody id="live-tbody">
+                    </tbody>
+                </table>
+            </div>
+        </div>
 
-        html_content = f"""
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <meta http-equiv="cache-control" content="no-cache">
-    <meta http-equiv="expires" content="0">
-    <meta http-equiv="pragma" content="no-cache">
-    <title>BPM/UR Stats Monitor</title>
-    <style>
-        body {{
+        <!-- Вкладка рекордов -->
+        <div id="records-tab" class="tab-pane">
+            <div class="waiting" id="records-waiting">
+                <h2 class="loading">Загрузка рекордов...</h2>
+                <p>Анализ данных</p>
+            </div>
+            <div id="records-content" style="display: none;">
+                <div class="records-charts">
+                    <img id="records-charts-img" src="" alt="Графики рекордов">
+                </div>
+                <table class="records-table" id="records-table">
+                    <thead>
+                        <tr>
+                            <th>BPM (±5)</th>
+                            <th>Записей</th>
+                            <th>Лучший UR@100</th>
+                            <th>Лучший UR@200</th>
+                            <th>Лучший UR@500</th>
+                            <th>Лучший UR@1000</th>
+                        </tr>
+                    </thead>
+                    <tbody id="records-tbody">
+                    </tbody>
+                </table>
+            </div>
+        </div>
+    </div>
+
+    <!-- Масштабируемый график интервалов -->
+    <div id="zoom-overlay" class="zoom-overlay" onclick="if (event.target === this) closeZoom()">
+        <div class="zoom-panel">
+            <div class="zoom-header">
+                <h3 id="zoom-title"></h3>
+                <span id="zoom-info"></span>
+                <button class="toolbar-btn" onclick="closeZoom()">✗</button>
+            </div>
+            <canvas id="zoom-chart" width="1200" height="420"></canvas>
+            <p>Колесо мыши — масштаб, перетаскивание — сдвиг, двойной щелчок — вся сессия</p>
+        </div>
+    </div>
+
+    <!-- Сравнение нескольких сессий -->
+    <div id="compare-overlay" class="zoom-overlay" onclick="if (event.target === this) closeCompare()">
+        <div class="zoom-panel compare-panel">
+            <div class="zoom-header">
+                <h3>Сравнение сессий</h3>
+                <div id="compare-legend" class="compare-legend"></div>
+                <button class="toolbar-btn" onclick="closeCompare()">✗</button>
+            </div>
+            <h4 class="bpm-color">BPM (скользящее среднее)</h4>
+            <canvas id="compare-bpm" width="1200" height="220"></canvas>
+            <h4 class="ur-color">UR (скользящее среднее)</h4>
+            <canvas id="compare-ur" width="1200" height="220"></canvas>
+            <h4>Лучший UR по размеру окна</h4>
+            <canvas id="compare-best" width="1200" height="220"></canvas>
+        </div>
+    </div>
+
+    <script src="{js_path}"></script>
+</body>
+</html>
+"""
+
+    def _page_css(self):
+        """Стили страницы (темная тема)"""
+        return """
+        body {
             background-color: #2b2b2b;
             color: #cccccc;
             font-family: Arial, sans-serif;
             margin: 0;
             padding: 20px;
-        }}
-        .header {{
+        }
+        .header {
             text-align: center;
             margin-bottom: 30px;
-        }}
-        .stats {{
+        }
+        .stats {
             background-color: #404040;
             padding: 10px;
             border-radius: 5px;
             margin-bottom: 15px;
             text-align: center;
-        }}
-        .bpm-color {{ color: #ff69b4; }}
-        .ur-color {{ color: #40e0d0; }}
-        .xz-color {{ color: #cc8800; }}
+        }
+        .bpm-color { color: #ff69b4; }
+        .ur-color { color: #40e0d0; }
+        .xz-color { color: #cc8800; }
 
         /* Стили для вкладок */
-        .tabs {{
+        .tabs {
             display: flex;
             background-color: #363636;
             border-radius: 8px 8px 0 0;
             margin-bottom: 0;
             overflow: hidden;
-        }}
-        .tab {{
+        }
+        .tab {
             flex: 1;
             padding: 15px 20px;
             background-color: #363636;
@@ -727,72 +1206,76 @@ class WebCSVMonitor:
             font-size: 16px;
             transition: background-color 0.3s;
             text-align: center;
-        }}
-        .tab:hover {{
+        }
+        .tab:hover {
             background-color: #404040;
-        }}
-        .tab.active {{
+        }
+        .tab.active {
             background-color: #2b2b2b;
             color: #ffaa44;
             font-weight: bold;
-        }}
-        .tab-content {{
+        }
+        .tab-content {
             background-color: #2b2b2b;
             border-radius: 0 0 8px 8px;
             padding: 20px;
             min-height: 500px;
-        }}
-        .tab-pane {{
+        }
+        .tab-pane {
             display: none;
-        }}
-        .tab-pane.active {{
+        }
+        .tab-pane.active {
             display: block;
-        }}
+        }
 
         /* Стили для сессий */
-        .grid {{
+        .grid {
             display: grid;
             grid-template-columns: 1fr 1fr;
             gap: 15px;
-        }}
-        @media (max-width: 1400px) {{
-            .grid {{
+        }
+        @media (max-width: 1400px) {
+            .grid {
                 grid-template-columns: 1fr;
-            }}
-        }}
-        .plot-container {{
+            }
+        }
+        .plot-container {
             background-color: #363636;
             border-radius: 10px;
             padding: 15px;
             box-shadow: 0 4px 8px rgba(0,0,0,0.3);
             position: relative;
-        }}
-        .plot-image {{
+        }
+        .plot-image {
             width: 100%;
             height: auto;
             border-radius: 5px;
-        }}
-        .timestamp {{
+        }
+        .plot-image.loading {
+            min-height: 300px;
+            background-color: #2b2b2b;
+        }
+        .timestamp {
             font-size: 0.8em;
             color: #888;
             margin-top: 10px;
             text-align: center;
-        }}
-        .plot-title {{
+        }
+        .plot-title {
             text-align: center;
             margin: 5px 0 10px 0;
             padding: 5px;
             border-radius: 3px;
             transition: background-color 0.3s;
-        }}
-        .plot-title:hover {{
+        }
+        .plot-title:hover {
             background-color: #444;
-        }}
-        .plot-title:focus {{
+        }
+        .plot-title:focus {
             background-color: #555;
             outline: none;
-        }}
-        .delete-btn {{
+        }
+        .delete-btn {
             position: absolute;
             top: 10px;
             right: 10px;
@@ -805,11 +1288,11 @@ class WebCSVMonitor:
             cursor: pointer;
             opacity: 0.7;
             transition: opacity 0.3s;
-        }}
-        .delete-btn:hover {{
+        }
+        .delete-btn:hover {
             opacity: 1;
-        }}
-        .ur-stats {{
+        }
+        .ur-stats {
             background-color: #404040;
             border-radius: 5px;
             padding: 8px;
@@ -819,8 +1302,8 @@ class WebCSVMonitor:
             justify-content: center;
             gap: 10px;
             flex-wrap: wrap;
-        }}
-        .ur-value {{
+        }
+        .ur-value {
             color: #40e0d0;
             font-weight: bold;
             font-size: 13px;
@@ -829,125 +1312,179 @@ class WebCSVMonitor:
             border-radius: 3px;
             border: 1px solid #40e0d0;
             transition: all 0.3s ease;
-        }}
-        .ur-value.record {{
+        }
+        .ur-value.record {
             background: linear-gradient(45deg, #ffd700, #ffed4a);
             color: #2b2b2b;
             border: 2px solid #ffd700;
             box-shadow: 0 0 10px rgba(255, 215, 0, 0.5);
             animation: glow 2s ease-in-out infinite alternate;
-        }}
-        @keyframes glow {{
-            from {{ box-shadow: 0 0 5px rgba(255, 215, 0, 0.5); }}
-            to {{ box-shadow: 0 0 15px rgba(255, 215, 0, 0.8); }}
-        }}
+        }
+        @keyframes glow {
+            from { box-shadow: 0 0 5px rgba(255, 215, 0, 0.5); }
+            to { box-shadow: 0 0 15px rgba(255, 215, 0, 0.8); }
+        }
 
         /* Стили для таблицы рекордов */
-        .records-table {{
+        .records-table {
             width: 100%;
             border-collapse: collapse;
             margin: 20px 0;
             background-color: #363636;
             border-radius: 8px;
             overflow: hidden;
-        }}
-        .records-table th, .records-table td {{
+        }
+        .records-table th, .records-table td {
             padding: 12px;
             text-align: center;
             border-bottom: 1px solid #555;
-        }}
-        .records-table th {{
+        }
+        .records-table th {
             background-color: #404040;
             color: #ffaa44;
             font-weight: bold;
-        }}
-        .records-table tr:hover {{
+        }
+        .records-table tr:hover {
             background-color: #404040;
-        }}
-        .records-charts {{
+        }
+        .live-chart {
+            width: 100%;
+            background-color: #363636;
+            border-radius: 8px;
+        }
+        .records-charts {
             text-align: center;
             margin: 20px 0;
-        }}
-        .records-charts img {{
+        }
+        .records-charts img {
             max-width: 100%;
             border-radius: 8px;
             box-shadow: 0 4px 8px rgba(0,0,0,0.3);
-        }}
-        .waiting {{
+        }
+        .waiting {
             text-align: center;
             padding: 40px;
             color: #888;
-        }}
-        .loading {{
+        }
+        .player-filter {
+            margin-top: 10px;
+        }
+        .player-tag {
+            color: #ffaa44;
+            font-size: 12px;
+            margin-left: 8px;
+        }
+        .sessions-toolbar {
+            display: flex;
+            justify-content: flex-end;
+            align-items: center;
+            gap: 10px;
+            margin-bottom: 15px;
+        }
+        .toolbar-btn {
+            background: #d32f2f;
+            color: white;
+            border: none;
+            border-radius: 3px;
+            padding: 5px 10px;
+            cursor: pointer;
+        }
+        .toolbar-btn:disabled {
+            background: #555;
+            cursor: default;
+        }
+        .zoom-btn {
+            position: absolute;
+            top: 10px;
+            right: 45px;
+            background: #404040;
+            color: white;
+            border: none;
+            border-radius: 3px;
+            padding: 5px 8px;
+            font-size: 12px;
+            cursor: pointer;
+        }
+        .compare-btn {
+            background: #1976d2;
+        }
+        .compare-legend span {
+            margin: 0 10px;
+            font-weight: bold;
+        }
+        .compare-panel h4 {
+            margin: 15px 0 5px 0;
+        }
+        .zoom-overlay {
+            display: none;
+            position: fixed;
+            inset: 0;
+            background: rgba(0, 0, 0, 0.7);
+            z-index: 10;
+        }
+        .zoom-panel {
+            background: #2b2b2b;
+            margin: 40px auto;
+            max-width: 1250px;
+            padding: 15px;
+            border-radius: 8px;
+        }
+        .zoom-panel canvas {
+            width: 100%;
+            background-color: #363636;
+            border-radius: 8px;
+            cursor: grab;
+        }
+        .zoom-header {
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+            margin-bottom: 10px;
+        }
+        .select-box {
+            position: absolute;
+            top: 12px;
+            left: 12px;
+            width: 18px;
+            height: 18px;
+            cursor: pointer;
+        }
+        .sessions-toolbar select {
+            background-color: #363636;
+            color: #cccccc;
+            border: 1px solid #666;
+            border-radius: 3px;
+            padding: 5px 8px;
+        }
+        #plots-sentinel {
+            text-align: center;
+            padding: 20px;
+            color: #888;
+        }
+        .loading {
             animation: pulse 2s infinite;
-        }}
-        @keyframes pulse {{
-            0% {{ opacity: 1; }}
-            50% {{ opacity: 0.5; }}
-            100% {{ opacity: 1; }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>BPM/UR Stats Analyzer</h1>
-        <div class="stats">
-            <span class="bpm-color">● BPM Performance</span> |
-            <span class="ur-color">● UR Performance</span> |
-            <span class="xz-color">● ZX Balance</span> |
-            Обновлено: {datetime.now().strftime("%H:%M:%S")} |
-            Файлов: {len(files_to_show)} | v{int(datetime.now().timestamp())}
-        </div>
-    </div>
-
-    <div class="tabs">
-        <button class="tab active" onclick="showTab('sessions')">Сессии</button>
-        <button class="tab" onclick="showTab('records')">Таблица рекордов</button>
-    </div>
-
-    <div class="tab-content">
-        <!-- Вкладка сессий -->
-        <div id="sessions-tab" class="tab-pane active">
-            <div class="grid" id="plots-container">
-                <div class="waiting">
-                    <h2 class="loading">Загрузка данных...</h2>
-                    <p>Ожидание графиков</p>
-                </div>
-            </div>
-        </div>
-
-        <!-- Вкладка рекордов -->
-        <div id="records-tab" class="tab-pane">
-            <div class="waiting" id="records-waiting">
-                <h2 class="loading">Загрузка рекордов...</h2>
-                <p>Анализ данных</p>
-            </div>
-            <div id="records-content" style="display: none;">
-                <div class="records-charts">
-                    <img id="records-charts-img" src="" alt="Графики рекордов">
-                </div>
-                <table class="records-table" id="records-table">
-                    <thead>
-                        <tr>
-                            <th>BPM (±5)</th>
-                            <th>Записей</th>
-                            <th>Лучший UR@100</th>
-                            <th>Лучший UR@200</th>
-                            <th>Лучший UR@500</th>
-                            <th>Лучший UR@1000</th>
-                        </tr>
-                    </thead>
-                    <tbody id="records-tbody">
-                    </tbody>
-                </table>
-            </div>
-        </div>
-    </div>
+        }
+        @keyframes pulse {
+            0% { opacity: 1; }
+            50% { opacity: 0.5; }
+            100% { opacity: 1; }
+        }
+"""
 
-    <script>
+    def _page_js(self):
+        """Скрипт страницы: загрузка сессий, вкладки, действия пользователя"""
+        return f"""
+        const PAGE_SIZE = {self.max_files};
         let lastVersion = 0;
         let lastRecordsUpdate = 0;
         let currentTab = 'sessions';
+        let currentSort = 'newest';
+        let currentPlayer = '';
+        let hasMore = true;
+        let loadingPage = false;
+        let lastLiveVersion = -1;
+        let currentPeriod = 'day';
+        let lastTrendsKey = '';
 
         function showTab(tabName) {{
             // Скрываем все вкладки
@@ -967,6 +1504,12 @@ class WebCSVMonitor:
             if (tabName === 'records') {{
                 updateRecords();
             }}
+            if (tabName === 'live') {{
+                updateLive();
+            }}
+            if (tabName === 'trends') {{
+                updateTrends();
+            }}
         }}
 
         function selectText(element) {{
@@ -977,15 +1520,105 @@ class WebCSVMonitor:
             selection.addRange(range);
         }}
 
+        function urTitle(plot, windowSize) {{
+            // Подсказка: место UR сессии среди сессий игрока при том же BPM
+            const pct = plot[`ur_${{windowSize}}_pct`];
+            if (pct === null || pct === undefined) return '';
+            return ` title="Лучше, чем ${{(100 - pct).toFixed(0)}}% сессий при ~${{plot.bpm_center}} BPM"`;
+        }}
+
+        function buildPlotDiv(plot) {{
+            const plotDiv = document.createElement('div');
+            plotDiv.className = 'plot-container';
+            plotDiv.dataset.plotId = plot.id;
+            plotDiv.dataset.timestamp = plot.timestamp;
+            plotDiv.dataset.pending = plot.pending ? '1' : '0';
+            let urInfo = '';
+            if (plot.ur_100 !== null || plot.ur_200 !== null || plot.ur_500 !== null || plot.ur_1000 !== null) {{
+                urInfo = '<div class="ur-stats">';
+                if (plot.ur_100 !== null) {{
+                    const recordClass = plot.ur_100_is_record ? ' record' : '';
+                    urInfo += `<span class="ur-value${{recordClass}}"${{urTitle(plot, 100)}}>UR@100: ${{plot.ur_100.toFixed(1)}}</span>`;
+                }}
+                if (plot.ur_200 !== null) {{
+                    const recordClass = plot.ur_200_is_record ? ' record' : '';
+                    urInfo += `<span class="ur-value${{recordClass}}"${{urTitle(plot, 200)}}>UR@200: ${{plot.ur_200.toFixed(1)}}</span>`;
+                }}
+                if (plot.ur_500 !== null) {{
+                    const recordClass = plot.ur_500_is_record ? ' record' : '';
+                    urInfo += `<span class="ur-value${{recordClass}}"${{urTitle(plot, 500)}}>UR@500: ${{plot.ur_500.toFixed(1)}}</span>`;
+                }}
+                if (plot.ur_1000 !== null) {{
+                    const recordClass = plot.ur_1000_is_record ? ' record' : '';
+                    urInfo += `<span class="ur-value${{recordClass}}"${{urTitle(plot, 1000)}}>UR@1000: ${{plot.ur_1000.toFixed(1)}}</span>`;
+                }}
+                urInfo += '</div>';
+            }}
+
+            plotDiv.innerHTML = `
+                <h3 class="plot-title" contenteditable="true" onblur="renameSession('${{plot.id}}', this.innerText)" onfocus="selectText(this)">${{plot.name}}</h3>
+                <button class="delete-btn" onclick="deleteSession('${{plot.id}}')" title="Удалить сессию">✗</button>
+                <button class="zoom-btn" onclick="openZoom('${{plot.id}}', this.parentElement.querySelector('.plot-title').innerText)" title="Интервалы с масштабированием">🔍</button>
+                <input type="checkbox" class="select-box" onchange="updateSelection()" title="Выбрать для пакетного удаления">
+                ${{urInfo}}
+                <img class="plot-image${{plot.pending ? ' loading' : ''}}" src="${{plotImageSrc(plot)}}" alt="${{plot.pending ? 'Рендеринг графика...' : 'Plot for ' + plot.filename}}">
+                <div class="timestamp">Создан: ${{plot.timestamp}}${{currentPlayer ? '' : `<span class="player-tag">${{plot.player}}</span>`}}</div>
+            `;
+            return plotDiv;
+        }}
+
+        function plotImageSrc(plot) {{
+            return plot.pending ? '' : `data:image/png;base64,${{plot.image}}`;
+        }}
+
+        // Обновляет существующий блок сессии или создает новый
+        function upsertPlot(grid, plot) {{
+            let plotDiv = grid.querySelector(`[data-plot-id="${{plot.id}}"]`);
+            if (plotDiv) {{
+                const existingTimestamp = plotDiv.dataset.timestamp;
+                const wasPending = plotDiv.dataset.pending === '1';
+                if (existingTimestamp !== plot.timestamp || wasPending !== plot.pending) {{
+                    const img = plotDiv.querySelector('.plot-image');
+                    img.src = plotImageSrc(plot);
+                    img.classList.toggle('loading', plot.pending);
+                    plotDiv.querySelector('.timestamp').innerText = `Создан: ${{plot.timestamp}}`;
+                    plotDiv.dataset.timestamp = plot.timestamp;
+                    plotDiv.dataset.pending = plot.pending ? '1' : '0';
+                }}
+                return plotDiv;
+            }}
+            return buildPlotDiv(plot);
+        }}
+
+        async function fetchPage(offset) {{
+            const response = await fetch(`/api/data?offset=${{offset}}&limit=${{PAGE_SIZE}}&sort=${{currentSort}}${{playerQuery()}}`);
+            return await response.json();
+        }}
+
+        function shownPlots() {{
+            return document.querySelectorAll('#plots-container .plot-container');
+        }}
+
+        function updateSentinel() {{
+            const sentinel = document.getElementById('plots-sentinel');
+            sentinel.innerText = hasMore ? 'Загрузка старых сессий...' : '';
+        }}
+
+        // Первая страница опрашивается периодически, старые — подгружаются при прокрутке
         async function updateData() {{
             try {{
-                const response = await fetch('/api/data');
-                const data = await response.json();
+                const data = await fetchPage(0);
 
-                if (data.version <= lastVersion) {{
+                if (data.sort !== currentSort || (data.player || '') !== currentPlayer || data.version <= lastVersion) {{
                     return;
                 }}
                 lastVersion = data.version;
+                syncPlayers(data.players);
+
+                if (data.total === 0) {{
+                    showEmptyState();
+                    return;
+                }}
 
                 // Remove waiting message
                 const waitingDiv = document.querySelector('#sessions-tab .waiting');
@@ -1003,73 +1636,152 @@ class WebCSVMonitor:
                 `;
 
                 const grid = document.getElementById('plots-container');
-                const newPlotIds = new Set(data.plots.map(p => p.id));
 
-                // Remove old plots
-                for (const plotDiv of grid.querySelectorAll('.plot-container')) {{
-                    const plotId = plotDiv.dataset.plotId;
-                    if (!newPlotIds.has(plotId)) {{
-                        grid.removeChild(plotDiv);
-                    }}
+                // Сессий стало меньше, чем показано (удалены вне страницы) — загружаем заново
+                if (shownPlots().length > data.total) {{
+                    resetSessions();
+                    return;
                 }}
 
-                // Add or update plots
+                // Первая страница всегда сверху, в порядке сортировки
                 data.plots.reverse().forEach(plot => {{
-                    let plotDiv = grid.querySelector(`[data-plot-id="${{plot.id}}"]`);
-                    if (plotDiv) {{
-                        const existingTimestamp = plotDiv.dataset.timestamp;
-                        if (existingTimestamp !== plot.timestamp) {{
-                            plotDiv.querySelector('.plot-image').src = `data:image/png;base64,${{plot.image}}`;
-                            plotDiv.querySelector('.timestamp').innerText = `Создан: ${{plot.timestamp}}`;
-                            plotDiv.dataset.timestamp = plot.timestamp;
-                        }}
-                    }} else {{
-                        plotDiv = document.createElement('div');
-                        plotDiv.className = 'plot-container';
-                        plotDiv.dataset.plotId = plot.id;
-                        plotDiv.dataset.timestamp = plot.timestamp;
-                        let urInfo = '';
-                        if (plot.ur_100 !== null || plot.ur_200 !== null || plot.ur_500 !== null || plot.ur_1000 !== null) {{
-                            urInfo = '<div class="ur-stats">';
-                            if (plot.ur_100 !== null) {{
-                                const recordClass = plot.ur_100_is_record ? ' record' : '';
-                                urInfo += `<span class="ur-value${{recordClass}}">UR@100: ${{plot.ur_100.toFixed(1)}}</span>`;
-                            }}
-                            if (plot.ur_200 !== null) {{
-                                const recordClass = plot.ur_200_is_record ? ' record' : '';
-                                urInfo += `<span class="ur-value${{recordClass}}">UR@200: ${{plot.ur_200.toFixed(1)}}</span>`;
-                            }}
-                            if (plot.ur_500 !== null) {{
-                                const recordClass = plot.ur_500_is_record ? ' record' : '';
-                                urInfo += `<span class="ur-value${{recordClass}}">UR@500: ${{plot.ur_500.toFixed(1)}}</span>`;
-                            }}
-                            if (plot.ur_1000 !== null) {{
-                                const recordClass = plot.ur_1000_is_record ? ' record' : '';
-                                urInfo += `<span class="ur-value${{recordClass}}">UR@1000: ${{plot.ur_1000.toFixed(1)}}</span>`;
-                            }}
-                            urInfo += '</div>';
-                        }}
-
-                        plotDiv.innerHTML = `
-                            <h3 class="plot-title" contenteditable="true" onblur="renameSession('${{plot.id}}', this.innerText)" onfocus="selectText(this)">${{plot.name}}</h3>
-                            <button class="delete-btn" onclick="deleteSession('${{plot.id}}')" title="Удалить сессию">✗</button>
-                            ${{urInfo}}
-                            <img class="plot-image" src="data:image/png;base64,${{plot.image}}" alt="Plot for ${{plot.filename}}">
-                            <div class="timestamp">Создан: ${{plot.timestamp}}</div>
-                        `;
-                    }}
-                    grid.insertBefore(plotDiv, grid.firstChild);
+                    grid.insertBefore(upsertPlot(grid, plot), grid.firstChild);
                 }});
 
+                if (shownPlots().length <= PAGE_SIZE) {{
+                    hasMore = data.has_more;
+                }}
+                updateSentinel();
+                maybeLoadMore();
+                refreshPending(new Set(data.plots.map(p => p.id)));
+
             }} catch (error) {{
                 console.error('Ошибка обновления данных:', error);
             }}
         }}
 
+        // Подгрузка следующей страницы, когда пользователь долистал до конца
+        async function maybeLoadMore() {{
+            if (!hasMore || loadingPage || currentTab !== 'sessions') {{
+                return;
+            }}
+            const sentinel = document.getElementById('plots-sentinel');
+            if (sentinel.getBoundingClientRect().top > window.innerHeight + 200) {{
+                return;
+            }}
+
+            loadingPage = true;
+            try {{
+                const sort = currentSort;
+                const player = currentPlayer;
+                const data = await fetchPage(shownPlots().length);
+                if (sort !== currentSort || player !== currentPlayer) {{
+                    return;
+                }}
+                const grid = document.getElementById('plots-container');
+                data.plots.forEach(plot => {{
+                    if (!grid.querySelector(`[data-plot-id="${{plot.id}}"]`)) {{
+                        grid.appendChild(buildPlotDiv(plot));
+                    }}
+                }});
+                hasMore = data.has_more && data.plots.length > 0;
+                updateSentinel();
+            }} catch (error) {{
+                console.error('Ошибка загрузки страницы:', error);
+            }} finally {{
+                loadingPage = false;
+            }}
+            if (hasMore) {{
+                setTimeout(maybeLoadMore, 0);
+            }}
+        }}
+
+        // Дозапрашиваем графики, которые еще рисовались, на уже загруженных страницах
+        async function refreshPending(skipIds) {{
+            const ids = Array.from(document.querySelectorAll('#plots-container .plot-container[data-pending="1"]'))
+                .map(div => div.dataset.plotId)
+                .filter(id => !skipIds.has(id))
+                .slice(0, 100);
+            if (ids.length === 0) {{
+                return;
+            }}
+            try {{
+                const response = await fetch(`/api/data?ids=${{ids.join(',')}}&limit=100`);
+                const data = await response.json();
+                const grid = document.getElementById('plots-container');
+                data.plots.forEach(plot => {{
+                    if (grid.querySelector(`[data-plot-id="${{plot.id}}"]`)) {{
+                        upsertPlot(grid, plot);
+                    }}
+                }});
+            }} catch (error) {{
+                console.error('Ошибка обновления графиков:', error);
+            }}
+        }}
+
+        function showEmptyState() {{
+            document.getElementById('plots-container').innerHTML = `
+                <div class="waiting">
+                    <h2 class="loading">Ожидание данных...</h2>
+                    <p>Мониторинг папки <code>samples/</code></p>
+                    <p>Запустите вашу Rust программу для генерации CSV файлов</p>
+                    <p>Страница обновляется автоматически каждые 2 секунды</p>
+                </div>
+            `;
+        }}
+
+        function resetSessions() {{
+            document.getElementById('plots-container').innerHTML = '';
+            updateSelection();
+            hasMore = true;
+            lastVersion = 0;
+            updateData();
+        }}
+
+        function changeSort(sort) {{
+            currentSort = sort;
+            resetSessions();
+        }}
+
+        // Параметр фильтра по игроку для запросов к API (пусто — все игроки)
+        function playerQuery() {{
+            return currentPlayer ? `&player=${{encodeURIComponent(currentPlayer)}}` : '';
+        }}
+
+        // Новые игроки (с других мониторов) появляются в списке выбора
+        function syncPlayers(players) {{
+            const select = document.getElementById('player-select');
+            const known = new Set(Array.from(select.options, option => option.value));
+            for (const name of players) {{
+                if (!known.has(name)) {{
+                    select.add(new Option(name, name));
+                }}
+            }}
+            select.parentElement.style.display = players.length > 1 ? '' : 'none';
+        }}
+
+        function changePlayer(player) {{
+            currentPlayer = player;
+            lastRecordsUpdate = 0;
+            lastTrendsKey = '';
+            resetSessions();
+            if (currentTab === 'records') {{
+                updateRecords();
+            }} else if (currentTab === 'trends') {{
+                updateTrends();
+            }}
+        }}
+
+        window.addEventListener('scroll', maybeLoadMore);
+
         async function updateRecords() {{
             try {{
-                const response = await fetch('/api/records');
+                const player = currentPlayer;
+                const response = await fetch(`/api/records?${{playerQuery().slice(1)}}`);
                 const data = await response.json();
+                if (player !== currentPlayer) {{
+                    return;
+                }}
 
                 // Скрываем ожидание и показываем контент
                 document.getElementById('records-waiting').style.display = 'none';
@@ -1103,6 +1815,161 @@ class WebCSVMonitor:
             }}
         }}
 
+        function formatStat(stats, key) {{
+            return stats ? stats[key].toFixed(1) : '-';
+        }}
+
+        function drawLiveChart(line) {{
+            const canvas = document.getElementById('live-chart');
+            const ctx = canvas.getContext('2d');
+            ctx.clearRect(0, 0, canvas.width, canvas.height);
+            if (line.press.length < 2) {{
+                return;
+            }}
+            const first = line.press[0];
+            const last = line.press[line.press.length - 1];
+            const x = press => (press - first) / Math.max(1, last - first) * (canvas.width - 20) + 10;
+            const series = [
+                {{ values: line.ur, max: 300, color: '#40e0d0', width: 1 }},
+                {{ values: line.bpm, max: Math.max(280, Math.max(...line.bpm) * 1.1), color: '#ff69b4', width: 2 }},
+            ];
+            series.forEach(s => {{
+                ctx.strokeStyle = s.color;
+                ctx.lineWidth = s.width;
+                ctx.beginPath();
+                s.values.forEach((v, i) => {{
+                    const y = canvas.height - 10 - Math.min(v, s.max) / s.max * (canvas.height - 20);
+                    if (i === 0) ctx.moveTo(x(line.press[i]), y); else ctx.lineTo(x(line.press[i]), y);
+                }});
+                ctx.stroke();
+            }});
+        }}
+
+        function drawTrendsChart(trends) {{
+            const canvas = document.getElementById('trends-chart');
+            const ctx = canvas.getContext('2d');
+            ctx.clearRect(0, 0, canvas.width, canvas.height);
+            if (trends.length === 0) {{
+                return;
+            }}
+            const x = i => trends.length === 1 ? canvas.width / 2 : i / (trends.length - 1) * (canvas.width - 20) + 10;
+            const bpmMax = Math.max(280, ...trends.map(t => t.best_bpm || 0)) * 1.1;
+            const series = [
+                {{ key: 'best_ur_100', max: 300, color: '#00ff88', width: 2 }},
+                {{ key: 'best_ur_200', max: 300, color: '#40e0d0', width: 2 }},
+                {{ key: 'best_ur_500', max: 300, color: '#ff6b6b', width: 2 }},
+                {{ key: 'best_ur_1000', max: 300, color: '#ffd700', width: 2 }},
+                {{ key: 'best_bpm', max: bpmMax, color: '#ff69b4', width: 3 }},
+            ];
+            series.forEach(s => {{
+                ctx.strokeStyle = s.color;
+                ctx.fillStyle = s.color;
+                ctx.lineWidth = s.width;
+                ctx.beginPath();
+                let started = false;
+                trends.forEach((t, i) => {{
+                    const v = t[s.key];
+                    if (v === null) {{
+                        return;
+                    }}
+                    const y = canvas.height - 10 - Math.min(v, s.max) / s.max * (canvas.height - 20);
+                    if (!started) ctx.moveTo(x(i), y); else ctx.lineTo(x(i), y);
+                    started = true;
+                    ctx.fillRect(x(i) - 2, y - 2, 4, 4);
+                }});
+                ctx.stroke();
+            }});
+        }}
+
+        async function updateTrends() {{
+            try {{
+                const response = await fetch(`/api/trends?period=${{currentPeriod}}${{playerQuery()}}`);
+                const data = await response.json();
+                if ((data.player || '') !== currentPlayer) {{
+                    return;
+                }}
+                const key = `${{data.period}}:${{data.player}}:${{data.version}}`;
+                if (key === lastTrendsKey) {{
+                    return;
+                }}
+                lastTrendsKey = key;
+                document.getElementById('trends-waiting').style.display = 'none';
+                document.getElementById('trends-content').style.display = 'block';
+                drawTrendsChart(data.trends);
+
+                const fmt = v => v !== null ? v.toFixed(1) : '-';
+                const tbody = document.getElementById('trends-tbody');
+                tbody.innerHTML = '';
+                // Таблица — от новых периодов к старым
+                data.trends.slice().reverse().forEach(t => {{
+                    const row = tbody.insertRow();
+                    row.innerHTML = `
+                        <td>${{t.start}}</td>
+                        <td>${{t.sessions}}</td>
+                        <td>${{t.presses}}</td>
+                        <td>${{fmt(t.best_bpm)}}</td>
+                        <td>${{fmt(t.best_ur_100)}}</td>
+                        <td>${{fmt(t.best_ur_200)}}</td>
+                        <td>${{fmt(t.best_ur_500)}}</td>
+                        <td>${{fmt(t.best_ur_1000)}}</td>
+                        <td>${{t.zx_balance !== null ? t.zx_balance.toFixed(2) + '%' : '-'}}</td>
+                    `;
+                }});
+            }} catch (error) {{
+                console.error('Ошибка обновления прогресса:', error);
+            }}
+        }}
+
+        function changePeriod(period) {{
+            currentPeriod = period;
+            updateTrends();
+        }}
+
+        async function updateLive() {{
+            try {{
+                const response = await fetch('/api/live');
+                const data = await response.json();
+                if (data.version === lastLiveVersion) {{
+                    return;
+                }}
+                lastLiveVersion = data.version;
+                if (data.count === 0) {{
+                    document.getElementById('live-waiting').style.display = 'block';
+                    document.getElementById('live-content').style.display = 'none';
+                    return;
+                }}
+                document.getElementById('live-waiting').style.display = 'none';
+                document.getElementById('live-content').style.display = 'block';
+
+                const total = data.total;
+                document.getElementById('live-summary').innerHTML = `
+                    Нажатий: ${{data.count}} |
+                    <span class="bpm-color">BPM: ${{formatStat(total, 'bpm')}}</span> |
+                    <span class="ur-color">UR: ${{formatStat(total, 'ur')}}</span> |
+                    <span class="xz-color">ZX: ${{formatStat(total, 'zx')}}%</span>
+                `;
+                drawLiveChart(data.line);
+
+                const tbody = document.getElementById('live-tbody');
+                tbody.innerHTML = '';
+                data.windows.forEach(w => {{
+                    const row = tbody.insertRow();
+                    const cur = w.current;
+                    row.innerHTML = `
+                        <td>${{w.window_size}}</td>
+                        <td>${{formatStat(cur, 'bpm')}}</td>
+                        <td>${{formatStat(cur, 'ur')}}</td>
+                        <td>${{cur ? cur.min_ms + ' / ' + cur.max_ms : '-'}}</td>
+                        <td>${{formatStat(w.best_bpm, 'bpm')}}</td>
+                        <td>${{formatStat(w.best_ur, 'ur')}}</td>
+                        <td>${{formatStat(w.best_zx, 'zx')}}</td>
+                    `;
+                }});
+            }} catch (error) {{
+                console.error('Ошибка обновления live:', error);
+            }}
+        }}
+
         // Функция переименования сессии
         async function renameSession(sessionId, newName) {{
             try {{
@@ -1134,6 +2001,10 @@ class WebCSVMonitor:
                 const response = await fetch(`/api/delete/${{sessionId}}`);
                 if (response.ok) {{
                     console.log(`Сессия ${{sessionId}} удалена`);
+                    const plotDiv = document.querySelector(`[data-plot-id="${{sessionId}}"]`);
+                    if (plotDiv) {{
+                        plotDiv.remove();
+                    }}
                     lastVersion = 0;
                     updateData();
                     // Обновляем рекорды если они открыты
@@ -1149,6 +2020,271 @@ class WebCSVMonitor:
             }}
         }}
 
+        // Масштабируемый график: окно [from, to) нажатий, ряды из /api/session/<id>/series
+        const zoom = {{ id: null, from: 0, to: 0, total: 0, data: null, seq: 0, timer: null, drag: null }};
+
+        function openZoom(sessionId, title) {{
+            Object.assign(zoom, {{ id: sessionId, from: 0, to: 0, total: 0, data: null }});
+            document.getElementById('zoom-title').innerText = title;
+            document.getElementById('zoom-overlay').style.display = 'block';
+            loadZoom();
+        }}
+
+        function closeZoom() {{
+            document.getElementById('zoom-overlay').style.display = 'none';
+            zoom.id = null;
+        }}
+
+        async function loadZoom() {{
+            const seq = ++zoom.seq;
+            const canvas = document.getElementById('zoom-chart');
+            const range = zoom.total ? `&from=${{zoom.from}}&to=${{zoom.to}}` : '';
+            try {{
+                const response = await fetch(`/api/session/${{zoom.id}}/series?px=${{canvas.width}}${{range}}`);
+                const data = await response.json();
+                // Пока шел запрос, пользователь мог сдвинуть окно еще раз
+                if (seq !== zoom.seq) {{
+                    return;
+                }}
+                if (!zoom.total) {{
+                    zoom.total = data.press_count;
+                    zoom.from = 0;
+                    zoom.to = data.press_count;
+                }}
+                zoom.data = data;
+                drawZoom();
+            }} catch (error) {{
+                console.error('Ошибка загрузки рядов:', error);
+            }}
+        }}
+
+        function scheduleZoomLoad() {{
+            drawZoom();
+            clearTimeout(zoom.timer);
+            zoom.timer = setTimeout(loadZoom, 80);
+        }}
+
+        function drawZoom() {{
+            const canvas = document.getElementById('zoom-chart');
+            const ctx = canvas.getContext('2d');
+            ctx.clearRect(0, 0, canvas.width, canvas.height);
+            const data = zoom.data;
+            if (!data) {{
+                return;
+            }}
+            const series = data.series.Interval_ms;
+            const n = series.mean.length;
+            const span = Math.max(1, zoom.to - zoom.from);
+            const x = press => (press - 1 - zoom.from) / span * canvas.width;
+            const lows = series.min.filter(v => v !== null);
+            const highs = series.max.filter(v => v !== null);
+            if (lows.length === 0) {{
+                return;
+            }}
+            const yMin = Math.max(0, Math.min(...lows) - 5);
+            const yMax = Math.max(...highs) + 5;
+            const y = v => canvas.height - 20 - (v - yMin) / (yMax - yMin) * (canvas.height - 40);
+            const at = i => data.x_start + i * data.bucket;
+
+            // Огибающая min/max корзин
+            if (data.bucket > 1) {{
+                ctx.fillStyle = 'rgba(136, 204, 255, 0.25)';
+                ctx.beginPath();
+                for (let i = 0; i < n; i++) ctx.lineTo(x(at(i)), y(series.max[i]));
+                for (let i = n - 1; i >= 0; i--) ctx.lineTo(x(at(i)), y(series.min[i]));
+                ctx.fill();
+            }}
+            ctx.strokeStyle = '#88ccff';
+            ctx.lineWidth = 1;
+            ctx.beginPath();
+            for (let i = 0; i < n; i++) {{
+                if (i === 0) ctx.moveTo(x(at(i)), y(series.mean[i])); else ctx.lineTo(x(at(i)), y(series.mean[i]));
+            }}
+            ctx.stroke();
+            if (data.bucket === 1 && span < canvas.width / 4) {{
+                ctx.fillStyle = '#88ccff';
+                for (let i = 0; i < n; i++) ctx.fillRect(x(at(i)) - 2, y(series.mean[i]) - 2, 4, 4);
+            }}
+
+            ctx.fillStyle = '#cccccc';
+            ctx.font = '12px Arial';
+            ctx.fillText(`${{yMax.toFixed(0)}} мс`, 5, 15);
+            ctx.fillText(`${{yMin.toFixed(0)}} мс`, 5, canvas.height - 5);
+            document.getElementById('zoom-info').innerText =
+                `Нажатия ${{zoom.from + 1}}–${{zoom.to}} из ${{zoom.total}} | корзина ${{data.bucket}}`;
+        }}
+
+        function zoomPress(event) {{
+            const canvas = document.getElementById('zoom-chart');
+            const rect = canvas.getBoundingClientRect();
+            return zoom.from + (event.clientX - rect.left) / rect.width * (zoom.to - zoom.from);
+        }}
+
+        function setZoomWindow(from, to) {{
+            const span = Math.min(zoom.total, Math.max(10, Math.round(to - from)));
+            from = Math.max(0, Math.min(zoom.total - span, Math.round(from)));
+            zoom.from = from;
+            zoom.to = from + span;
+            scheduleZoomLoad();
+        }}
+
+        document.getElementById('zoom-chart').addEventListener('wheel', event => {{
+            if (!zoom.total) {{
+                return;
+            }}
+            event.preventDefault();
+            const center = zoomPress(event);
+            const factor = event.deltaY > 0 ? 1.25 : 0.8;
+            setZoomWindow(center - (center - zoom.from) * factor, center + (zoom.to - center) * factor);
+        }}, {{ passive: false }});
+
+        document.getElementById('zoom-chart').addEventListener('mousedown', event => {{
+            zoom.drag = {{ press: zoomPress(event), from: zoom.from, to: zoom.to }};
+        }});
+
+        window.addEventListener('mousemove', event => {{
+            if (!zoom.drag) {{
+                return;
+            }}
+            const shift = zoom.drag.press - zoomPress(event);
+            setZoomWindow(zoom.from + shift, zoom.to + shift);
+        }});
+
+        window.addEventListener('mouseup', () => {{
+            zoom.drag = null;
+        }});
+
+        document.getElementById('zoom-chart').addEventListener('dblclick', () => {{
+            if (zoom.total) {{
+                setZoomWindow(0, zoom.total);
+            }}
+        }});
+
+        function selectedIds() {{
+            return Array.from(document.querySelectorAll('#plots-container .select-box:checked'))
+                .map(box => box.closest('.plot-container').dataset.plotId);
+        }}
+
+        function updateSelection() {{
+            const count = selectedIds().length;
+            const button = document.getElementById('delete-selected');
+            button.disabled = count === 0;
+            button.innerText = count ? `Удалить выбранные (${{count}})` : 'Удалить выбранные';
+            document.getElementById('compare-selected').disabled = count < 2 || count > 10;
+        }}
+
+        const COMPARE_COLORS = ['#ff69b4', '#40e0d0', '#ffd700', '#00ff88', '#ff6b6b', '#88ccff', '#cc8800', '#b388ff', '#ffffff', '#aaaaaa'];
+
+        // Несколько линий на одном canvas с общим автомасштабом по обеим осям
+        function drawOverlay(canvasId, lines) {{
+            const canvas = document.getElementById(canvasId);
+            const ctx = canvas.getContext('2d');
+            ctx.clearRect(0, 0, canvas.width, canvas.height);
+            const points = lines.flatMap(line => line.xs.map((x, i) => [x, line.ys[i]]).filter(p => p[1] !== null));
+            if (points.length === 0) {{
+                return;
+            }}
+            const xMin = Math.min(...points.map(p => p[0]));
+            const xMax = Math.max(...points.map(p => p[0]));
+            const yMin = Math.min(...points.map(p => p[1]));
+            const yMax = Math.max(...points.map(p => p[1]));
+            const x = v => 40 + (v - xMin) / Math.max(1, xMax - xMin) * (canvas.width - 50);
+            const y = v => canvas.height - 20 - (v - yMin) / Math.max(1e-9, yMax - yMin) * (canvas.height - 40);
+            lines.forEach(line => {{
+                ctx.strokeStyle = line.color;
+                ctx.lineWidth = 2;
+                ctx.beginPath();
+                let started = false;
+                line.xs.forEach((xv, i) => {{
+                    const yv = line.ys[i];
+                    if (yv === null) {{
+                        started = false;
+                        return;
+                    }}
+                    if (!started) ctx.moveTo(x(xv), y(yv)); else ctx.lineTo(x(xv), y(yv));
+                    started = true;
+                }});
+                ctx.stroke();
+            }});
+            ctx.fillStyle = '#cccccc';
+            ctx.font = '12px Arial';
+            ctx.fillText(yMax.toFixed(1), 2, 15);
+            ctx.fillText(yMin.toFixed(1), 2, canvas.height - 22);
+            ctx.fillText(xMin.toFixed(0), 40, canvas.height - 5);
+            ctx.fillText(xMax.toFixed(0), canvas.width - 50, canvas.height - 5);
+        }}
+
+        async function openCompare() {{
+            const ids = selectedIds();
+            try {{
+                const response = await fetch(`/api/compare?ids=${{ids.join(',')}}&px=1200`);
+                if (!response.ok) {{
+                    alert('Ошибка сравнения сессий');
+                    return;
+                }}
+                const data = await response.json();
+                document.getElementById('compare-legend').innerHTML = data.sessions
+                    .map((s, i) => `<span style="color: ${{COMPARE_COLORS[i]}}">${{s.name}}</span>`).join('');
+                // Ряды на общей сетке нажатий: x — середина корзины
+                const xs = s => s.bpm.map((_, i) => s.x_start + i * s.bucket + s.bucket / 2);
+                drawOverlay('compare-bpm', data.sessions.map((s, i) => ({{ xs: xs(s), ys: s.bpm, color: COMPARE_COLORS[i] }})));
+                drawOverlay('compare-ur', data.sessions.map((s, i) => ({{ xs: xs(s), ys: s.ur, color: COMPARE_COLORS[i] }})));
+                drawOverlay('compare-best', data.sessions.map((s, i) => ({{
+                    xs: s.best_ur.map(p => p[0]), ys: s.best_ur.map(p => p[1]), color: COMPARE_COLORS[i],
+                }})));
+                document.getElementById('compare-overlay').style.display = 'block';
+            }} catch (error) {{
+                console.error('Ошибка сравнения:', error);
+            }}
+        }}
+
+        function closeCompare() {{
+            document.getElementById('compare-overlay').style.display = 'none';
+        }}
+
+        // Пакетное удаление: один запрос на все выбранные сессии
+        async function deleteSelected() {{
+            const ids = selectedIds();
+            if (ids.length === 0 || !confirm(`Удалить выбранные сессии (${{ids.length}})?`)) {{
+                return;
+            }}
+            try {{
+                const response = await fetch('/api/sessions/delete', {{
+                    method: 'POST',
+                    headers: {{
+                        'Content-Type': 'application/json',
+                    }},
+                    body: JSON.stringify({{ ids: ids }}),
+                }});
+                if (!response.ok) {{
+                    alert('Ошибка удаления сессий');
+                    return;
+                }}
+                ids.forEach(id => {{
+                    const plotDiv = document.querySelector(`[data-plot-id="${{id}}"]`);
+                    if (plotDiv) {{
+                        plotDiv.remove();
+                    }}
+                }});
+                updateSelection();
+                lastVersion = 0;
+                updateData();
+                if (currentTab === 'records') {{
+                    setTimeout(updateRecords, 1000);
+                }}
+            }} catch (error) {{
+                console.error('Ошибка при пакетном удалении:', error);
+                alert('Ошибка удаления сессий');
+            }}
+        }}
+
+        // Живая панель обновляется раз в секунду, пока открыта
+        setInterval(() => {{
+            if (currentTab === 'live') {{
+                updateLive();
+            }}
+        }}, 1000);
+
         // Обновляем данные каждые 2 секунды
         setInterval(() => {{
             updateData();
@@ -1156,259 +2292,198 @@ class WebCSVMonitor:
             if (currentTab === 'records' && Date.now() - lastRecordsUpdate > 10000) {{
                 updateRecords();
             }}
+            if (currentTab === 'trends') {{
+                updateTrends();
+            }}
         }}, 2000);
 
         // Первичная загрузка
         updateData();
-    </script>
-</body>
-</html>
 """
 
-        # Сохраняем HTML файл
-        with open("web_output/index.html", "w", encoding="utf-8") as f:
-            f.write(html_content)
-            
-    def generate_json_data(self):
-        """Генерация JSON данных для AJAX"""
-        sorted_files = sorted(self.file_data.items(),
-                            key=lambda x: x[1]['mtime'],
-                            reverse=True)
-        files_to_show = sorted_files[:self.max_files]
-
-        # Получаем данные рекордов для проверки
-        records_data = self.generate_records_data()
+    def generate_json_data(self, offset=0, limit=None, sort='newest', ids=None, player=None, snapshot=None):
+        """Генерация JSON данных для AJAX (одна страница списка сессий)
+
+        Рисуются только сессии запрошенной страницы, причем без ожидания:
+        еще не готовые графики ставятся в очередь с высшим приоритетом
+        и приходят с "pending": true. player ограничивает список одним игроком.
+        Одновременные одинаковые опросы одной версии данных получают одну
+        и ту же строку. Имена, рекорды и версия берутся из одного снимка.
+
+        Возвращает (версия для ETag или None, JSON): см. consistent_build.
+        """
+        limit = self.max_files if limit is None else limit
+        snapshot = snapshot or self.snapshot
+        query = (offset, limit, sort, tuple(ids) if ids is not None else None, player)
+
+        def build(version):
+            key = ('data', version, *query)
+            with self._page_lock:
+                body = self.page_cache.get(key)
+                if body is not None:
+                    self.page_cache.move_to_end(key)
+                    return body
+            body = self.flights.do(key, lambda: self._json_data(snapshot, offset, limit, sort, ids, player))
+            # Пока строилась страница, каталог мог измениться — такую не запоминаем
+            if self.page_version(snapshot, player) == version:
+                with self._page_lock:
+                    self.page_cache[key] = body
+                    while len(self.page_cache) > self.page_cache_size:
+                        self.page_cache.popitem(last=False)
+            return body
+
+        return self.consistent_build(snapshot, player, build)
+
+    def _json_data(self, snapshot, offset, limit, sort, ids, player):
+        sessions = self.catalog.list_sessions(limit=limit, offset=offset, sort=sort, ids=ids, player=player)
+        total = self.catalog.count_sessions(player)
+
+        # Рекорды для отметок — по таблице игрока каждой сессии
+        records_by_player = {}
 
         data = {
-            "timestamp": datetime.now().strftime("%H:%M:%S"),
-            "files_count": len(files_to_show),
-            "version": int(datetime.now().timestamp()),
+            "timestamp": snapshot.updated_at,
+            "files_count": total,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "sort": sort,
+            "player": player,
+            "players": list(self.players),
+            "has_more": offset + len(sessions) < total,
+            "version": snapshot.version,
             "plots": []
         }
 
-        for file_path, file_data in files_to_show:
+        for session in sessions:
+            session_id = str(session['id'])
+            filename = datetime.fromtimestamp(session['created']).strftime("%Y-%m-%d %H:%M:%S")
             try:
-                session_id = file_data['id']
-                # Получаем имя из словаря или используем стандартное
-                custom_name = self.names.get(str(session_id), file_data['filename'])
-
-                plot_base64 = self.create_plot_image(file_data, custom_name)
-                mtime_str = datetime.fromtimestamp(file_data['mtime']).strftime("%Y-%m-%d %H:%M:%S")
-
-                # Извлекаем UR@100, UR@200, UR@500 и UR@1000 если они есть
-                ur_100 = None
-                ur_200 = None
-                ur_500 = None
-                ur_1000 = None
-                ur_100_is_record = False
-                ur_200_is_record = False
-                ur_500_is_record = False
-                ur_1000_is_record = False
-
-                if file_data.get('best_data') and not file_data['best_data']['ur_data'].empty:
-                    ur_data = file_data['best_data']['ur_data']
-                    bpm_data = file_data['best_data']['bpm_data']
-
-                    # Определяем BPM окно для этой сессии
-                    session_bpm_window = None
-                    if not bpm_data.empty:
-                        avg_bpm = bpm_data['BPM'].mean()
-                        window_center = round(avg_bpm / 10) * 10
-                        session_bpm_window = window_center
-
-                    ur_100_row = ur_data[ur_data['Window Size'] == 100]['UR']
-                    ur_200_row = ur_data[ur_data['Window Size'] == 200]['UR']
-                    ur_500_row = ur_data[ur_data['Window Size'] == 500]['UR']
-                    ur_1000_row = ur_data[ur_data['Window Size'] == 1000]['UR']
-
-                    if not ur_100_row.empty:
-                        ur_100 = ur_100_row.iloc[0]
-                        # Проверяем, является ли это рекордом
-                        if session_bpm_window:
-                            for record in records_data:
-                                if record['center_bpm'] == session_bpm_window and record['best_ur_100'] == ur_100:
-                                    ur_100_is_record = True
-                                    break
-
-                    if not ur_200_row.empty:
-                        ur_200 = ur_200_row.iloc[0]
-                        if session_bpm_window:
-                            for record in records_data:
-                                if record['center_bpm'] == session_bpm_window and record['best_ur_200'] == ur_200:
-                                    ur_200_is_record = True
-                                    break
-
-                    if not ur_500_row.empty:
-                        ur_500 = ur_500_row.iloc[0]
-                        if session_bpm_window:
-                            for record in records_data:
-                                if record['center_bpm'] == session_bpm_window and record['best_ur_500'] == ur_500:
-                                    ur_500_is_record = True
-                                    break
-
-                    if not ur_1000_row.empty:
-                        ur_1000 = ur_1000_row.iloc[0]
-                        if session_bpm_window:
-                            for record in records_data:
-                                if record['center_bpm'] == session_bpm_window and record['best_ur_1000'] == ur_1000:
-                                    ur_1000_is_record = True
-                                    break
-
-                data["plots"].append({
+                custom_name = self.display_name(session, snapshot.names)
+
+                plot_base64 = self.get_plot_image(session, custom_name)
+                mtime_str = datetime.fromtimestamp(session['mtime']).strftime("%Y-%m-%d %H:%M:%S")
+
+                plot = {
                     "id": session_id,
-                    "filename": file_data['filename'], # original filename
+                    "player": session['player'],
+                    "filename": filename, # original filename
                     "name": custom_name, # custom name
                     "image": plot_base64,
+                    "pending": plot_base64 is None,
                     "timestamp": mtime_str,
-                    "ur_100": ur_100,
-                    "ur_200": ur_200,
-                    "ur_500": ur_500,
-                    "ur_1000": ur_1000,
-                    "ur_100_is_record": ur_100_is_record,
-                    "ur_200_is_record": ur_200_is_record,
-                    "ur_500_is_record": ur_500_is_record,
-                    "ur_1000_is_record": ur_1000_is_record
-                })
+                }
+
+                # UR@100, UR@200, UR@500 и UR@1000 из каталога + отметка рекорда по BPM окну
+                if session['player'] not in records_by_player:
+                    records_by_player[session['player']] = {
+                        r['center_bpm']: r for r in snapshot.records.get(session['player'], ())}
+                record = records_by_player[session['player']].get(session['bpm_bucket'])
+                plot["bpm_center"] = session['bpm_bucket']
+                for window_size in RECORD_WINDOW_SIZES:
+                    ur_value = session[f'ur_{window_size}']
+                    plot[f"ur_{window_size}"] = ur_value
+                    # Процент сессий игрока с меньшим UR при том же BPM (скетч каталога)
+                    plot[f"ur_{window_size}_pct"] = self._percentile(
+                        self.catalog.distribution(f'ur_{window_size}', session['bpm_bucket'], session['player']),
+                        ur_value)
+                    plot[f"ur_{window_size}_is_record"] = bool(
+                        ur_value is not None and record is not None
+                        and record[f'best_ur_{window_size}'] == ur_value
+                    )
+
+                data["plots"].append(plot)
             except Exception as e:
-                print(f"Ошибка создания графика для {file_data['filename']}: {e}")
+                print(f"Ошибка создания графика для {filename}: {e}")
 
         return json.dumps(data)
 
-    def generate_records_data(self):
-        """Генерация данных для таблицы рекордов с группировкой по BPM окнам"""
-        bpm_windows = {}
+    def generate_live_data(self, tail=200):
+        """Состояние живой сессии: инкрементальная статистика и последние интервалы"""
+        intervals, is_z = self.live_session.snapshot(tail)
+        data = self.live_stats.snapshot()
+        data.update({
+            "started_at": self.live_session.started_at,
+            "last_press_at": self.live_session.last_press_at,
+            "recent_intervals": intervals.tolist(),
+            "recent_is_z": is_z.tolist(),
+        })
+        return data
+
+    def generate_status_data(self):
+        """Состояние сервера: память загруженных сессий и очередь рендеринга"""
+        return {
+            "memory": self.file_data.stats(),
+            "render_queue": self.render_scheduler.pending(),
+            "live_records_received": self.live_server.records_received,
+            "sessions": self.catalog.count_sessions(),
+            "players": self.generate_players_data(),
+            "compression": self.compression_cache.stats(),
+            "single_flight": self.flights.stats(),
+            "warmup": self.warmup.stats(),
+            "peers": self.peer_sync.stats() if self.peer_sync is not None else {},
+        }
 
-        # Группируем все записи по BPM окнам +-5
-        for file_path, file_data in self.file_data.items():
-            if not file_data.get('best_data') or file_data['best_data']['ur_data'].empty:
-                continue
+    def generate_players_data(self):
+        """Игроки: папка и число сессий в каталоге"""
+        return [
+            {"name": player.name, "dir": str(player.samples_dir) if player.samples_dir is not None else None,
+             "peer": player.peer, "sessions": player.catalog.count_sessions()}
+            for player in self.players.values()
+        ]
+
+    def generate_trends_data(self, period='day', limit=None, player=None):
+        """Прогресс по дням или неделям из готовых сводок каталога"""
+        return {
+            "period": period,
+            "player": player,
+            "version": self.catalog.version(player),
+            "trends": self.catalog.trends(period, limit, player),
+        }
 
-            # Извлекаем BPM из лучших записей для группировки
-            ur_data = file_data['best_data']['ur_data']
-            bpm_data = file_data['best_data']['bpm_data']
-
-            # Находим средний BPM для этой сессии
-            if not bpm_data.empty:
-                avg_bpm = bpm_data['BPM'].mean()
-
-                # Определяем BPM окно (шаг 10, центрированное)
-                window_center = round(avg_bpm / 10) * 10
-                window_key = str(window_center)
-
-                if window_key not in bpm_windows:
-                    bpm_windows[window_key] = {
-                        'center': window_center,
-                        'count': 0,
-                        'ur_100': [],
-                        'ur_200': [],
-                        'ur_500': [],
-                        'ur_1000': []
-                    }
-
-                bpm_windows[window_key]['count'] += 1
-
-                # Добавляем UR метрики
-                for window_size in [100, 200, 500, 1000]:
-                    ur_row = ur_data[ur_data['Window Size'] == window_size]['UR']
-                    if not ur_row.empty:
-                        ur_value = ur_row.iloc[0]
-                        bpm_windows[window_key][f'ur_{window_size}'].append(ur_value)
-
-        # Формируем итоговые данные с лучшими значениями
-        records_data = []
-        for window_key, data in sorted(bpm_windows.items(), key=lambda x: x[1]['center']):
-            record = {
-                'bpm_center': data['center'],
-                'center_bpm': data['center'],
-                'count': data['count'],
-                'best_ur_100': min(data['ur_100']) if data['ur_100'] else None,
-                'best_ur_200': min(data['ur_200']) if data['ur_200'] else None,
-                'best_ur_500': min(data['ur_500']) if data['ur_500'] else None,
-                'best_ur_1000': min(data['ur_1000']) if data['ur_1000'] else None
-            }
-            records_data.append(record)
+    def generate_records_data(self, player=None):
+        """Генерация данных для таблицы рекордов с группировкой по BPM окнам"""
+        return self.catalog.records(player)
 
-        return records_data
+    def _records_cache_file(self, records_data):
+        """Файл кеша графика рекордов: ключ — хеш самой таблицы, так что после
+        перезапуска тот же набор рекордов не рисуется заново"""
+        key = hashlib.md5(json.dumps({'records': records_data, 'plot_version': PLOT_VERSION},
+                                     sort_keys=True).encode()).hexdigest()
+        return self.cache_dir / f"records_{key}.txt"
 
-    def create_records_charts(self, records_data):
-        """Создание единого графика с 4 линиями UR в разных цветах"""
+    def read_records_chart(self, records_data):
+        """Готовый график рекордов из кеша на диске или None"""
         if not records_data:
             return ""
-
+        cache_file = self._records_cache_file(records_data)
         try:
-            fig, ax = plt.subplots(1, 1, figsize=(16, 10), facecolor='#2b2b2b')
+            return read_cache_text(cache_file)
+        except OSError:
+            return None
+        except ValueError as e:
+            print(f"Поврежденный файл кеша рекордов: {e}")
+            cache_file.unlink(missing_ok=True)
+            return None
 
-            # Подготавливаем данные для графиков
-            bpm_100 = [r['center_bpm'] for r in records_data if r['best_ur_100'] is not None]
-            ur_100_values = [r['best_ur_100'] for r in records_data if r['best_ur_100'] is not None]
-
-            bpm_200 = [r['center_bpm'] for r in records_data if r['best_ur_200'] is not None]
-            ur_200_values = [r['best_ur_200'] for r in records_data if r['best_ur_200'] is not None]
-
-            bpm_500 = [r['center_bpm'] for r in records_data if r['best_ur_500'] is not None]
-            ur_500_values = [r['best_ur_500'] for r in records_data if r['best_ur_500'] is not None]
-
-            bpm_1000 = [r['center_bpm'] for r in records_data if r['best_ur_1000'] is not None]
-            ur_1000_values = [r['best_ur_1000'] for r in records_data if r['best_ur_1000'] is not None]
-
-            # Цвета для разных UR метрик (хорошо различимые)
-            colors = {
-                'ur_100': '#00ff88',    # Яркий зеленый
-                'ur_200': '#40e0d0',    # Бирюзовый
-                'ur_500': '#ff6b6b',    # Коралловый
-                'ur_1000': '#ffd700'    # Золотой
-            }
+    def create_records_charts(self, records_data):
+        """Создание единого графика с 4 линиями UR в разных цветах"""
+        if not records_data:
+            return ""
 
-            # Рисуем все линии на одном графике
-            if ur_100_values:
-                ax.plot(bpm_100, ur_100_values, 'o-', color=colors['ur_100'],
-                       linewidth=3, markersize=8, label='UR@100', alpha=0.9)
-
-            if ur_200_values:
-                ax.plot(bpm_200, ur_200_values, 's-', color=colors['ur_200'],
-                       linewidth=3, markersize=7, label='UR@200', alpha=0.9)
-
-            if ur_500_values:
-                ax.plot(bpm_500, ur_500_values, '^-', color=colors['ur_500'],
-                       linewidth=3, markersize=8, label='UR@500', alpha=0.9)
-
-            if ur_1000_values:
-                ax.plot(bpm_1000, ur_1000_values, 'D-', color=colors['ur_1000'],
-                       linewidth=3, markersize=6, label='UR@1000', alpha=0.9)
-
-            # Настройка графика
-            ax.set_title('Best UR Performance vs BPM (±5)', color='#ffaa44', fontsize=18, weight='bold', pad=20)
-            ax.set_xlabel('BPM', color='#cccccc', fontsize=14, weight='bold')
-            ax.set_ylabel('Unstable Rate', color='#cccccc', fontsize=14, weight='bold')
-            ax.grid(True, alpha=0.3, linestyle='--')
-            ax.set_facecolor('#363636')
-            ax.tick_params(labelsize=12, colors='#cccccc')
-
-            # Находим общий максимум для всех UR значений
-            all_ur_values = ur_100_values + ur_200_values + ur_500_values + ur_1000_values
-            if all_ur_values:
-                max_ur = max(all_ur_values)
-                ax.set_ylim(0, max_ur * 1.1)
-
-            # Добавляем легенду
-            legend = ax.legend(loc='upper right', frameon=True, fancybox=True, shadow=True,
-                             fontsize=12, framealpha=0.9)
-            legend.get_frame().set_facecolor('#404040')
-            legend.get_frame().set_edgecolor('#666666')
-            for text in legend.get_texts():
-                text.set_color('#cccccc')
-
-            plt.tight_layout()
+        cached = self.read_records_chart(records_data)
+        if cached is not None:
+            return cached
 
+        try:
             # Сохраняем в base64
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', facecolor='#2b2b2b', bbox_inches='tight', dpi=100)
-            buffer.seek(0)
-            plot_data = buffer.getvalue()
-            buffer.close()
-            plt.close(fig)
-
-            return base64.b64encode(plot_data).decode()
+            charts = base64.b64encode(figure_bytes(records_figure(records_data))).decode()
+            try:
+                write_cache_text(self._records_cache_file(records_data), charts)
+            except OSError as e:
+                print(f"Ошибка сохранения графика рекордов в кеш: {e}")
+            self._cleanup_cache(is_records_file, self.records_cache_max_files)
+            return charts
 
         except Exception as e:
             print(f"Ошибка создания графиков рекордов: {e}")
@@ -1416,85 +2491,341 @@ class WebCSVMonitor:
 
     def delete_files_by_id(self, file_id):
         """Безопасное удаление файлов по ID"""
-        import os
-        import re
-        
+        return file_id in self.delete_sessions([file_id])
+
+    def delete_sessions(self, session_ids):
+        """Пакетное удаление сессий по ID
+
+        Файлы удаляются по одному, архивы перезаписываются по разу на файл,
+        а каталог, очередь и кеш графиков обновляются один раз на весь пакет.
+        Возвращает множество ID, для которых что-то было удалено.
+        """
+        deleted = set()
         try:
-            # Дополнительная валидация ID
-            if not re.match(r'^\d{10,15}$', file_id):
-                print(f"Invalid file ID format: {file_id}")
-                return False
-            
-            samples_dir = Path("samples")
-            if not samples_dir.exists():
-                return False
-            
-            # Формируем точные имена файлов с валидацией
-            best_file = samples_dir / f"best_bpm_ur_{file_id}.csv"
-            history_file = samples_dir / f"stats_history_{file_id}.csv"
-            
-            deleted_count = 0
-            
-            # Удаляем файлы если они существуют
-            for file_path in [best_file, history_file]:
-                if file_path.exists() and file_path.is_file():
-                    # Дополнительная проверка: файл должен быть именно в samples/
-                    if file_path.parent.name == "samples" and file_path.suffix == ".csv":
-                        os.remove(file_path)
-                        deleted_count += 1
-                        print(f"Deleted: {file_path}")
-            
+            # Дополнительная валидация ID: формат и известный игрок этого монитора
+            # (сессии других мониторов удаляются только на них самих)
+            valid_ids = []
+            for file_id in dict.fromkeys(str(i) for i in session_ids):
+                try:
+                    player_name, local_id = split_session_id(file_id)
+                except ValueError:
+                    player_name, local_id = None, None
+                player = self.players.get(player_name)
+                if player is not None and player.samples_dir is not None and len(local_id) >= 10:
+                    valid_ids.append(file_id)
+                else:
+                    print(f"Invalid file ID format: {file_id}")
+
+            by_archive = {}
+            for file_id in valid_ids:
+                player_name, local_id = split_session_id(file_id)
+                samples_dir = self.players[player_name].samples_dir
+                # Формируем точные имена файлов с валидацией
+                best_file = samples_dir / f"best_bpm_ur_{local_id}.csv"
+                history_file = samples_dir / f"stats_history_{local_id}.csv"
+
+                # Удаляем файлы если они существуют
+                for file_path in [best_file, history_file]:
+                    if file_path.exists() and file_path.is_file():
+                        # Дополнительная проверка: файл должен быть именно в папке игрока
+                        if file_path.parent == samples_dir and file_path.suffix == ".csv":
+                            os.remove(file_path)
+                            deleted.add(file_id)
+                            print(f"Deleted: {file_path}")
+
+                # Сессия может лежать в месячном архиве, в том числе вместе с CSV
+                # (тогда в session_files пара из CSV, а копия из архива вернулась бы
+                # в каталог при следующем проходе) — архив ищем по месяцу сессии
+                archive_file = archive_path(samples_dir, month_of(local_id))
+                if archive_file.exists():
+                    by_archive.setdefault((player_name, str(archive_file)), []).append(local_id)
+
+            for (player_name, archive_file), local_ids in by_archive.items():
+                player = self.players[player_name]
+                removed = remove_sessions(player.samples_dir, archive_file, local_ids)
+                deleted |= {player.session_id(local_id) for local_id in removed}
+                print(f"Deleted from archive {archive_file}: {len(removed)}")
+
             # Удаляем из кэша данных
-            if file_id in self.file_data:
-                del self.file_data[file_id]
+            for file_id in valid_ids:
+                self.session_files.pop(file_id, None)
+                self.file_data.pop(file_id, None)
+                self.render_scheduler.cancel(file_id)
+            self.catalog.delete_sessions(valid_ids)
+            for player_name in {split_session_id(file_id)[0] for file_id in valid_ids}:
+                self.catalog.bump(player_name)
+            self.touch_data()
 
             # Очищаем файлы кеша для удаленных данных
-            self._cleanup_cache_for_session(file_id)
-            
-            return deleted_count > 0
-            
+            self._cleanup_cache_for_sessions(valid_ids)
+
         except Exception as e:
-            print(f"Error in delete_files_by_id: {e}")
-            return False
+            print(f"Error in delete_sessions: {e}")
+        return deleted
 
     def start_web_server(self):
         """Запуск веб-сервера"""
-        server_port = 8000
+        server_port = self.server_port
         monitor_ref = self
         
         try:
-            class CustomHandler(SimpleHTTPRequestHandler):
-                def __init__(self, *args, **kwargs):
-                    super().__init__(*args, directory="web_output", **kwargs)
-                
+            class CustomHandler(BaseHTTPRequestHandler):
+                def send_body(self, body, content_type, status=200, headers=None):
+                    """Ответ со сжатием, согласованным по Accept-Encoding"""
+                    body, encoding = encode_response(body, self.headers.get('Accept-Encoding'),
+                                                     monitor_ref.compression_cache)
+                    self.send_response(status)
+                    self.send_header('Content-type', content_type)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.send_header('Vary', 'Accept-Encoding')
+                    for name, value in (headers or {}).items():
+                        self.send_header(name, value)
+                    if encoding:
+                        self.send_header('Content-Encoding', encoding)
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def send_asset(self, asset):
+                    """Статический ресурс из памяти; 304, если у клиента та же версия"""
+                    cache_headers = {'ETag': asset.etag, 'Cache-Control': asset.cache_control}
+                    if etag_matches(self.headers.get('If-None-Match'), asset.etag):
+                        self.send_response(304)
+                        for name, value in cache_headers.items():
+                            self.send_header(name, value)
+                        self.end_headers()
+                        return
+                    self.send_body(asset.body, asset.content_type, headers=cache_headers)
+
+                def send_not_modified(self, etag):
+                    """304, если у клиента та же версия; True — ответ уже отправлен"""
+                    if not etag_matches(self.headers.get('If-None-Match'), etag):
+                        return False
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Cache-Control', 'no-cache')
+                    self.end_headers()
+                    return True
+
+                def send_versioned(self, etag, build):
+                    """JSON версии данных с ETag; 304 без построения ответа, если у клиента та же версия"""
+                    if self.send_not_modified(etag):
+                        return
+                    self.send_body(build(), 'application/json', headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+                def send_catalog_versioned(self, prefix, snapshot, player, build):
+                    """Как send_versioned для ответов, читающих каталог на ходу
+
+                    build() возвращает (версия или None, байты) — см. consistent_build.
+                    """
+                    if self.send_not_modified(f'"{prefix}{monitor_ref.page_version(snapshot, player)}"'):
+                        return
+                    version, body = build()
+                    headers = {'Cache-Control': 'no-cache'}
+                    if version is not None:
+                        headers['ETag'] = f'"{prefix}{version}"'
+                    self.send_body(body, 'application/json', headers=headers)
+
+                def read_player(self, query):
+                    """(корректен ли, игрок) из параметра player; без параметра — все игроки"""
+                    player = query.get('player', [''])[0] or None
+                    return player is None or player in monitor_ref.players, player
+
                 def do_GET(self):
                     parsed_path = urlparse(self.path)
                     if parsed_path.path == '/api/data':
-                        self.send_response(200)
-                        self.send_header('Content-type', 'application/json')
-                        self.send_header('Access-Control-Allow-Origin', '*')
-                        self.end_headers()
-                        json_data = monitor_ref.generate_json_data()
-                        self.wfile.write(json_data.encode())
+                        query = parse_qs(parsed_path.query)
+                        player_ok, player = self.read_player(query)
+                        if not player_ok:
+                            self.send_response(400)
+                            self.end_headers()
+                            self.wfile.write(b'Unknown player')
+                            return
+                        try:
+                            offset = max(0, int(query.get('offset', ['0'])[0]))
+                            limit = min(100, max(1, int(query.get('limit', [str(monitor_ref.max_files)])[0])))
+                        except ValueError:
+                            self.send_response(400)
+                            self.end_headers()
+                            self.wfile.write(b'Invalid offset or limit')
+                            return
+                        sort = query.get('sort', ['newest'])[0]
+                        if sort not in SESSION_SORTS:
+                            self.send_response(400)
+                            self.end_headers()
+                            self.wfile.write(b'Invalid sort')
+                            return
+                        ids = None
+                        if 'ids' in query:
+                            ids = [i for i in query['ids'][0].split(',') if i]
+                            if len(ids) > 100 or not all(is_session_id(i) for i in ids):
+                                self.send_response(400)
+                                self.end_headers()
+                                self.wfile.write(b'Invalid ids')
+                                return
+
+                        snapshot = monitor_ref.snapshot
+
+                        def build_page():
+                            version, body = monitor_ref.generate_json_data(offset, limit, sort, ids, player, snapshot)
+                            return version, body.encode()
+
+                        self.send_catalog_versioned('d', snapshot, player, build_page)
                     elif parsed_path.path == '/api/records':
-                        self.send_response(200)
-                        self.send_header('Content-type', 'application/json')
-                        self.send_header('Access-Control-Allow-Origin', '*')
-                        self.end_headers()
-                        records_data = monitor_ref.generate_records_data()
-                        charts_base64 = monitor_ref.create_records_charts(records_data)
-                        response_data = {
-                            "records": records_data,
-                            "charts": charts_base64,
-                            "timestamp": datetime.now().strftime("%H:%M:%S")
-                        }
-                        self.wfile.write(json.dumps(response_data).encode())
+                        player_ok, player = self.read_player(parse_qs(parsed_path.query))
+                        if not player_ok:
+                            self.send_response(400)
+                            self.end_headers()
+                            self.wfile.write(b'Unknown player')
+                            return
+                        snapshot = monitor_ref.snapshot
+                        # График рекордов дорисовывается без смены снимка — его готовность тоже в ETag
+                        ready = int(monitor_ref.records_chart_ready(player))
+
+                        def build_records():
+                            records_data, charts_base64 = monitor_ref.get_records_payload(player, snapshot)
+                            return json.dumps({
+                                "player": player,
+                                "records": records_data,
+                                "charts": charts_base64,
+                                "timestamp": snapshot.updated_at
+                            }).encode()
+
+                        self.send_versioned(f'"r{snapshot.version}-{ready}"', build_records)
+                    elif parsed_path.path.startswith('/api/session/') and parsed_path.path.endswith('/series'):
+                        # /api/session/<id>/series?from=&to=&px=
+                        session_id = parsed_path.path[len('/api/session/'):-len('/series')]
+                        query = parse_qs(parsed_path.query)
+                        try:
+                            if not is_session_id(session_id):
+                                raise ValueError(session_id)
+                            start = max(0, int(query.get('from', ['0'])[0]))
+                            stop = int(query['to'][0]) if 'to' in query else None
+                            px = min(10000, max(1, int(query.get('px', ['1000'])[0])))
+                        except ValueError:
+                            self.send_response(400)
+                            self.end_headers()
+                            self.wfile.write(b'Invalid session ID or range')
+                            return
+                        series_data = monitor_ref.generate_series_data(session_id, start, stop, px)
+                        if series_data is None:
+                            self.send_response(404)
+                            self.end_headers()
+                            self.wfile.write(b'Session not found')
+                            return
+                        self.send_body(json.dumps(series_data).encode(), 'application/json')
+                    elif parsed_path.path.startswith('/api/session/') and parsed_path.path.endswith('/segments'):
+                        # /api/session/<id>/segments?break_ms=&factor=
+                        session_id = parsed_path.path[len('/api/session/'):-len('/segments')]
+                        query = parse_qs(parsed_path.query)
+                        try:
+                            if not is_session_id(session_id):
+                                raise ValueError(session_id)
+                            break_ms = float(query['break_ms'][0]) if 'break_ms' in query else None
+                            break_factor = float(query['factor'][0]) if 'factor' in query else None
+                            if (break_ms is not None and not 0 < break_ms < 1e7) or \
+                                    (break_factor is not None and not 1 <= break_factor <= 1000):
+                                raise ValueError(query)
+                        except ValueError:
+                            self.send_response(400)
+                            self.end_headers()
+                            self.wfile.write(b'Invalid session ID or threshold')
+                            return
+                        segments_data = monitor_ref.generate_segments_data(session_id, break_ms, break_factor)
+                        if segments_data is None:
+                            self.send_response(404)
+                            self.end_headers()
+                            self.wfile.write(b'Session not found')
+                            return
+                        self.send_body(json.dumps(segments_data).encode(), 'application/json')
+                    elif parsed_path.path.startswith('/api/session/') and parsed_path.path.endswith('/percentiles'):
+                        session_id = parsed_path.path[len('/api/session/'):-len('/percentiles')]
+                        if not is_session_id(session_id):
+                            self.send_response(400)
+                            self.end_headers()
+                            self.wfile.write(b'Invalid session ID')
+                            return
+                        percentiles_data = monitor_ref.generate_percentiles_data(session_id)
+                        if percentiles_data is None:
+                            self.send_response(404)
+                            self.end_headers()
+                            self.wfile.write(b'Session not found')
+                            return
+                        self.send_body(json.dumps(percentiles_data).encode(), 'application/json')
+                    elif parsed_path.path == '/api/distribution':
+                        # ?metric=ur_200&bpm=230&value=85.5&player=
+                        query = parse_qs(parsed_path.query)
+                        player_ok, player = self.read_player(query)
+                        metric = query.get('metric', [''])[0]
+                        try:
+                            bpm = float(query['bpm'][0])
+                            value = float(query['value'][0]) if 'value' in query else None
+                            if not 0 < bpm < 10000 or metric not in SKETCH_METRICS or not player_ok \
+                                    or (value is not None and value != value):
+                                raise ValueError(query)
+                        except (KeyError, ValueError):
+                            self.send_response(400)
+                            self.end_headers()
+                            self.wfile.write(b'Invalid metric, bpm, value or player')
+                            return
+                        distribution_data = monitor_ref.generate_distribution_data(metric, bpm, value, player)
+                        self.send_body(json.dumps(distribution_data).encode(), 'application/json')
+                    elif parsed_path.path == '/api/compare':
+                        query = parse_qs(parsed_path.query)
+                        ids = [i for i in query.get('ids', [''])[0].split(',') if i]
+                        try:
+                            px = min(5000, max(10, int(query.get('px', ['600'])[0])))
+                        except ValueError:
+                            px = None
+                        if px is None or not 1 <= len(set(ids)) <= 10 or not all(is_session_id(i) for i in ids):
+                            self.send_response(400)
+                            self.end_headers()
+                            self.wfile.write(b'Invalid ids or px (1-10 ids)')
+                            return
+                        compare_data = monitor_ref.generate_compare_data(ids, px)
+                        if compare_data is None:
+                            self.send_response(404)
+                            self.end_headers()
+                            self.wfile.write(b'Session not found')
+                            return
+                        self.send_body(compare_data, 'application/json')
+                    elif parsed_path.path == '/api/trends':
+                        query = parse_qs(parsed_path.query)
+                        period = query.get('period', ['day'])[0]
+                        limit = query.get('limit', [''])[0]
+                        player_ok, player = self.read_player(query)
+                        if period not in ROLLUP_PERIODS or (limit and not limit.isdigit()) or not player_ok:
+                            self.send_response(400)
+                            self.end_headers()
+                            self.wfile.write(b'Invalid period, limit or player')
+                            return
+                        snapshot = monitor_ref.snapshot
+                        self.send_catalog_versioned('t', snapshot, player, lambda: monitor_ref.consistent_build(
+                            snapshot, player, lambda version: json.dumps(monitor_ref.generate_trends_data(
+                                period, int(limit) if limit else None, player)).encode()))
+                    elif parsed_path.path == '/api/sync':
+                        # Изменения каталога для агрегатора: ?since=игрок:epoch:seq,...&limit=
+                        query = parse_qs(parsed_path.query)
+                        limit = query.get('limit', ['500'])[0]
+                        if not limit.isdigit() or not 1 <= int(limit) <= 5000:
+                            self.send_response(400)
+                            self.end_headers()
+                            self.wfile.write(b'Invalid limit')
+                            return
+                        sync_data = sync_payload(monitor_ref.catalog, query.get('since', [''])[0], int(limit))
+                        self.send_body(json.dumps(sync_data).encode(), 'application/json')
+                    elif parsed_path.path == '/api/players':
+                        self.send_body(json.dumps(monitor_ref.generate_players_data()).encode(), 'application/json')
+                    elif parsed_path.path == '/api/live':
+                        self.send_body(json.dumps(monitor_ref.generate_live_data()).encode(), 'application/json')
+                    elif parsed_path.path == '/api/status':
+                        self.send_body(json.dumps(monitor_ref.generate_status_data()).encode(), 'application/json')
                     elif parsed_path.path.startswith('/api/delete/'):
                         # Безопасное удаление файлов по ID
                         try:
                             file_id = parsed_path.path.split('/')[-1]
-                            # Валидация: только цифры, защита от path traversal
-                            if not file_id.isdigit() or len(file_id) > 15:
+                            # Валидация: [игрок.]цифры, защита от path traversal
+                            if not is_session_id(file_id):
                                 self.send_response(400)
                                 self.end_headers()
                                 self.wfile.write(b'Invalid file ID')
@@ -1516,14 +2847,68 @@ class WebCSVMonitor:
                             self.end_headers()
                             self.wfile.write(b'Internal server error')
                     else:
-                        super().do_GET()
+                        asset = monitor_ref.web_assets.get(parsed_path.path)
+                        if asset is None:
+                            self.send_response(404)
+                            self.end_headers()
+                            return
+                        self.send_asset(asset)
                 
+                def send_json(self, status, payload):
+                    self.send_body(json.dumps(payload).encode(), 'application/json', status)
+
+                def read_batch_ids(self, ids):
+                    """Проверка списка ID пакетного запроса; None — если он некорректен"""
+                    if not isinstance(ids, list) or not 0 < len(ids) <= MAX_BATCH_SIZE:
+                        return None
+                    ids = [str(i) for i in ids]
+                    if not all(is_session_id(i) for i in ids):
+                        return None
+                    return ids
+
                 def do_POST(self):
                     parsed_path = urlparse(self.path)
-                    if parsed_path.path.startswith('/api/rename/'):
+                    if parsed_path.path in ('/api/sessions/rename', '/api/sessions/delete'):
+                        try:
+                            content_length = int(self.headers['Content-Length'])
+                            data = json.loads(self.rfile.read(content_length))
+                        except (TypeError, ValueError):
+                            self.send_response(400)
+                            self.end_headers()
+                            self.wfile.write(b'Invalid JSON body')
+                            return
+
+                        if parsed_path.path == '/api/sessions/rename':
+                            # {"names": {"<id>": "<имя>", ...}}
+                            names = data.get('names') if isinstance(data, dict) else None
+                            ids = self.read_batch_ids(list(names) if isinstance(names, dict) else None)
+                            if ids is None or not all(isinstance(n, str) and n.strip() for n in names.values()):
+                                self.send_response(400)
+                                self.end_headers()
+                                self.wfile.write(b'Invalid names')
+                                return
+                            if not monitor_ref.rename_sessions(names):
+                                self.send_json(500, {"status": "error"})
+                                return
+                            self.send_json(200, {"status": "renamed", "count": len(ids)})
+                        else:
+                            # {"ids": ["<id>", ...]}
+                            ids = self.read_batch_ids(data.get('ids') if isinstance(data, dict) else None)
+                            if ids is None:
+                                self.send_response(400)
+                                self.end_headers()
+                                self.wfile.write(b'Invalid ids')
+                                return
+                            deleted = monitor_ref.delete_sessions(ids)
+                            self.send_json(200, {
+                                "status": "deleted",
+                                "deleted": sorted(deleted),
+                                "missing": sorted(set(ids) - deleted),
+                            })
+                    elif parsed_path.path.startswith('/api/rename/'):
                         try:
                             session_id = parsed_path.path.split('/')[-1]
-                            if not session_id.isdigit() or len(session_id) > 15:
+                            if not is_session_id(session_id):
                                 self.send_response(400)
                                 self.end_headers()
                                 self.wfile.write(b'Invalid session ID')
@@ -1560,7 +2945,9 @@ class WebCSVMonitor:
                         self.send_response(404)
                         self.end_headers()
             
-            httpd = HTTPServer(('localhost', server_port), CustomHandler)
+            # Запрос на поток: долгий запрос (пирамида, сравнение, загрузка с пира)
+            # не задерживает опросы других вкладок
+            httpd = ThreadingHTTPServer((self.server_host, server_port), CustomHandler)
             server_thread = threading.Thread(target=httpd.serve_forever, daemon=True)
             server_thread.start()
             
@@ -1568,10 +2955,11 @@ class WebCSVMonitor:
             print("Откройте браузер и перейдите по указанному адресу")
             
             # Автоматически открываем браузер
-            try:
-                webbrowser.open(f'http://localhost:{server_port}')
-            except:
-                pass
+            if self.open_browser:
+                try:
+                    webbrowser.open(f'http://localhost:{server_port}')
+                except:
+                    pass
                 
         except Exception as e:
             print(f"Ошибка запуска веб-сервера: {e}")
@@ -1587,7 +2975,21 @@ class WebCSVMonitor:
         except KeyboardInterrupt:
             print("\nЗавершение работы...")
             self.monitoring = False
+            self.live_server.stop()
+            if self.peer_sync is not None:
+                self.peer_sync.stop()
+            self.names.compact()
 
 if __name__ == "__main__":
-    monitor = WebCSVMonitor()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Монитор сессий: веб-интерфейс и API")
+    parser.add_argument('--port', type=int, default=8000, help='порт веб-сервера')
+    parser.add_argument('--host', default='localhost',
+                        help='адрес веб-сервера (0.0.0.0 — чтобы агрегатор забирал сводки по сети)')
+    parser.add_argument('--peers', default=PEERS_FILE, help='файл мониторов для режима агрегатора')
+    parser.add_argument('--no-browser', action='store_true', help='не открывать браузер')
+    args = parser.parse_args()
+
+    monitor = WebCSVMonitor(args.port, not args.no_browser, args.peers, args.host)
     monitor.run()
\ No newline at end of file
@@ -0,0 +1,113 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Ответы меньше порога отдаем как есть: заголовки и CPU дороже экономии
+COMPRESS_MIN_BYTES = 1024
+
+# Кодировки в порядке предпочтения сервера при равных q в Accept-Encoding
+ENCODERS = {}
+if zstandard is not None:
+    ENCODERS['zstd'] = lambda body: zstandard.ZstdCompressor(level=3).compress(body)
+if brotli is not None:
+    ENCODERS['br'] = lambda body: brotli.compress(body, quality=5)
+ENCODERS['gzip'] = lambda body: gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def negotiate(accept_encoding):
+    """Лучшая поддерживаемая кодировка по заголовку Accept-Encoding или None"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+
+    best = None
+    best_q = 0.0
+    for encoding in ENCODERS:
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionCache:
+    """LRU сжатых тел ответов, ключ — (хеш тела, кодировка)
+
+    Клиенты опрашивают API каждые несколько секунд, и между изменениями
+    каталога ответы совпадают байт в байт. Хеш тела считается на порядок
+    быстрее сжатия, поэтому повторный опрос отдает уже сжатые байты.
+    """
+
+    def __init__(self, budget_bytes=32 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def compress(self, body, encoding):
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        compressed = ENCODERS[encoding](body)
+
+        with self._lock:
+            if key not in self._entries and len(compressed) <= self.budget_bytes:
+                self._entries[key] = compressed
+                self._bytes += len(compressed)
+                while self._bytes > self.budget_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return compressed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'encodings': list(ENCODERS),
+            }
+
+
+def encode_response(body, accept_encoding, cache):
+    """(тело, кодировка или None) для ответа с учетом порога и согласования"""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    encoding = negotiate(accept_encoding)
+    if encoding is None:
+        return body, None
+    compressed = cache.compress(body, encoding)
+    if len(compressed) >= len(body):
+        return body, None
+    return compressed, encoding
@@ -0,0 +1,77 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (нужен только для движка pyarrow в pandas)
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+# На маленьких файлах запуск потоков pyarrow дороже самого разбора
+PYARROW_MIN_BYTES = 1024 * 1024
+
+
+# Версии формата stats_history: v2 — скользящее окно 8 нажатий, v1 — старое окно 4
+HISTORY_SCHEMAS = {
+    2: {'avg_window': 8, 'columns': ('BPM_avg8', 'UR_avg8', 'ZX_avg8')},
+    1: {'avg_window': 4, 'columns': ('BPM_avg4', 'UR_avg4', 'ZX_avg4')},
+}
+
+# Нормализованные имена метрик истории, не зависящие от версии формата
+HISTORY_METRICS = ('BPM_avg', 'UR_avg', 'ZX_avg')
+
+BEST_COLUMNS = ('Window Size', 'Type', 'BPM', 'UR', 'ZX')
+BEST_DTYPES = {'Window Size': 'int32', 'Type': 'category', 'BPM': 'float32', 'UR': 'float32', 'ZX': 'float32'}
+
+
+def read_header(path):
+    """Заголовок CSV без чтения остального файла"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [name.strip() for name in f.readline().strip().split(',')]
+
+
+def detect_history_schema(header):
+    """Версия формата истории по заголовку"""
+    for version, schema in HISTORY_SCHEMAS.items():
+        if all(column in header for column in schema['columns']):
+            return version
+    raise ValueError(f"Неизвестный формат истории: {header}")
+
+
+def engine_for(path):
+    """Движок CSV для файла: pyarrow только для крупных файлов"""
+    if CSV_ENGINE == 'pyarrow' and os.path.getsize(path) >= PYARROW_MIN_BYTES:
+        return 'pyarrow'
+    return 'c'
+
+
+def read_history(path):
+    """Чтение stats_history в нормализованном числовом виде
+
+    Возвращает DataFrame с колонками Press, Interval_ms, BPM_avg, UR_avg, ZX_avg
+    (int32/float32, пустые значения первых нажатий — NaN). Версия формата и окно
+    скользящего среднего лежат в df.attrs.
+    """
+    version = detect_history_schema(read_header(path))
+    schema = HISTORY_SCHEMAS[version]
+    usecols = ['Press', 'Interval_ms', *schema['columns']]
+    dtypes = {'Press': 'int32', 'Interval_ms': 'int32'}
+    dtypes.update({column: 'float32' for column in schema['columns']})
+
+    df = pd.read_csv(path, usecols=usecols, dtype=dtypes, engine=engine_for(path))
+    df = df.rename(columns=dict(zip(schema['columns'], HISTORY_METRICS)))
+    df.attrs['schema_version'] = version
+    df.attrs['avg_window'] = schema['avg_window']
+    return df
+
+
+def read_intervals(path):
+    """Только колонка Interval_ms истории (для сводки каталога без полного DataFrame)"""
+    df = pd.read_csv(path, usecols=['Interval_ms'], dtype={'Interval_ms': 'int32'}, engine=engine_for(path))
+    return df['Interval_ms'].to_numpy()
+
+
+def read_best(path):
+    """Чтение best_bpm_ur с явными типами"""
+    return pd.read_csv(path, usecols=list(BEST_COLUMNS), dtype=BEST_DTYPES, engine=engine_for(path))
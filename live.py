@@ -0,0 +1,198 @@
+import os
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+
+# Протокол live-потока (Unix domain socket, поток байт):
+#   заголовок соединения: b'BALV', версия (u8), тиков в секунду (u64 LE)
+#   далее записи по 9 байт: delta_ticks (u64 LE), флаги (u8)
+#   флаги: бит 0 — нажатие Z, 0x80 — начало новой сессии (delta игнорируется)
+LIVE_MAGIC = b'BALV'
+LIVE_VERSION = 1
+LIVE_HEADER = struct.Struct('<4sBQ')
+LIVE_RECORD_DTYPE = np.dtype([('delta_ticks', '<u8'), ('flags', 'u1')])
+FLAG_Z = 0x01
+FLAG_RESET = 0x80
+
+
+def encode_header(ticks_per_s):
+    return LIVE_HEADER.pack(LIVE_MAGIC, LIVE_VERSION, ticks_per_s)
+
+
+def encode_records(deltas, is_z, reset=False):
+    """Пакет записей из массивов интервалов (в тиках) и признаков Z"""
+    records = np.empty(len(deltas) + (1 if reset else 0), dtype=LIVE_RECORD_DTYPE)
+    offset = 0
+    if reset:
+        records[0] = (0, FLAG_RESET)
+        offset = 1
+    records['delta_ticks'][offset:] = deltas
+    records['flags'][offset:] = np.where(is_z, FLAG_Z, 0)
+    return records.tobytes()
+
+
+class LiveSession:
+    """Живая сессия в памяти: интервалы (мс) и признаки Z по мере поступления
+
+    Хранятся только последние capacity нажатий (для страницы нужен лишь хвост),
+    поэтому долгое соединение не растит память; count — все нажатия сессии.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        self._lock = threading.Lock()
+        self.capacity = capacity
+        # Буфер вдвое больше хвоста: сдвиг к началу раз в capacity нажатий
+        self._intervals = np.empty(2 * capacity, dtype=np.int64)
+        self._is_z = np.empty(2 * capacity, dtype=bool)
+        self._stored = 0
+        self._listeners = []
+        self.count = 0
+        self.version = 0
+        self.started_at = None
+        self.last_press_at = None
+
+    def add_listener(self, callback):
+        """callback(intervals_ms, is_z) вызывается на каждый пакет; callback(None, None) — сброс"""
+        self._listeners.append(callback)
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self._stored = 0
+            self.version += 1
+            self.started_at = time.time()
+            self.last_press_at = None
+        for callback in self._listeners:
+            callback(None, None)
+
+    def extend(self, intervals_ms, is_z):
+        """Добавление пакета нажатий (амортизированно O(1) на нажатие)"""
+        if len(intervals_ms) == 0:
+            return
+        with self._lock:
+            tail_intervals = np.asarray(intervals_ms)[-self.capacity:]
+            tail_is_z = np.asarray(is_z)[-self.capacity:]
+            if self._stored + len(tail_intervals) > len(self._intervals):
+                keep = min(self._stored, self.capacity - len(tail_intervals))
+                start = self._stored - keep
+                self._intervals[:keep] = self._intervals[start:self._stored]
+                self._is_z[:keep] = self._is_z[start:self._stored]
+                self._stored = keep
+            end = self._stored + len(tail_intervals)
+            self._intervals[self._stored:end] = tail_intervals
+            self._is_z[self._stored:end] = tail_is_z
+            self._stored = end
+            self.count += len(intervals_ms)
+            self.version += 1
+            now = time.time()
+            if self.started_at is None:
+                self.started_at = now
+            self.last_press_at = now
+        for callback in self._listeners:
+            callback(intervals_ms, is_z)
+
+    def snapshot(self, tail=None):
+        """Копия (последних tail, не больше capacity) интервалов и признаков Z"""
+        with self._lock:
+            start = max(0, self._stored - self.capacity)
+            if tail is not None:
+                start = max(start, self._stored - tail)
+            return self._intervals[start:self._stored].copy(), self._is_z[start:self._stored].copy()
+
+
+class LiveIngestServer:
+    """Прием live-потока нажатий от анализатора через Unix domain socket
+
+    Каждое соединение читается своим потоком большими блоками; записи
+    разбираются через numpy без построчного цикла, поэтому тысячи нажатий в
+    секунду не теряются. Потоковый сокет дает обратное давление вместо потерь.
+    """
+
+    def __init__(self, session, socket_path="live.sock"):
+        self.session = session
+        self.socket_path = str(socket_path)
+        self.running = False
+        self._sock = None
+        self.records_received = 0
+
+    def start(self):
+        if not hasattr(socket, 'AF_UNIX'):
+            print("Live-сокет недоступен: платформа не поддерживает AF_UNIX")
+            return False
+        try:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.bind(self.socket_path)
+            self._sock.listen(4)
+        except OSError as e:
+            print(f"Ошибка запуска live-сокета {self.socket_path}: {e}")
+            return False
+        self.running = True
+        threading.Thread(target=self._accept_loop, name="live-accept", daemon=True).start()
+        print(f"Live-сокет слушает {self.socket_path}")
+        return True
+
+    def stop(self):
+        self.running = False
+        if self._sock is not None:
+            self._sock.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._read_loop, args=(conn,), name="live-reader", daemon=True).start()
+
+    def _read_loop(self, conn):
+        buffer = bytearray()
+        ticks_per_s = None
+        try:
+            with conn:
+                while self.running:
+                    chunk = conn.recv(1 << 16)
+                    if not chunk:
+                        break
+                    buffer += chunk
+
+                    if ticks_per_s is None:
+                        if len(buffer) < LIVE_HEADER.size:
+                            continue
+                        magic, version, ticks_per_s = LIVE_HEADER.unpack_from(buffer)
+                        if magic != LIVE_MAGIC or version != LIVE_VERSION or ticks_per_s == 0:
+                            print(f"Live-сокет: неверный заголовок {bytes(buffer[:LIVE_HEADER.size])!r}")
+                            return
+                        del buffer[:LIVE_HEADER.size]
+                        # Новое соединение — новая живая сессия
+                        self.session.reset()
+
+                    usable = len(buffer) - len(buffer) % LIVE_RECORD_DTYPE.itemsize
+                    if usable == 0:
+                        continue
+                    records = np.frombuffer(bytes(buffer[:usable]), dtype=LIVE_RECORD_DTYPE)
+                    del buffer[:usable]
+                    self._dispatch(records, ticks_per_s)
+        except OSError as e:
+            print(f"Live-сокет: соединение прервано: {e}")
+
+    def _dispatch(self, records, ticks_per_s):
+        self.records_received += len(records)
+        resets = np.flatnonzero(records['flags'] & FLAG_RESET)
+        start = 0
+        for reset_at in [*resets, len(records)]:
+            part = records[start:reset_at]
+            if len(part):
+                # Перевод тиков в мс, как convert_deltas в src/calc.rs
+                intervals_ms = (part['delta_ticks'] * 1000 // ticks_per_s).astype(np.int64)
+                self.session.extend(intervals_ms, (part['flags'] & FLAG_Z).astype(bool))
+            if reset_at < len(records):
+                self.session.reset()
+            start = reset_at + 1
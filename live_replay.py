@@ -0,0 +1,53 @@
+"""Тестовый клиент live-сокета: воспроизводит stats_history_<id>.csv в реальном времени
+
+    python live_replay.py samples/stats_history_1700000000.csv [--speed 2] [--socket live.sock]
+"""
+import argparse
+import socket
+import time
+
+import numpy as np
+
+from ingest import read_history
+from live import encode_header, encode_records
+
+
+def replay(history_path, socket_path="live.sock", speed=1.0):
+    history = read_history(history_path)
+    # В истории интервалы уже в мс, поэтому тиков в секунду — 1000
+    intervals = history['Interval_ms'].to_numpy(dtype=np.uint64)
+    # Какая клавиша была нажата, в истории не сохраняется — чередуем Z и X
+    is_z = np.arange(len(intervals)) % 2 == 0
+    due = np.cumsum(intervals) / 1000.0 / speed
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(encode_header(1000))
+        print(f"Воспроизведение {len(intervals)} нажатий из {history_path} (x{speed})")
+
+        start = time.perf_counter()
+        sent = 0
+        while sent < len(intervals):
+            elapsed = time.perf_counter() - start
+            # Все нажатия, время которых уже наступило, отправляем одним пакетом
+            until = int(np.searchsorted(due, elapsed, side='right'))
+            if until > sent:
+                sock.sendall(encode_records(intervals[sent:until], is_z[sent:until]))
+                sent = until
+            else:
+                time.sleep(min(0.05, due[sent] - elapsed))
+
+    print(f"Отправлено {sent} нажатий за {time.perf_counter() - start:.1f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('history', help='файл stats_history_<id>.csv')
+    parser.add_argument('--socket', default='live.sock', help='путь к live-сокету монитора')
+    parser.add_argument('--speed', type=float, default=1.0, help='множитель скорости воспроизведения')
+    args = parser.parse_args()
+    replay(args.history, args.socket, args.speed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""Нагрузочный тест HTTP API монитора: N открытых панелей и поток экспортов
+
+    python loadtest.py --clients 10 --duration 60 [--sessions 200] [--export-interval 5]
+
+В отличие от bench.py тест запускает настоящий сервер (gui.py в отдельном
+процессе) на синтетической папке samples/ во временном каталоге и нагружает
+его так, как это делают открытые страницы:
+
+- каждый клиент раз в 2 с опрашивает первую страницу /api/data, часть
+  клиентов (открыта вкладка рекордов) раз в 10 с — /api/records; как и
+  браузер, клиент присылает If-None-Match и получает 304 без изменений;
+- отдельный поток переименовывает и удаляет сессии (после удаления клиент
+  сразу перечитывает страницу, как интерфейс);
+- процесс-писатель все время экспортирует новые сессии в samples/.
+
+В конце печатаются p50/p95/p99 задержек, пропускная способность и доля
+ошибок по каждому запросу, а также CPU и RSS процесса сервера из /proc.
+"""
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+from bench import make_samples, write_synthetic_session
+
+
+# Расписание страницы (см. setInterval в gui.py)
+DATA_POLL_INTERVAL = 2.0
+RECORDS_POLL_INTERVAL = 10.0
+PAGE_SIZE = 20
+
+
+class Recorder:
+    """Задержки и статусы запросов по именам"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self.bytes = defaultdict(int)
+
+    def add(self, name, seconds, status, size, error=False):
+        with self._lock:
+            self.samples[name].append(seconds)
+            self.statuses[name][status] += 1
+            self.bytes[name] += size
+            if error:
+                self.errors[name] += 1
+
+
+class Client:
+    """HTTP-клиент с кешем по ETag, как у браузера"""
+
+    def __init__(self, base_url, recorder, timeout=30.0):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.timeout = timeout
+        # URL -> (ETag, тело последнего ответа 200)
+        self._cache = {}
+
+    def request(self, name, path, method='GET', payload=None, expected=(200,)):
+        """(статус, тело) запроса; тело 304 берется из кеша"""
+        url = self.base_url + path
+        headers = {'Accept-Encoding': 'gzip'}
+        cached = self._cache.get(url) if method == 'GET' else None
+        if cached is not None:
+            headers['If-None-Match'] = cached[0]
+        data = None
+        if payload is not None:
+            data = json.dumps(payload).encode()
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(url, data=data, headers=headers, method=method)
+
+        started = time.perf_counter()
+        status, body, size = None, b'', 0
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status = response.status
+                body = response.read()
+                size = len(body)
+                if response.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                etag = response.headers.get('ETag')
+                if etag and method == 'GET':
+                    self._cache[url] = (etag, body)
+        except urllib.error.HTTPError as e:
+            status = e.code
+            if status == 304 and cached is not None:
+                body = cached[1]
+        except OSError:
+            status = 'error'
+        seconds = time.perf_counter() - started
+        error = status != 304 and status not in expected
+        self.recorder.add(name, seconds, status, size, error)
+        return status, body
+
+
+class SeenSessions:
+    """ID сессий, которые клиенты видели на странице (общие для потоков)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._deleted = set()
+
+    def update(self, ids):
+        with self._lock:
+            self._seen.update(ids)
+
+    def pick(self):
+        """Случайная не удаленная сессия или None"""
+        with self._lock:
+            candidates = sorted(self._seen - self._deleted)
+        return random.choice(candidates) if candidates else None
+
+    def mark_deleted(self, session_id):
+        with self._lock:
+            self._deleted.add(session_id)
+
+
+def dashboard(client, stop, records_tab, seen, reload_now):
+    """Одна открытая страница: опрос данных и, если открыта вкладка, рекордов"""
+    # Страницы открыты не одновременно
+    time.sleep(random.uniform(0, DATA_POLL_INTERVAL))
+    next_records = time.time()
+    while not stop.is_set():
+        started = time.time()
+        status, body = client.request('data', f'/api/data?offset=0&limit={PAGE_SIZE}&sort=newest')
+        if status in (200, 304) and body:
+            try:
+                plots = json.loads(body)['plots']
+                seen.update(plot['id'] for plot in plots)
+            except (ValueError, KeyError):
+                pass
+        if records_tab and started >= next_records:
+            client.request('records', '/api/records?')
+            next_records = started + RECORDS_POLL_INTERVAL
+        # После удаления интерфейс перечитывает страницу сразу
+        if reload_now.wait(max(0.0, DATA_POLL_INTERVAL - (time.time() - started))):
+            reload_now.clear()
+
+
+def mutator(client, stop, seen, reloads, renames_per_min, deletes_per_min):
+    """Переименования и удаления случайных сессий с заданной частотой"""
+    rates = [('rename', renames_per_min / 60.0), ('delete', deletes_per_min / 60.0)]
+    total = sum(rate for _, rate in rates)
+    if total <= 0:
+        return
+    while not stop.wait(random.expovariate(total)):
+        session_id = seen.pick()
+        if session_id is None:
+            continue
+        action = random.choices([name for name, _ in rates], [rate for _, rate in rates])[0]
+        if action == 'rename':
+            client.request('rename', f'/api/rename/{session_id}', 'POST',
+                           {'name': f'load {random.randrange(10 ** 6)}'})
+        else:
+            seen.mark_deleted(session_id)
+            # Сессию мог уже удалить сканер (писатель ее не трогает) — 404 не ошибка
+            client.request('delete', f'/api/delete/{session_id}', expected=(200, 404))
+            random.choice(reloads).set()
+
+
+def writer(samples_dir, interval, presses, stop):
+    """Процесс-писатель: новая сессия каждые interval секунд (ID новее всех)"""
+    rng = np.random.default_rng()
+    session_id = int(time.time())
+    while not stop.wait(interval):
+        session_id = max(session_id + 1, int(time.time()))
+        write_synthetic_session(samples_dir, session_id, presses, rng)
+
+
+class ProcessSampler:
+    """CPU и RSS процесса из /proc раз в period секунд"""
+
+    def __init__(self, pid, period=0.5):
+        self.pid = pid
+        self.period = period
+        self.rss = []
+        self.threads = []
+        self._ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+        self._stop = threading.Event()
+        self._start = None
+
+    def _cpu_seconds(self):
+        with open(f'/proc/{self.pid}/stat') as f:
+            # Поля после имени процесса (оно в скобках и может содержать пробелы)
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self._ticks
+
+    def _status(self):
+        values = {}
+        with open(f'/proc/{self.pid}/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                values[key] = value.strip()
+        return int(values['VmRSS'].split()[0]) * 1024, int(values['Threads'])
+
+    def available(self):
+        return os.path.exists(f'/proc/{self.pid}/stat')
+
+    def start(self):
+        self._start = (time.perf_counter(), self._cpu_seconds())
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while not self._stop.wait(self.period):
+            try:
+                rss, threads = self._status()
+            except (OSError, KeyError, ValueError):
+                return
+            self.rss.append(rss)
+            self.threads.append(threads)
+
+    def stop(self):
+        """Средняя загрузка CPU (% одного ядра) с момента start"""
+        self._stop.set()
+        wall = time.perf_counter() - self._start[0]
+        return (self._cpu_seconds() - self._start[1]) / wall * 100
+
+
+def wait_ready(base_url, sessions, timeout):
+    """Ждет, пока сервер ответит и проиндексирует исходные сессии"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/api/status', timeout=5) as response:
+                status = json.loads(response.read())
+            if status['sessions'] >= sessions:
+                return status
+        except (OSError, ValueError, KeyError):
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("Сервер не проиндексировал исходные сессии")
+
+
+def report(recorder, duration):
+    print(f"\n{'запрос':<8} {'всего':>7} {'в с':>7} {'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8} "
+          f"{'304':>6} {'ошибок':>7} {'МБ':>7}")
+    for name in sorted(recorder.samples):
+        samples = np.array(recorder.samples[name]) * 1000
+        count = len(samples)
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        not_modified = recorder.statuses[name].get(304, 0)
+        print(f"{name:<8} {count:>7} {count / duration:>7.2f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} "
+              f"{not_modified / count:>6.0%} {recorder.errors[name] / count:>7.1%} "
+              f"{recorder.bytes[name] / 1024 / 1024:>7.1f}")
+    for name in sorted(recorder.statuses):
+        statuses = ", ".join(f"{status}: {n}" for status, n in sorted(recorder.statuses[name].items(), key=str))
+        print(f"  {name}: {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=10, help='открытых страниц')
+    parser.add_argument('--records-share', type=float, default=0.5,
+                        help='доля страниц с открытой вкладкой рекордов')
+    parser.add_argument('--duration', type=float, default=60.0, help='длительность нагрузки, с')
+    parser.add_argument('--sessions', type=int, default=200, help='сессий в samples/ до начала')
+    parser.add_argument('--presses', type=int, default=2000, help='нажатий в сессии')
+    parser.add_argument('--export-interval', type=float, default=5.0,
+                        help='пауза между новыми экспортами писателя, с (0 — без писателя)')
+    parser.add_argument('--renames-per-min', type=float, default=6.0)
+    parser.add_argument('--deletes-per-min', type=float, default=2.0)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', action='store_true', help='не удалять временный каталог (лог сервера)')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    workdir = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    samples_dir = workdir / "samples"
+    print(f"Каталог теста: {workdir}")
+    make_samples(samples_dir, args.sessions, args.presses, seed=args.seed)
+
+    gui_path = Path(__file__).resolve().parent / "gui.py"
+    log = open(workdir / "server.log", 'w')
+    server = subprocess.Popen(
+        [sys.executable, str(gui_path), '--port', str(args.port), '--no-browser', '--peers', ''],
+        cwd=workdir, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://localhost:{args.port}"
+    stop = threading.Event()
+    writer_stop = multiprocessing.Event()
+    writer_process = None
+    try:
+        started = time.perf_counter()
+        wait_ready(base_url, args.sessions, timeout=300)
+        print(f"Сервер готов за {time.perf_counter() - started:.1f} с (pid {server.pid})")
+
+        sampler = ProcessSampler(server.pid)
+        if sampler.available():
+            sampler.start()
+        else:
+            sampler = None
+
+        if args.export_interval > 0:
+            writer_process = multiprocessing.Process(
+                target=writer, args=(samples_dir, args.export_interval, args.presses, writer_stop), daemon=True)
+            writer_process.start()
+
+        recorder = Recorder()
+        seen = SeenSessions()
+        reloads = [threading.Event() for _ in range(args.clients)]
+        records_clients = round(args.clients * args.records_share)
+        threads = [
+            threading.Thread(target=dashboard, daemon=True,
+                             args=(Client(base_url, recorder), stop, index < records_clients, seen, reloads[index]))
+            for index in range(args.clients)
+        ]
+        threads.append(threading.Thread(
+            target=mutator, daemon=True,
+            args=(Client(base_url, recorder), stop, seen, reloads,
+                  args.renames_per_min, args.deletes_per_min)))
+        for thread in threads:
+            thread.start()
+
+        load_started = time.perf_counter()
+        stop.wait(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=30)
+        duration = time.perf_counter() - load_started
+        cpu = sampler.stop() if sampler is not None else None
+
+        with urllib.request.urlopen(base_url + '/api/status', timeout=10) as response:
+            status = json.loads(response.read())
+
+        print(f"\nКлиентов: {args.clients} (рекорды: {records_clients}), {duration:.1f} с, "
+              f"сессий в каталоге: {status['sessions']}, очередь рендеринга: {status['render_queue']}")
+        report(recorder, duration)
+        if sampler is not None and sampler.rss:
+            print(f"\nСервер: CPU {cpu:.0f}% одного ядра, RSS пик {max(sampler.rss) / 1024 / 1024:.0f} МБ, "
+                  f"в конце {sampler.rss[-1] / 1024 / 1024:.0f} МБ, потоков до {max(sampler.threads)}")
+        else:
+            print("\nCPU и RSS сервера недоступны (нет /proc)")
+        print(f"Кеш сжатия: {status['compression']}, single-flight: {status['single_flight']}")
+    finally:
+        stop.set()
+        writer_stop.set()
+        if writer_process is not None:
+            writer_process.join(timeout=10)
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        log.close()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+from types import MappingProxyType
+
+
+class NamesStore:
+    """Имена сессий: снимок names.json и журнал дописываемых изменений
+
+    Переименование дописывает по строке JSON на сессию в журнал (один fsync на
+    пакет) вместо перезаписи всего names.json. Когда в журнале накапливается
+    compact_every записей, снимок перезаписывается атомарно, а журнал очищается.
+    Повторное применение журнала к новому снимку ничего не меняет, поэтому сбой
+    между заменой снимка и очисткой журнала безопасен.
+    """
+
+    def __init__(self, snapshot_path="names.json", journal_path="names.journal", compact_every=1000):
+        self.snapshot_path = str(snapshot_path)
+        self.journal_path = str(journal_path)
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._names = {}
+        self._journal_entries = 0
+        # Неизменяемая копия имен для снимков данных; None — устарела
+        self._frozen = None
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    # Приводим ключи к строковому типу, если они числовые
+                    self._names = {str(k): v for k, v in json.load(f).items()}
+        except (IOError, json.JSONDecodeError) as e:
+            print(f"Ошибка загрузки файла имен: {e}")
+
+        try:
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, 'rb+') as f:
+                    content = f.read()
+                    # Недописанную после сбоя строку отрезаем, иначе к ней приклеится следующая запись
+                    complete = content.rfind(b"\n") + 1
+                    if complete < len(content):
+                        f.truncate(complete)
+                for line in content[:complete].decode('utf-8').splitlines():
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._apply(entry['id'], entry['name'])
+                    self._journal_entries += 1
+        except IOError as e:
+            print(f"Ошибка чтения журнала имен: {e}")
+
+    def _apply(self, session_id, name):
+        if name is None:
+            self._names.pop(str(session_id), None)
+        else:
+            self._names[str(session_id)] = name
+
+    def get(self, session_id, default=None):
+        return self._names.get(str(session_id), default)
+
+    def __getitem__(self, session_id):
+        return self._names[str(session_id)]
+
+    def __setitem__(self, session_id, name):
+        self.set_many({session_id: name})
+
+    def __contains__(self, session_id):
+        return str(session_id) in self._names
+
+    def __len__(self):
+        return len(self._names)
+
+    def items(self):
+        with self._lock:
+            return list(self._names.items())
+
+    def snapshot(self):
+        """Неизменяемая копия {ID: имя}; пока имена не менялись — та же самая"""
+        with self._lock:
+            if self._frozen is None:
+                self._frozen = MappingProxyType(dict(self._names))
+            return self._frozen
+
+    def set_many(self, names):
+        """Пакетное изменение имен {ID: имя}; имя None удаляет запись"""
+        if not names:
+            return
+        lines = "".join(
+            json.dumps({'id': str(session_id), 'name': name}, ensure_ascii=False) + "\n"
+            for session_id, name in names.items()
+        )
+        with self._lock:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            for session_id, name in names.items():
+                self._apply(session_id, name)
+            self._frozen = None
+            self._journal_entries += len(names)
+            if self._journal_entries >= self.compact_every:
+                self._compact()
+
+    def compact(self):
+        with self._lock:
+            if self._journal_entries:
+                self._compact()
+
+    def _compact(self):
+        tmp_path = self.snapshot_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._names, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            open(self.journal_path, 'w').close()
+            self._journal_entries = 0
+        except IOError as e:
+            print(f"Ошибка сжатия журнала имен: {e}")
@@ -0,0 +1,291 @@
+"""Режим агрегатора: сводки сессий с нескольких мониторов по HTTP
+
+Файл peers.json: {"<монитор>": "http://host:8000", ...}. Монитор, у которого
+он есть, раз в interval секунд забирает у каждого пира изменения каталога
+после своего курсора (GET /api/sync) — только сводки сессий (лучшие окна,
+средний BPM, число нажатий, скетчи истории) и удаления, без картинок.
+Таблица рекордов, распределения и прогресс считаются из этих сводок
+локально, поэтому объем обмена зависит только от числа изменений, а не от
+размера архива пира.
+
+Игрок <игрок> пира <монитор> становится у агрегатора игроком
+"<монитор>-<игрок>" со своим каталогом; курсор хранится в этом же каталоге,
+так что после перезапуска синхронизация продолжается с места остановки.
+Графики и ряды для масштабирования запрашиваются у пира только когда их
+открывают в интерфейсе.
+"""
+import base64
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from cache_files import write_cache_text
+from players import PLAYER_NAME_RE, Player, catalog_path, make_session_id
+
+
+PEERS_FILE = "peers.json"
+
+# Сколько изменений одного игрока пир отдает за запрос
+SYNC_PAGE_SIZE = 500
+
+
+def load_peers(config_path=PEERS_FILE):
+    """{монитор: базовый URL} из peers.json; без файла — пустой словарь"""
+    if not os.path.exists(config_path):
+        return {}
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        peers = {}
+        for name, url in config.items():
+            if not PLAYER_NAME_RE.fullmatch(name):
+                print(f"Пропуск монитора с некорректным именем: {name}")
+                continue
+            peers[name] = url.rstrip('/')
+        return peers
+    except (IOError, json.JSONDecodeError, AttributeError) as e:
+        print(f"Ошибка загрузки списка мониторов: {e}")
+        return {}
+
+
+def encode_cursor(cursors):
+    """{игрок: 'epoch:seq'} -> 'игрок:epoch:seq,...' для параметра since"""
+    return ",".join(f"{player}:{cursor}" for player, cursor in sorted(cursors.items()))
+
+
+def parse_cursor(text):
+    """'игрок:epoch:seq,...' -> {игрок: (epoch, seq)}; некорректные части пропускаются"""
+    cursors = {}
+    for part in (text or "").split(','):
+        player, _, rest = part.partition(':')
+        epoch, _, seq = rest.partition(':')
+        if player and epoch and seq.isdigit():
+            cursors[player] = (epoch, int(seq))
+    return cursors
+
+
+def sync_payload(catalog, since=None, limit=SYNC_PAGE_SIZE):
+    """Ответ /api/sync: изменения собственных игроков монитора после курсора
+
+    Если epoch каталога не совпадает с курсором (каталог создан заново или
+    курсора еще нет), изменения отдаются с начала и с флагом reset.
+    Игроки, полученные самим монитором от других, не пересылаются.
+    """
+    cursors = parse_cursor(since)
+    players = {}
+    for player in catalog.players.values():
+        if player.peer is not None:
+            continue
+        epoch = player.catalog.sync_state('epoch')
+        since_epoch, since_seq = cursors.get(player.name, (None, 0))
+        reset = since_epoch != epoch
+        summaries, deleted, last_seq, has_more = player.catalog.changes(0 if reset else since_seq, limit)
+        players[player.name] = {
+            'cursor': f"{epoch}:{last_seq}",
+            'reset': reset,
+            'sessions': [
+                dict(summary, best=[list(row) for row in summary['best']],
+                     sketches={metric: base64.b64encode(blob).decode() for metric, blob in summary['sketches'].items()})
+                for summary in summaries
+            ],
+            'deleted': deleted,
+            'has_more': has_more,
+        }
+    return {'players': players}
+
+
+class PeerSync:
+    """Потоки синхронизации с пирами (по потоку на пир) и запросы графиков к ним"""
+
+    def __init__(self, monitor, peers, interval=5.0, timeout=10.0):
+        self.monitor = monitor
+        self.peers = dict(peers)
+        self.interval = interval
+        self.timeout = timeout
+        self.running = False
+        self._lock = threading.Lock()
+        self._stats = {name: {'url': url, 'last_sync': None, 'error': None, 'bytes': 0, 'changes': 0}
+                       for name, url in self.peers.items()}
+        # Графики, которые сейчас скачиваются с пиров
+        self._fetching = set()
+        self._fetch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="peer-fetch")
+        for peer in self.peers:
+            self._attach_existing(peer)
+
+    def start(self):
+        self.running = True
+        for peer in self.peers:
+            threading.Thread(target=self._sync_loop, args=(peer,), name=f"peer-{peer}", daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self._fetch_pool.shutdown(wait=False)
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def _attach_existing(self, peer):
+        """Каталоги игроков пира, синхронизированные до перезапуска"""
+        for path in glob.glob(catalog_path(f"{peer}-*")):
+            name = os.path.basename(path)[len("catalog_"):-len(".sqlite3")]
+            if name in self.monitor.players or not PLAYER_NAME_RE.fullmatch(name):
+                continue
+            player = Player(name)
+            if player.catalog.sync_state('peer') != peer:
+                player.catalog.close()
+                continue
+            player.peer = peer
+            player.peer_player = player.catalog.sync_state('peer_player')
+            self.monitor.catalog.add_player(player)
+
+    def _shard(self, peer, peer_player):
+        """Игрок агрегатора для игрока пира; None, если имя не помещается в формат ID"""
+        name = f"{peer}-{peer_player}"
+        player = self.monitor.players.get(name)
+        if player is not None:
+            return player if player.peer == peer else None
+        if not PLAYER_NAME_RE.fullmatch(name):
+            print(f"Пропуск игрока {peer_player} монитора {peer}: слишком длинное имя")
+            return None
+        player = Player(name, peer=peer, peer_player=peer_player)
+        player.catalog.set_sync_state('peer', peer)
+        player.catalog.set_sync_state('peer_player', peer_player)
+        return self.monitor.catalog.add_player(player)
+
+    def _get(self, url):
+        """GET с gzip; (тело, размер на проводе)"""
+        request = urllib.request.Request(url, headers={'Accept-Encoding': 'gzip'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            body = response.read()
+            size = len(body)
+            if response.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+        return body, size
+
+    def _sync_loop(self, peer):
+        while self.running:
+            try:
+                self.sync_peer(peer)
+            except (OSError, ValueError) as e:
+                with self._lock:
+                    self._stats[peer]['error'] = str(e)
+                print(f"Ошибка синхронизации с {peer}: {e}")
+            time.sleep(self.interval)
+
+    def sync_peer(self, peer):
+        """Забирает все изменения пира после сохраненных курсоров; возвращает их число"""
+        total = 0
+        while True:
+            cursors = {}
+            for player in self.monitor.players.values():
+                if player.peer == peer:
+                    cursor = player.catalog.sync_state('peer_cursor')
+                    if cursor:
+                        cursors[player.peer_player] = cursor
+            query = urlencode({'since': encode_cursor(cursors), 'limit': SYNC_PAGE_SIZE})
+            body, size = self._get(f"{self.peers[peer]}/api/sync?{query}")
+            payload = json.loads(body)
+
+            has_more = False
+            changed = 0
+            for peer_player, delta in payload['players'].items():
+                player = self._shard(peer, peer_player)
+                if player is None:
+                    continue
+                changed += self._apply(player, delta)
+                has_more = has_more or delta['has_more']
+            total += changed
+
+            with self._lock:
+                stats = self._stats[peer]
+                stats['bytes'] += size
+                stats['changes'] += changed
+                stats['last_sync'] = time.strftime("%H:%M:%S")
+                stats['error'] = None
+            if not has_more:
+                return total
+
+    def _apply(self, player, delta):
+        """Изменения одного игрока пира в его каталоге у агрегатора"""
+        catalog = player.catalog
+        removed = list(delta['deleted'])
+        if delta['reset']:
+            # Каталог пира создан заново — старые сводки больше не действительны
+            removed.extend(catalog.mtimes())
+        if removed:
+            catalog.delete_sessions(removed)
+        catalog.upsert_sessions([
+            dict(summary, sketches={metric: base64.b64decode(blob) for metric, blob in summary.get('sketches', {}).items()})
+            for summary in delta['sessions']
+        ])
+        catalog.set_sync_state('peer_cursor', delta['cursor'])
+
+        changed = len(removed) + len(delta['sessions'])
+        if changed:
+            monitor = self.monitor
+            monitor.catalog.bump(player.name)
+            monitor.touch_data()
+            monitor.schedule_records_chart(player.name)
+            monitor.schedule_records_chart()
+            monitor._cleanup_cache_for_sessions([player.session_id(i) for i in removed])
+        return changed
+
+    def peer_session_id(self, player, local_id):
+        """ID сессии на самом пире"""
+        return make_session_id(player.peer_player, local_id)
+
+    def fetch_plot(self, player, local_id, cache_file):
+        """Фоновая загрузка готового графика сессии с пира в файл кеша
+
+        Пир рисует график с высшим приоритетом, пока его ждут; если он еще не
+        готов, следующий опрос клиента запросит его снова.
+        """
+        key = (player.name, local_id)
+        with self._lock:
+            if key in self._fetching:
+                return
+            self._fetching.add(key)
+
+        def fetch():
+            try:
+                query = urlencode({'ids': self.peer_session_id(player, local_id), 'limit': 1})
+                body, _ = self._get(f"{self.peers[player.peer]}/api/data?{query}")
+                plots = json.loads(body)['plots']
+                if plots and not plots[0]['pending'] and plots[0]['image']:
+                    # Проверяем, что пришел base64, прежде чем класть в кеш
+                    base64.b64decode(plots[0]['image'], validate=True)
+                    write_cache_text(cache_file, plots[0]['image'])
+                    self.monitor.touch_data()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ошибка загрузки графика с {player.peer}: {e}")
+            finally:
+                with self._lock:
+                    self._fetching.discard(key)
+
+        self._fetch_pool.submit(fetch)
+
+    def fetch_session_json(self, player, local_id, resource, params):
+        """/api/session/<ID>/<resource> сессии прямо с пира (None при ошибке)"""
+        params = {name: value for name, value in params.items() if value is not None}
+        url = (f"{self.peers[player.peer]}/api/session/{self.peer_session_id(player, local_id)}/{resource}"
+               f"?{urlencode(params)}")
+        try:
+            body, _ = self._get(url)
+            data = json.loads(body)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка загрузки {resource} с {player.peer}: {e}")
+            return None
+        data['id'] = player.session_id(local_id)
+        return data
+
+    def fetch_series(self, player, local_id, start=0, stop=None, px=1000):
+        """Ряды для масштабируемого графика — прямо с пира"""
+        return self.fetch_session_json(player, local_id, 'series', {'from': start, 'to': stop, 'px': px})
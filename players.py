@@ -0,0 +1,297 @@
+"""Несколько игроков: у каждого своя папка сессий, свой каталог и свой сканер
+
+Файл players.json: {"<игрок>": "<папка с CSV>", ...}. Игрок local (папка
+samples, каталог catalog.sqlite3) есть всегда и сохраняет прежние ID сессий,
+поэтому имена, кеш графиков и каталог одного игрока переносятся как есть.
+ID сессий остальных игроков — "<игрок>.<timestamp>", каталог каждого лежит
+в отдельном файле catalog_<игрок>.sqlite3 со своим соединением и блокировкой,
+так что индексация одной папки не ждет другие.
+"""
+import heapq
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+from catalog import RECORD_WINDOW_SIZES, SessionCatalog
+from quantiles import KLLSketch
+
+
+DEFAULT_PLAYER = 'local'
+PLAYERS_FILE = "players.json"
+
+# Имя игрока входит в ID сессии и в имена файлов кеша (<ID>_<ключ>), поэтому
+# без точек и подчеркиваний
+PLAYER_NAME_RE = re.compile(r'[A-Za-z0-9-]{1,32}')
+SESSION_ID_RE = re.compile(r'(?:([A-Za-z0-9-]{1,32})\.)?(\d{1,15})')
+
+# Ключи слияния страниц разных каталогов — тот же порядок, что SESSION_SORTS
+# в SQLite (NULL в начале по возрастанию и в конце по убыванию)
+SORT_KEYS = {
+    'newest': lambda s: (-s['mtime'], -s['created']),
+    'oldest': lambda s: (s['mtime'], s['created']),
+    'bpm_desc': lambda s: (s['mean_bpm'] is None, -(s['mean_bpm'] or 0), -s['created']),
+    'bpm_asc': lambda s: (s['mean_bpm'] is not None, s['mean_bpm'] or 0, s['created']),
+}
+
+
+def make_session_id(player, local_id):
+    """Публичный ID сессии игрока по timestamp из имени файла"""
+    return str(local_id) if player == DEFAULT_PLAYER else f"{player}.{local_id}"
+
+
+def split_session_id(session_id):
+    """(игрок, timestamp) по публичному ID; ValueError для некорректного ID"""
+    match = SESSION_ID_RE.fullmatch(str(session_id))
+    if match is None:
+        raise ValueError(f"Некорректный ID сессии: {session_id}")
+    return match.group(1) or DEFAULT_PLAYER, match.group(2)
+
+
+def is_session_id(value):
+    return isinstance(value, str) and SESSION_ID_RE.fullmatch(value) is not None
+
+
+def load_players(config_path=PLAYERS_FILE):
+    """{игрок: папка} из players.json; local -> samples, если не задан в файле"""
+    players = {DEFAULT_PLAYER: Path("samples")}
+    if not os.path.exists(config_path):
+        return players
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        for name, samples_dir in config.items():
+            if not PLAYER_NAME_RE.fullmatch(name):
+                print(f"Пропуск игрока с некорректным именем: {name}")
+                continue
+            players[name] = Path(samples_dir)
+    except (IOError, json.JSONDecodeError, AttributeError) as e:
+        print(f"Ошибка загрузки списка игроков: {e}")
+    return players
+
+
+def catalog_path(name):
+    return "catalog.sqlite3" if name == DEFAULT_PLAYER else f"catalog_{name}.sqlite3"
+
+
+class Player:
+    """Папка сессий игрока и его каталог
+
+    У игрока с другого монитора (см. peers.py) папки нет: samples_dir — None,
+    peer — имя монитора-источника, peer_player — имя игрока на нем.
+    """
+
+    def __init__(self, name, samples_dir=None, peer=None, peer_player=None):
+        self.name = name
+        self.samples_dir = Path(samples_dir) if samples_dir is not None else None
+        self.peer = peer
+        self.peer_player = peer_player
+        self.catalog = SessionCatalog(catalog_path(name))
+        # Растет при каждом изменении каталога игрока
+        self.catalog_version = 0
+
+    def session_id(self, local_id):
+        return make_session_id(self.name, local_id)
+
+
+class PlayerCatalog:
+    """Каталоги всех игроков за интерфейсом SessionCatalog с публичными ID
+
+    Запросы с player=None объединяют каталоги: страницы сливаются по ключу
+    сортировки, рекорды и сводки прогресса складываются по корзинам.
+    """
+
+    def __init__(self, players):
+        self.players = {name: Player(name, samples_dir) for name, samples_dir in players.items()}
+        self._version_lock = threading.Lock()
+        # Слитые скетчи нескольких игроков: {(метрика, окно, игроки): (версии скетчей, скетч)}
+        self._merged_sketches = {}
+
+    def add_player(self, player):
+        """Добавление игрока на ходу: словарь заменяется целиком, поэтому
+        потоки, которые сейчас перебирают игроков, дочитают старую копию"""
+        with self._version_lock:
+            players = dict(self.players)
+            players[player.name] = player
+            self.players = players
+        return player
+
+    def _selected(self, player=None):
+        return [self.players[player]] if player is not None else list(self.players.values())
+
+    def _group(self, session_ids):
+        """{игрок: [timestamp, ...]}; ID неизвестных игроков пропускаются"""
+        groups = {}
+        for session_id in session_ids:
+            try:
+                name, local_id = split_session_id(session_id)
+            except ValueError:
+                continue
+            if name in self.players:
+                groups.setdefault(self.players[name], []).append(local_id)
+        return groups
+
+    def _public(self, player, row):
+        row['id'] = player.session_id(row['id'])
+        row['player'] = player.name
+        return row
+
+    def bump(self, player_name):
+        """Отметка об изменении каталога игрока"""
+        with self._version_lock:
+            self.players[player_name].catalog_version += 1
+
+    def version(self, player=None):
+        """Версия каталога игрока или сумма версий всех (тоже только растет)"""
+        return sum(p.catalog_version for p in self._selected(player))
+
+    def close(self):
+        for player in self.players.values():
+            player.catalog.close()
+
+    def upsert_sessions(self, summaries):
+        by_player = {}
+        for summary in summaries:
+            name, local_id = split_session_id(summary['id'])
+            by_player.setdefault(name, []).append(dict(summary, id=local_id))
+        for name, player_summaries in by_player.items():
+            self.players[name].catalog.upsert_sessions(player_summaries)
+
+    def delete_sessions(self, session_ids):
+        for player, local_ids in self._group(session_ids).items():
+            player.catalog.delete_sessions(local_ids)
+
+    def set_names(self, names):
+        for player, local_ids in self._group(names).items():
+            player.catalog.set_names({local_id: names[player.session_id(local_id)] for local_id in local_ids})
+
+    def unsketched(self, player):
+        """Публичные ID сессий игрока без скетчей истории"""
+        player = self.players[player]
+        return {player.session_id(local_id) for local_id in player.catalog.unsketched()}
+
+    def mtimes(self, player):
+        """{публичный ID: mtime} сессий одного игрока"""
+        player = self.players[player]
+        return {player.session_id(local_id): mtime for local_id, mtime in player.catalog.mtimes().items()}
+
+    def next_boot(self):
+        """Номер запуска монитора (хранится в каталоге игрока по умолчанию)"""
+        return self.players[DEFAULT_PLAYER].catalog.next_boot()
+
+    def seq(self, player=None):
+        """Сумма номеров изменений каталогов (растет при любой записи в любой из них)"""
+        return sum(p.catalog.seq() for p in self._selected(player))
+
+    def count_sessions(self, player=None):
+        return sum(p.catalog.count_sessions() for p in self._selected(player))
+
+    def list_sessions(self, limit=None, offset=0, sort='newest', ids=None, player=None):
+        """Страница списка сессий; строки с публичным 'id' и полем 'player'"""
+        if ids is not None:
+            selected = [(p, local_ids) for p, local_ids in self._group(ids).items()
+                        if player is None or p.name == player]
+        else:
+            selected = [(p, None) for p in self._selected(player)]
+        if len(selected) == 1:
+            p, local_ids = selected[0]
+            return [self._public(p, row) for row in p.catalog.list_sessions(limit, offset, sort, local_ids)]
+
+        # Из каждого каталога берем первые offset + limit строк и сливаем их
+        head = None if limit is None else offset + limit
+        pages = [[self._public(p, row) for row in p.catalog.list_sessions(head, 0, sort, local_ids)]
+                 for p, local_ids in selected]
+        merged = list(heapq.merge(*pages, key=SORT_KEYS[sort]))
+        return merged[offset:] if limit is None else merged[offset:offset + limit]
+
+    def best_windows(self, session_ids):
+        curves = {}
+        for player, local_ids in self._group(session_ids).items():
+            for local_id, curve in player.catalog.best_windows(local_ids).items():
+                curves[player.session_id(local_id)] = curve
+        return curves
+
+    def records(self, player=None):
+        """Рекорды игрока или общие: по BPM окну минимум UR и сумма сессий"""
+        selected = self._selected(player)
+        if len(selected) == 1:
+            return selected[0].catalog.records()
+        merged = {}
+        for p in selected:
+            for record in p.catalog.records():
+                current = merged.get(record['center_bpm'])
+                if current is None:
+                    merged[record['center_bpm']] = dict(record)
+                    continue
+                current['count'] += record['count']
+                for w in RECORD_WINDOW_SIZES:
+                    values = [v for v in (current[f'best_ur_{w}'], record[f'best_ur_{w}']) if v is not None]
+                    current[f'best_ur_{w}'] = min(values) if values else None
+        return [merged[center] for center in sorted(merged)]
+
+    def session_sketch(self, session_id, metric):
+        name, local_id = split_session_id(session_id)
+        return self.players[name].catalog.session_sketch(local_id, metric)
+
+    def distribution(self, metric, bucket, player=None):
+        """Скетч метрики BPM окна игрока или общий (слияние скетчей игроков) либо None"""
+        selected = self._selected(player)
+        if len(selected) == 1:
+            return selected[0].catalog.distribution(metric, bucket)
+        key = (metric, bucket, tuple(p.name for p in selected))
+        versions = tuple(p.catalog.sketch_version for p in selected)
+        cached = self._merged_sketches.get(key)
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+        sketches = [s for s in (p.catalog.distribution(metric, bucket) for p in selected) if s is not None]
+        merged = KLLSketch.merged(sketches) if sketches else None
+        # Обработчики читают словарь без блокировки: пишем в копию и подменяем целиком
+        with self._version_lock:
+            merged_sketches = dict(self._merged_sketches)
+            merged_sketches[key] = (versions, merged)
+            self._merged_sketches = merged_sketches
+        return merged
+
+    def trends(self, period='day', limit=None, player=None):
+        """Сводки прогресса игрока или общие
+
+        Общая сводка периода собирается из сводок игроков: минимумы и максимумы
+        точные, средние — взвешенные по числу сессий (баланс ZX — по нажатиям).
+        """
+        selected = self._selected(player)
+        if len(selected) == 1:
+            return selected[0].catalog.trends(period, limit)
+        by_start = {}
+        for p in selected:
+            for row in p.catalog.trends(period, limit):
+                by_start.setdefault(row['start'], []).append(row)
+        starts = sorted(by_start)
+        if limit is not None:
+            starts = starts[-limit:] if limit else []
+        return [_merge_rollups(by_start[start]) for start in starts]
+
+
+def _weighted(rows, key, weight):
+    pairs = [(row[key], row[weight]) for row in rows if row[key] is not None and row[weight]]
+    total = sum(w for _, w in pairs)
+    return sum(v * w for v, w in pairs) / total if total else None
+
+
+def _merge_rollups(rows):
+    merged = {
+        'period': rows[0]['period'],
+        'start': rows[0]['start'],
+        'sessions': sum(row['sessions'] for row in rows),
+        'presses': sum(row['presses'] for row in rows),
+        'best_bpm': max((row['best_bpm'] for row in rows if row['best_bpm'] is not None), default=None),
+        'mean_bpm': _weighted(rows, 'mean_bpm', 'sessions'),
+        'zx_balance': _weighted(rows, 'zx_balance', 'presses'),
+    }
+    for w in RECORD_WINDOW_SIZES:
+        merged[f'best_ur_{w}'] = min((row[f'best_ur_{w}'] for row in rows if row[f'best_ur_{w}'] is not None),
+                                     default=None)
+        # Среднее UR — только по сессиям, в которых было окно такого размера
+        merged[f'mean_ur_{w}'] = _weighted(rows, f'mean_ur_{w}', f'ur_sessions_{w}')
+        merged[f'ur_sessions_{w}'] = sum(row[f'ur_sessions_{w}'] for row in rows)
+    return merged
@@ -0,0 +1,351 @@
+"""Фигуры matplotlib для графиков сессий и рекордов
+
+Общие для веб-монитора (gui.py) и пакетного отчета (report.py): функции не
+зависят от состояния монитора, поэтому их можно вызывать в рабочих процессах.
+"""
+import io
+
+import matplotlib
+matplotlib.use('Agg')  # Используем backend без GUI
+import matplotlib.pyplot as plt
+
+from segments import distorted_mask, segment_history
+
+
+# Входит в ключ кеша графиков: при изменении рисунка старые картинки перерисовываются
+PLOT_VERSION = 2
+
+
+def setup_dark_style():
+    """Настройка стилей для темной темы"""
+    plt.style.use('dark_background')
+    plt.rcParams['figure.facecolor'] = '#2b2b2b'
+    plt.rcParams['axes.facecolor'] = '#363636'
+    plt.rcParams['axes.edgecolor'] = '#666666'
+    plt.rcParams['axes.labelcolor'] = '#cccccc'
+    plt.rcParams['text.color'] = '#cccccc'
+    plt.rcParams['xtick.color'] = '#cccccc'
+    plt.rcParams['ytick.color'] = '#cccccc'
+    plt.rcParams['grid.color'] = '#555555'
+
+
+def figure_bytes(fig, fmt='png'):
+    """Сохранение фигуры в байты (png или svg) и закрытие ее"""
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format=fmt, facecolor='#2b2b2b', bbox_inches='tight', dpi=100)
+        return buffer.getvalue()
+    finally:
+        buffer.close()
+        plt.close(fig)
+
+
+def pause_spans(press, streams, count):
+    """Паузы между сериями как отрезки по оси нажатий: [(начало, ширина), ...]"""
+    spans = []
+    prev_stop = 0
+    for start, stop in zip(streams['start'].tolist(), streams['stop'].tolist()):
+        if start > prev_stop:
+            spans.append((press[prev_stop] - 0.5, press[start - 1] - press[prev_stop] + 1))
+        prev_stop = stop
+    if prev_stop < count:
+        spans.append((press[prev_stop] - 0.5, press[count - 1] - press[prev_stop] + 1))
+    return spans
+
+
+def shade_pauses(ax, spans):
+    """Полосы пауз на всю высоту графика (одной коллекцией)"""
+    if spans:
+        ax.broken_barh(spans, (0, 1), transform=ax.get_xaxis_transform(),
+                       facecolor='#ff5555', edgecolor='#ff5555', linewidth=1, alpha=0.3, zorder=0)
+
+
+def session_figure(data, filename):
+    """Фигура сессии с 4 подграфиками: история, интервалы, лучший BPM и UR
+
+    data — {'summary': summary.SessionSummary или None, 'history_data': DataFrame или None}.
+    """
+    summary = data.get('summary')
+
+    # Серии между паузами: из загрузки сессии или считаем здесь (отчет)
+    spans = []
+    distorted = None
+    if data.get('history_data') is not None and not data['history_data'].empty:
+        history_df = data['history_data']
+        intervals = history_df['Interval_ms'].to_numpy()
+        streams, break_ms = data.get('segments') or segment_history(intervals, history_df['ZX_avg'].to_numpy())
+        spans = pause_spans(history_df['Press'].to_numpy(), streams, len(history_df))
+        distorted = distorted_mask(intervals, break_ms, history_df.attrs.get('avg_window', 8))
+
+    # Создаем фигуру с 4 графиками в layout 2x2
+    fig = plt.figure(figsize=(16, 10), facecolor='#2b2b2b')
+
+    # Настраиваем layout для 4 графиков: 2 строки, 2 столбца
+    gs = fig.add_gridspec(2, 2, hspace=0.3, wspace=0.3)
+
+    # График 1 (верх-слева): История статистик со скользящим средним
+    ax1 = fig.add_subplot(gs[0, 0])
+    if data.get('history_data') is not None and not data['history_data'].empty:
+        history_df = data['history_data']
+        # История уже нормализована при загрузке (см. ingest.read_history)
+        avg_window = history_df.attrs.get('avg_window', 8)
+
+        # Фильтруем данные где есть статистики; средние, окно которых захватывает
+        # паузу, не рисуем (разрыв линии) и не учитываем в Avg
+        stats_data = history_df[history_df['BPM_avg'].notna()]
+        clean = ~distorted[history_df['BPM_avg'].notna().to_numpy()]
+        if clean.any():
+            stats_data = stats_data.assign(BPM_avg=stats_data['BPM_avg'].where(clean),
+                                           UR_avg=stats_data['UR_avg'].where(clean))
+        shade_pauses(ax1, spans)
+        if not stats_data.empty:
+            # UR на вторичной оси (рисуем сначала, чтобы был сзади)
+            ax1_ur = ax1.twinx()
+            ax1_ur.plot(stats_data['Press'], stats_data['UR_avg'], 
+                       color='#40e0d0', linewidth=1, label=f'UR (avg{avg_window})', alpha=0.5)
+
+            # BPM (рисуем поверх UR)
+            ax1.plot(stats_data['Press'], stats_data['BPM_avg'], 
+                    color='#ff69b4', linewidth=2, label=f'BPM (avg{avg_window})', alpha=0.8)
+
+            # Горизонтальная пунктирная линия среднего BPM
+            avg_bpm = stats_data['BPM_avg'].mean()
+            ax1.axhline(y=avg_bpm, color='#ff69b4', linestyle='--', linewidth=1.5, alpha=0.7)
+            ax1.text(0.02, avg_bpm + 2, f'Avg: {avg_bpm:.1f} BPM', 
+                    transform=ax1.get_yaxis_transform(), 
+                    color='#ff69b4', fontsize=12, alpha=0.9, weight='bold')
+
+            # Display Best UR at max window size
+            best_ur_val = summary.ur_at_max_window() if summary is not None else None
+            if best_ur_val is not None:
+                ax1_ur.axhline(y=best_ur_val, color='#40e0d0', linestyle='--', linewidth=1.5, alpha=0.7)
+                ax1_ur.text(0.98, best_ur_val + 5, f'Best UR (max win): {best_ur_val:.1f}',
+                           transform=ax1_ur.get_yaxis_transform(),
+                           color='#40e0d0', fontsize=12, alpha=0.9, weight='bold',
+                           horizontalalignment='right')
+            else:
+                # Fallback to mean if no best UR data is available
+                avg_ur = stats_data['UR_avg'].mean()
+                ax1_ur.axhline(y=avg_ur, color='#40e0d0', linestyle='--', linewidth=1.5, alpha=0.7)
+                ax1_ur.text(0.98, avg_ur + 5, f'Avg: {avg_ur:.1f} UR', 
+                           transform=ax1_ur.get_yaxis_transform(), 
+                           color='#40e0d0', fontsize=12, alpha=0.9, weight='bold',
+                           horizontalalignment='right')
+
+            # Устанавливаем скейл BPM
+            bpm_max = max(280, stats_data['BPM_avg'].max() * 1.1) if not stats_data['BPM_avg'].empty else 280
+            ax1.set_ylim(0, bpm_max)
+
+            # Устанавливаем скейл UR (до 300, больше игнорируем)
+            ax1_ur.set_ylim(0, 300)
+            ax1_ur.set_ylabel('UR', color='#40e0d0', fontsize=9)
+            ax1_ur.tick_params(axis='y', labelcolor='#40e0d0', labelsize=7)
+
+    ax1.set_xlabel('Button Press #', color='#cccccc', fontsize=10)
+    ax1.set_ylabel('BPM', color='#ff69b4', fontsize=10)
+    avg_window = data['history_data'].attrs.get('avg_window', 8) if data.get('history_data') is not None else 8
+    ax1.set_title(f'STATS HISTORY (Moving Avg {avg_window})', color='#ffaa44', fontsize=12, pad=10, weight='bold')
+    ax1.grid(True, alpha=0.3)
+    ax1.set_facecolor('#363636')
+    ax1.tick_params(labelsize=8, colors='#cccccc')
+
+    # График 2 (верх-справа): Сырые интервалы между нажатиями
+    ax2 = fig.add_subplot(gs[0, 1])
+    if data.get('history_data') is not None and not data['history_data'].empty:
+        history_df = data['history_data']
+        shade_pauses(ax2, spans)
+        # Рисуем сырые интервалы
+        ax2.plot(history_df['Press'], history_df['Interval_ms'], 
+                color='#88ccff', linewidth=1.5, alpha=0.7, marker='.', markersize=3)
+
+        # Устанавливаем скейл интервалов
+        ax2.set_ylim(0, 200)
+
+        # Добавляем ZX баланс на вторичной оси (только где есть данные)
+        xz_col = 'ZX_avg'
+        stats_data = history_df[history_df[xz_col].notna()]
+        clean = ~distorted[history_df[xz_col].notna().to_numpy()]
+        if clean.any():
+            stats_data = stats_data.assign(**{xz_col: stats_data[xz_col].where(clean)})
+        if not stats_data.empty:
+            ax2_xz = ax2.twinx()
+            ax2_xz.plot(stats_data['Press'], stats_data[xz_col], 
+                       color='#cc8800', linewidth=2, alpha=0.8)
+
+            # Устанавливаем симметричный скейл ZX
+            xz_abs_max = max(20, abs(stats_data[xz_col]).max() * 1.1) if not stats_data[xz_col].empty else 20
+            ax2_xz.set_ylim(-xz_abs_max, xz_abs_max)
+            ax2_xz.set_ylabel('ZX %', color='#cc8800', fontsize=9)
+            ax2_xz.tick_params(axis='y', labelcolor='#cc8800', labelsize=7)
+
+    ax2.set_xlabel('Button Press #', color='#cccccc', fontsize=10)
+    ax2.set_ylabel('Interval (ms)', color='#88ccff', fontsize=10)
+    pauses = f' | {len(spans)} PAUSES' if spans else ''
+    ax2.set_title(f'RAW INTERVALS{pauses}', color='#ffaa44', fontsize=12, pad=10, weight='bold')
+    ax2.grid(True, alpha=0.3)
+    ax2.set_facecolor('#363636')
+    ax2.tick_params(labelsize=8, colors='#cccccc')
+
+    # График 3 (низ-слева): Лучший BPM с ZX
+    ax3 = fig.add_subplot(gs[1, 0])
+    if summary is not None and len(summary.best_bpm):
+        best_bpm = summary.best_bpm
+        ax3.plot(best_bpm['window'],
+                best_bpm['bpm'],
+                color='#ff69b4',
+                linewidth=2,
+                marker='o',
+                markersize=4)
+
+        # Устанавливаем скейл BPM
+        bpm_max = max(280, best_bpm['bpm'].max() * 1.1)
+        ax3.set_ylim(0, bpm_max)
+
+        # Добавляем ZX как вторичную метрику
+        ax3_xz = ax3.twinx()
+        ax3_xz.plot(best_bpm['window'],
+                   best_bpm['zx'],
+                   color='#cc8800',
+                   linewidth=1.5,
+                   marker='s',
+                   markersize=3,
+                   alpha=0.7)
+
+        # Устанавливаем симметричный скейл ZX
+        xz_abs_max = max(20, abs(best_bpm['zx']).max() * 1.1)
+        ax3_xz.set_ylim(-xz_abs_max, xz_abs_max)
+        ax3_xz.set_ylabel('ZX %', color='#cc8800', fontsize=9)
+        ax3_xz.tick_params(axis='y', labelcolor='#cc8800', labelsize=7)
+
+    ax3.set_xlabel('Window Size', color='#cccccc', fontsize=10)
+    ax3.set_ylabel('Best BPM', color='#ff69b4', fontsize=10)
+    ax3.set_title('BEST BPM Distribution', color='#ffaa44', fontsize=12, pad=10, weight='bold')
+    ax3.grid(True, alpha=0.3)
+    ax3.set_facecolor('#363636')
+    ax3.tick_params(labelsize=8, colors='#cccccc')
+
+    # График 4 (низ-справа): Лучший UR с ZX
+    ax4 = fig.add_subplot(gs[1, 1])
+    if summary is not None and len(summary.best_ur):
+        best_ur = summary.best_ur
+        ax4.plot(best_ur['window'],
+                best_ur['ur'],
+                color='#40e0d0',
+                linewidth=2,
+                marker='o',
+                markersize=4)
+
+        # Устанавливаем скейл UR
+        ur_max = max(250, best_ur['ur'].max() * 1.1)
+        ax4.set_ylim(0, ur_max)
+
+        # Добавляем метки для UR на 100 и 200 нажатий
+        ur_100_val = summary.ur_at(100)
+        ur_200_val = summary.ur_at(200)
+
+        if ur_100_val is not None:
+            ax4.axhline(y=ur_100_val, color='#40e0d0', linestyle=':', linewidth=2, alpha=0.8)
+            ax4.text(0.02, ur_100_val + ur_max*0.02, f'UR@100: {ur_100_val:.1f}',
+                    transform=ax4.get_yaxis_transform(),
+                    color='#40e0d0', fontsize=11, weight='bold', alpha=0.9)
+
+        if ur_200_val is not None:
+            ax4.axhline(y=ur_200_val, color='#40e0d0', linestyle='-.', linewidth=2, alpha=0.8)
+            ax4.text(0.02, ur_200_val + ur_max*0.02, f'UR@200: {ur_200_val:.1f}',
+                    transform=ax4.get_yaxis_transform(),
+                    color='#40e0d0', fontsize=11, weight='bold', alpha=0.9)
+
+        # Добавляем ZX как вторичную метрику
+        ax4_xz = ax4.twinx()
+        ax4_xz.plot(best_ur['window'],
+                   best_ur['zx'],
+                   color='#cc8800',
+                   linewidth=1.5,
+                   marker='s',
+                   markersize=3,
+                   alpha=0.7)
+
+        # Устанавливаем симметричный скейл ZX
+        xz_abs_max = max(20, abs(best_ur['zx']).max() * 1.1)
+        ax4_xz.set_ylim(-xz_abs_max, xz_abs_max)
+        ax4_xz.set_ylabel('ZX %', color='#cc8800', fontsize=9)
+        ax4_xz.tick_params(axis='y', labelcolor='#cc8800', labelsize=7)
+
+    ax4.set_xlabel('Window Size', color='#cccccc', fontsize=10)
+    ax4.set_ylabel('Best UR', color='#40e0d0', fontsize=10)
+    ax4.set_title('BEST UR Distribution', color='#ffaa44', fontsize=12, pad=10, weight='bold')
+    ax4.grid(True, alpha=0.3)
+    ax4.set_facecolor('#363636')
+    ax4.tick_params(labelsize=8, colors='#cccccc')
+
+    # Добавляем общий заголовок
+    fig.suptitle(f"{filename}", color='#cccccc', fontsize=14, y=0.95, weight='bold')
+    return fig
+
+
+def records_figure(records_data):
+    """Единый график с 4 линиями UR в разных цветах"""
+    fig, ax = plt.subplots(1, 1, figsize=(16, 10), facecolor='#2b2b2b')
+
+    # Подготавливаем данные для графиков
+    bpm_100 = [r['center_bpm'] for r in records_data if r['best_ur_100'] is not None]
+    ur_100_values = [r['best_ur_100'] for r in records_data if r['best_ur_100'] is not None]
+
+    bpm_200 = [r['center_bpm'] for r in records_data if r['best_ur_200'] is not None]
+    ur_200_values = [r['best_ur_200'] for r in records_data if r['best_ur_200'] is not None]
+
+    bpm_500 = [r['center_bpm'] for r in records_data if r['best_ur_500'] is not None]
+    ur_500_values = [r['best_ur_500'] for r in records_data if r['best_ur_500'] is not None]
+
+    bpm_1000 = [r['center_bpm'] for r in records_data if r['best_ur_1000'] is not None]
+    ur_1000_values = [r['best_ur_1000'] for r in records_data if r['best_ur_1000'] is not None]
+
+    # Цвета для разных UR метрик (хорошо различимые)
+    colors = {
+        'ur_100': '#00ff88',    # Яркий зеленый
+        'ur_200': '#40e0d0',    # Бирюзовый
+        'ur_500': '#ff6b6b',    # Коралловый
+        'ur_1000': '#ffd700'    # Золотой
+    }
+
+    # Рисуем все линии на одном графике
+    if ur_100_values:
+        ax.plot(bpm_100, ur_100_values, 'o-', color=colors['ur_100'],
+               linewidth=3, markersize=8, label='UR@100', alpha=0.9)
+
+    if ur_200_values:
+        ax.plot(bpm_200, ur_200_values, 's-', color=colors['ur_200'],
+               linewidth=3, markersize=7, label='UR@200', alpha=0.9)
+
+    if ur_500_values:
+        ax.plot(bpm_500, ur_500_values, '^-', color=colors['ur_500'],
+               linewidth=3, markersize=8, label='UR@500', alpha=0.9)
+
+    if ur_1000_values:
+        ax.plot(bpm_1000, ur_1000_values, 'D-', color=colors['ur_1000'],
+               linewidth=3, markersize=6, label='UR@1000', alpha=0.9)
+
+    # Настройка графика
+    ax.set_title('Best UR Performance vs BPM (±5)', color='#ffaa44', fontsize=18, weight='bold', pad=20)
+    ax.set_xlabel('BPM', color='#cccccc', fontsize=14, weight='bold')
+    ax.set_ylabel('Unstable Rate', color='#cccccc', fontsize=14, weight='bold')
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.set_facecolor('#363636')
+    ax.tick_params(labelsize=12, colors='#cccccc')
+
+    # Находим общий максимум для всех UR значений
+    all_ur_values = ur_100_values + ur_200_values + ur_500_values + ur_1000_values
+    if all_ur_values:
+        max_ur = max(all_ur_values)
+        ax.set_ylim(0, max_ur * 1.1)
+
+    # Добавляем легенду
+    legend = ax.legend(loc='upper right', frameon=True, fancybox=True, shadow=True,
+                     fontsize=12, framealpha=0.9)
+    legend.get_frame().set_facecolor('#404040')
+    legend.get_frame().set_edgecolor('#666666')
+    for text in legend.get_texts():
+        text.set_color('#cccccc')
+
+    fig.tight_layout()
+    return fig
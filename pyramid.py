@@ -0,0 +1,154 @@
+"""Многоуровневая пирамида min/max/mean по истории сессии для масштабируемых графиков
+
+Формат файла <ID>_<ключ>.pyr в папке кеша:
+    заголовок: b'BAPY', версия (u8), число уровней (u8), нажатий (u64 LE)
+    таблица уровней: для каждого уровня смещение и число корзин (u64 LE)
+    уровень 0 — сами значения (float32 на колонку), уровень k — корзины по 2^k
+    нажатий с min/max/mean (float32) для каждой колонки; последний уровень —
+    одна корзина на всю сессию, так что любой диапазон укладывается в px корзин
+Уровни читаются через np.memmap, поэтому запрос любого масштаба читает с диска
+только нужные корзины одного уровня, независимо от длины сессии.
+"""
+import math
+import os
+import struct
+
+import numpy as np
+
+
+PYRAMID_MAGIC = b'BAPY'
+PYRAMID_VERSION = 2
+PYRAMID_HEADER = struct.Struct('<4sBBQ')
+PYRAMID_LEVEL = struct.Struct('<QQ')
+
+# Колонки нормализованной истории (см. ingest.read_history)
+SERIES_COLUMNS = ('Interval_ms', 'BPM_avg', 'UR_avg', 'ZX_avg')
+
+RAW_DTYPE = np.dtype([(column, '<f4') for column in SERIES_COLUMNS])
+BUCKET_DTYPE = np.dtype([(f"{column}_{stat}", '<f4') for column in SERIES_COLUMNS for stat in ('min', 'max', 'mean')])
+
+
+def build_pyramid(history_df):
+    """Уровни пирамиды по DataFrame истории: [сырые значения, корзины 2, 4, 8, ..., одна корзина]
+
+    Пустые значения (первые нажатия без скользящего среднего) в агрегаты не входят.
+    """
+    count = len(history_df)
+    raw = np.empty(count, dtype=RAW_DTYPE)
+    for column in SERIES_COLUMNS:
+        raw[column] = history_df[column].to_numpy(dtype=np.float32)
+    levels = [raw]
+
+    # Для точного среднего на следующих уровнях держим суммы и количества
+    state = {}
+    for column in SERIES_COLUMNS:
+        values = raw[column].astype(np.float64)
+        valid = ~np.isnan(values)
+        state[column] = (values, values, np.where(valid, values, 0.0), valid.astype(np.int64))
+
+    size = count
+    while size > 1:
+        size = (size + 1) // 2
+        level = np.empty(size, dtype=BUCKET_DTYPE)
+        for column, (mins, maxs, sums, counts) in state.items():
+            if len(mins) % 2:
+                mins, maxs = np.append(mins, np.nan), np.append(maxs, np.nan)
+                sums, counts = np.append(sums, 0.0), np.append(counts, 0)
+            mins = np.fmin(mins[0::2], mins[1::2])
+            maxs = np.fmax(maxs[0::2], maxs[1::2])
+            sums = sums[0::2] + sums[1::2]
+            counts = counts[0::2] + counts[1::2]
+            level[f"{column}_min"] = mins
+            level[f"{column}_max"] = maxs
+            level[f"{column}_mean"] = np.divide(sums, counts, out=np.full(size, np.nan), where=counts > 0)
+            state[column] = (mins, maxs, sums, counts)
+        levels.append(level)
+    return levels
+
+
+def write_pyramid(path, levels):
+    """Атомарная запись пирамиды в файл"""
+    tmp_path = f"{path}.tmp"
+    offset = PYRAMID_HEADER.size + PYRAMID_LEVEL.size * len(levels)
+    with open(tmp_path, 'wb') as f:
+        f.write(PYRAMID_HEADER.pack(PYRAMID_MAGIC, PYRAMID_VERSION, len(levels), len(levels[0])))
+        for level in levels:
+            f.write(PYRAMID_LEVEL.pack(offset, len(level)))
+            offset += level.nbytes
+        for level in levels:
+            f.write(level.tobytes())
+    os.replace(tmp_path, path)
+
+
+class PyramidFile:
+    """Чтение пирамиды: выбор уровня по ширине в пикселях и срез корзин"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            magic, version, level_count, self.press_count = PYRAMID_HEADER.unpack(f.read(PYRAMID_HEADER.size))
+            if magic != PYRAMID_MAGIC or version != PYRAMID_VERSION:
+                raise ValueError(f"Неверный формат пирамиды {self.path}")
+            self._levels = [PYRAMID_LEVEL.unpack(f.read(PYRAMID_LEVEL.size)) for _ in range(level_count)]
+
+    @property
+    def level_count(self):
+        return len(self._levels)
+
+    def level_for(self, start, stop, px):
+        """Самый подробный уровень, на котором диапазон укладывается в px корзин"""
+        px = max(1, px)
+        span = max(1, stop - start)
+        level = max(0, math.ceil(math.log2(span / px))) if span > px else 0
+        # Корзины выровнены по 2^level: невыровненный диапазон задевает лишнюю
+        while level < self.level_count - 1 and -(-stop >> level) - (start >> level) > px:
+            level += 1
+        return min(level, self.level_count - 1)
+
+    def _read_level(self, level, first, last):
+        offset, count = self._levels[level]
+        dtype = RAW_DTYPE if level == 0 else BUCKET_DTYPE
+        last = min(last, count)
+        if first >= last:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode='r',
+                         offset=offset + first * dtype.itemsize, shape=(last - first,))
+
+    def query(self, start, stop, px, level=None):
+        """Ряды min/max/mean для нажатий [start, stop) не длиннее px корзин
+
+        level задает уровень явно (например, общий для нескольких сессий).
+        """
+        start = max(0, min(start, self.press_count))
+        stop = max(start, min(stop, self.press_count))
+        if level is None:
+            level = self.level_for(start, stop, px)
+        level = min(level, self.level_count - 1)
+        bucket = 1 << level
+        first = start // bucket
+        last = -(-stop // bucket)
+        rows = self._read_level(level, first, last)
+
+        series = {}
+        for column in SERIES_COLUMNS:
+            if level == 0:
+                values = _to_list(rows[column])
+                series[column] = {'min': values, 'max': values, 'mean': values}
+            else:
+                series[column] = {stat: _to_list(rows[f"{column}_{stat}"]) for stat in ('min', 'max', 'mean')}
+        return {
+            'press_count': self.press_count,
+            'from': start,
+            'to': stop,
+            'level': level,
+            'bucket': bucket,
+            # Номер первого нажатия каждой корзины (нажатия нумеруются с 1)
+            'x_start': first * bucket + 1,
+            'series': series,
+        }
+
+
+def _to_list(values):
+    """float32 -> список для JSON: два знака после запятой, NaN -> null"""
+    rounded = np.round(np.asarray(values, dtype=np.float64), 2)
+    return [None if v != v else v for v in rounded.tolist()]
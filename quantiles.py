@@ -0,0 +1,148 @@
+"""Потоковые квантильные скетчи (KLL) с ограниченной памятью
+
+Скетч хранит уровни-компакторы: элемент уровня h весит 2**h. Когда уровни
+переполняются, самый нижний полный уровень сортируется, и в следующий уровень
+переходит каждый второй элемент (со случайным сдвигом), так что размер скетча
+около 3k значений при любом числе добавленных. Скетчи сливаются без потери
+гарантий: сливаются уровни, затем сжимаются. Ошибка ранга — порядка 1.7/k
+(для k=200 — около 1%).
+
+Запросы идут по отсортированному массиву значений с накопленными весами,
+который строится один раз после изменения: ранг и квантиль — бинарный поиск
+по массиву размера O(k), не зависящему от числа значений.
+"""
+import random
+import struct
+
+import numpy as np
+
+
+DEFAULT_K = 200
+# Минимальная емкость уровня: ниже нее точность верхних уровней не растет
+MIN_LEVEL_CAPACITY = 8
+_CAPACITY_RATIO = 2.0 / 3.0
+
+# k, число значений, число уровней; затем размеры уровней и значения float32
+_HEADER = struct.Struct('<HQH')
+
+
+class KLLSketch:
+    """Квантильный скетч KLL: update/update_many, merge, rank и quantile"""
+
+    __slots__ = ('k', 'n', 'levels', '_sorted')
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        # (значения, накопленные веса) для запросов; None — нужно пересобрать
+        self._sorted = None
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(MIN_LEVEL_CAPACITY, int(self.k * _CAPACITY_RATIO ** depth))
+
+    def _size(self):
+        return sum(len(level) for level in self.levels)
+
+    def _compress(self):
+        while self._size() > sum(self._capacity(h) for h in range(len(self.levels))):
+            for h, level in enumerate(self.levels):
+                if len(level) < self._capacity(h):
+                    continue
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                level = np.sort(level)
+                # Нечетный элемент остается на своем уровне
+                keep = level[:len(level) % 2]
+                promoted = level[len(keep) + random.getrandbits(1)::2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate((self.levels[h + 1], promoted))
+                break
+
+    def update(self, value):
+        self.update_many((value,))
+
+    def update_many(self, values):
+        """Добавляет массив значений (NaN пропускаются)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self.n += len(values)
+        self._sorted = None
+        self._compress()
+
+    def merge(self, other):
+        """Добавляет значения другого скетча (его самого не меняет)"""
+        if not other.n:
+            return
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate((self.levels[h], level))
+        self.n += other.n
+        self._sorted = None
+        self._compress()
+
+    @classmethod
+    def merged(cls, sketches, k=DEFAULT_K):
+        """Новый скетч из нескольких"""
+        result = cls(k)
+        for sketch in sketches:
+            result.merge(sketch)
+        return result
+
+    def _prepare(self):
+        if self._sorted is None:
+            values = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+            order = np.argsort(values, kind='stable')
+            self._sorted = (values[order], np.cumsum(weights[order]))
+        return self._sorted
+
+    def rank(self, value):
+        """Доля значений меньше value (равные считаются наполовину), от 0 до 1; None — скетч пуст"""
+        if not self.n:
+            return None
+        values, cumulative = self._prepare()
+        total = cumulative[-1]
+        below = np.searchsorted(values, value, side='left')
+        upto = np.searchsorted(values, value, side='right')
+        weight_below = cumulative[below - 1] if below else 0.0
+        weight_upto = cumulative[upto - 1] if upto else 0.0
+        return float((weight_below + weight_upto) / 2 / total)
+
+    def quantile(self, q):
+        """Значение квантиля q (0..1); None — скетч пуст"""
+        if not self.n:
+            return None
+        values, cumulative = self._prepare()
+        index = int(np.searchsorted(cumulative, q * cumulative[-1], side='left'))
+        return float(values[min(index, len(values) - 1)])
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+    def to_bytes(self):
+        """Компактная запись для хранения в каталоге: значения во float32"""
+        sizes = np.array([len(level) for level in self.levels], dtype='<u4')
+        values = np.concatenate(self.levels).astype('<f4')
+        return _HEADER.pack(self.k, self.n, len(self.levels)) + sizes.tobytes() + values.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        k, n, level_count = _HEADER.unpack_from(data)
+        offset = _HEADER.size
+        sizes = np.frombuffer(data, dtype='<u4', count=level_count, offset=offset)
+        offset += sizes.nbytes
+        values = np.frombuffer(data, dtype='<f4', offset=offset).astype(np.float64)
+        sketch = cls(k)
+        sketch.n = n
+        sketch.levels = np.split(values, np.cumsum(sizes)[:-1]) if level_count else [np.empty(0)]
+        return sketch
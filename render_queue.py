@@ -0,0 +1,136 @@
+import heapq
+import itertools
+import threading
+
+
+# Приоритеты заданий (меньше — раньше)
+PRIORITY_VISIBLE = 0
+PRIORITY_RECORDS = 1
+PRIORITY_BACKFILL = 2
+
+
+class RenderScheduler:
+    """Очередь рендеринга с приоритетами
+
+    Задания идентифицируются ключом (например, ID сессии) и версией (mtime).
+    Повторная постановка того же ключа не создает дубликат: у задания только
+    повышается приоритет. Задание с более новой версией вытесняет старое.
+    Рендеринг выполняется в одном фоновом потоке, т.к. pyplot не потокобезопасен.
+    """
+
+    def __init__(self, name="render-worker"):
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        # key -> актуальное задание {'version', 'priority', 'order', 'fn'}
+        self._jobs = {}
+        # key -> (version, результат) последнего выполненного задания
+        self._results = {}
+        self._running = None
+        self._stopped = False
+        self._thread = threading.Thread(target=self._worker, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, key, version, priority, fn, order=0):
+        """Постановка задания в очередь
+
+        order — дополнительный порядок внутри одного приоритета (меньше — раньше).
+        Возвращает False, если результат для этой версии уже есть.
+        """
+        with self._cond:
+            done = self._results.get(key)
+            if done is not None and done[0] == version:
+                return False
+            if self._running == (key, version):
+                return True
+
+            job = self._jobs.get(key)
+            if job is not None:
+                if job['version'] > version:
+                    # Запрошена устаревшая версия — актуальная уже в очереди
+                    return True
+                if job['version'] == version and (job['priority'], job['order']) <= (priority, order):
+                    return True
+
+            self._jobs[key] = {'version': version, 'priority': priority, 'order': order, 'fn': fn}
+            heapq.heappush(self._heap, (priority, order, next(self._seq), key, version))
+            self._cond.notify()
+            return True
+
+    def cancel(self, key):
+        """Отмена задания и забывание результата (например, при удалении сессии)"""
+        with self._cond:
+            self._jobs.pop(key, None)
+            self._results.pop(key, None)
+
+    def put_result(self, key, version, value):
+        """Готовый результат без выполнения (например, прочитанный из кеша на диске)
+
+        Более новый результат, уже сохраненный для ключа, не заменяется.
+        """
+        with self._cond:
+            current = self._results.get(key)
+            if current is None or current[0] <= version:
+                self._results[key] = (version, value)
+            job = self._jobs.get(key)
+            if job is not None and job['version'] <= version:
+                del self._jobs[key]
+
+    def result(self, key, version=None):
+        """Результат последнего выполненного задания (None, если версии не совпадают)"""
+        with self._cond:
+            done = self._results.get(key)
+        if done is None or (version is not None and done[0] != version):
+            return None
+        return done[1]
+
+    def latest_result(self, key):
+        """Последний результат независимо от версии"""
+        with self._cond:
+            done = self._results.get(key)
+        return None if done is None else done[1]
+
+    def pending(self):
+        with self._cond:
+            return len(self._jobs)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _next_job(self):
+        with self._cond:
+            while not self._stopped:
+                while self._heap:
+                    priority, order, _, key, version = heapq.heappop(self._heap)
+                    job = self._jobs.get(key)
+                    # Пропускаем отмененные, вытесненные и продублированные записи кучи
+                    if job is None or job['version'] != version:
+                        continue
+                    if (job['priority'], job['order']) != (priority, order):
+                        continue
+                    del self._jobs[key]
+                    self._running = (key, version)
+                    return key, version, job['fn']
+                self._cond.wait()
+            return None
+
+    def _worker(self):
+        while True:
+            item = self._next_job()
+            if item is None:
+                return
+            key, version, fn = item
+            try:
+                value = fn()
+            except Exception as e:
+                print(f"Ошибка задания рендеринга {key}: {e}")
+                value = None
+            with self._cond:
+                self._running = None
+                # Пока шел рендеринг, могла прийти новая версия — результат все равно
+                # сохраняем, а новое задание останется в очереди
+                current = self._results.get(key)
+                if current is None or current[0] <= version:
+                    self._results[key] = (version, value)
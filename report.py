@@ -0,0 +1,236 @@
+"""Пакетный отчет без веб-сервера: графики всех сессий и рекордов в файлы
+
+    python report.py [--samples samples] [--out report] [--format png|svg] [--jobs N]
+
+Сессии берутся из пар CSV в папке samples и из месячных архивов
+samples/archive (или только из файлов, переданных через --archive).
+Графики рисуются в пуле процессов, по одному заданию на сессию: рабочий
+процесс сам читает файлы сессии и пишет картинку, а обратно отдает только
+сводку, поэтому время почти линейно делится на число ядер. Рядом с
+картинками пишется summary.json со сводками сессий и таблицей рекордов.
+Картинки, которые новее файлов своей сессии, не перерисовываются (--force
+рисует все заново).
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from archive import ARCHIVE_DIR, ARCHIVE_PATTERN, open_archive
+from catalog import RECORD_WINDOW_SIZES, SessionCatalog
+from ingest import read_best, read_history
+from names_store import NamesStore
+from plots import figure_bytes, records_figure, session_figure, setup_dark_style
+from summary import SessionSummary
+
+
+REPORT_FORMATS = ('png', 'svg')
+
+
+def find_sessions(samples_dir="samples", archive_files=None):
+    """Пары сессий: {'id', 'best', 'history'} для CSV, {'id', 'archive', 'entry'} для архивов
+
+    Если сессия есть и в CSV, и в архиве, берется CSV (как в мониторе).
+    """
+    samples_dir = Path(samples_dir)
+    pairs = {}
+    for path in glob.glob(str(samples_dir / "*.csv")):
+        match = re.search(r'(best_bpm_ur|stats_history)_(\d+)\.csv$', path)
+        if not match:
+            continue
+        pair = pairs.setdefault(match.group(2), {'id': match.group(2), 'best': None, 'history': None})
+        pair['best' if match.group(1) == 'best_bpm_ur' else 'history'] = path
+
+    if archive_files is None:
+        archive_files = glob.glob(str(samples_dir / ARCHIVE_DIR / ARCHIVE_PATTERN))
+    for archive_file in sorted(archive_files):
+        try:
+            entries = open_archive(archive_file).entries()
+        except (OSError, ValueError) as e:
+            print(f"Ошибка чтения архива {archive_file}: {e}")
+            continue
+        for session_id, entry in entries.items():
+            pairs.setdefault(session_id, {'id': session_id, 'archive': archive_file, 'entry': entry})
+    return list(pairs.values())
+
+
+def pair_cost(pair):
+    """Оценка объема работы по сессии: число байт или строк истории"""
+    if pair.get('archive'):
+        history = pair['entry'].get('history')
+        return history['rows'] if history else 0
+    try:
+        return os.path.getsize(pair['history']) if pair['history'] else 0
+    except OSError:
+        return 0
+
+
+def pair_mtime(pair):
+    if pair.get('archive'):
+        return pair['entry']['mtime']
+    return max((os.path.getmtime(pair[key]) for key in ('best', 'history') if pair[key]), default=0)
+
+
+def pair_press_count(pair):
+    """Число нажатий без разбора истории: из индекса архива или по строкам CSV"""
+    if pair.get('archive'):
+        history = pair['entry'].get('history')
+        return history['rows'] if history else 0
+    if not pair['history'] or not os.path.exists(pair['history']):
+        return 0
+    with open(pair['history'], 'rb') as f:
+        return max(0, sum(1 for line in f if line.strip()) - 1)
+
+
+def load_pair(pair, with_history=True):
+    """(таблица лучших окон или None, история или None) для пары"""
+    if pair.get('archive'):
+        archive = open_archive(pair['archive'])
+        best_df = archive.read_best(pair['id'])
+        history_df = archive.read_history(pair['id']) if with_history else None
+    else:
+        best_df = read_best(pair['best']) if pair['best'] else None
+        history_df = read_history(pair['history']) if with_history and pair['history'] else None
+    return best_df, history_df
+
+
+def _init_worker():
+    setup_dark_style()
+
+
+def render_session(pair, name, out_dir, fmt, force=False):
+    """Задание рабочего процесса: картинка сессии в out_dir и ее сводка
+
+    name — имя сессии из names.json или None (тогда в заголовке дата).
+    """
+    started = time.perf_counter()
+    session_id = pair['id']
+    title = name or datetime.fromtimestamp(int(session_id)).strftime("%Y-%m-%d %H:%M:%S")
+    image = Path(out_dir) / f"{session_id}.{fmt}"
+    result = {'id': session_id, 'image': image.name, 'skipped': False, 'error': None}
+    try:
+        mtime = pair_mtime(pair)
+        if not force and image.exists() and image.stat().st_mtime >= mtime:
+            # Картинка актуальна — для сводки хватает файла лучших окон
+            best_df, history_df = load_pair(pair, with_history=False)
+            summary = SessionSummary.from_best_df(session_id, mtime, best_df, pair_press_count(pair))
+            result['skipped'] = True
+        else:
+            best_df, history_df = load_pair(pair)
+            press_count = len(history_df) if history_df is not None else 0
+            summary = SessionSummary.from_best_df(session_id, mtime, best_df, press_count)
+            data = {'id': session_id, 'mtime': mtime, 'summary': summary, 'history_data': history_df}
+            body = figure_bytes(session_figure(data, title), fmt)
+            tmp_path = image.with_name(image.name + ".tmp")
+            tmp_path.write_bytes(body)
+            os.replace(tmp_path, image)
+        result['summary'] = summary.catalog_summary(name)
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _session_entry(result):
+    """Запись summary.json по результату задания"""
+    summary = result['summary']
+    best_ur = {w: None for w in RECORD_WINDOW_SIZES}
+    for type_name, window_size, _bpm, ur, _zx in summary['best']:
+        if type_name == 'UR' and window_size in best_ur:
+            best_ur[window_size] = ur
+    return {
+        'id': result['id'],
+        'name': summary['name'],
+        'mtime': summary['mtime'],
+        'press_count': summary['press_count'],
+        'mean_bpm': summary['mean_bpm'],
+        'best_ur': best_ur,
+        'image': result['image'],
+        'skipped': result['skipped'],
+        'seconds': result['seconds'],
+    }
+
+
+def build_report(samples_dir="samples", out_dir="report", fmt='png', jobs=None, archive_files=None,
+                 names=None, force=False):
+    """Графики всех сессий и рекордов в out_dir; возвращает содержимое summary.json"""
+    started = time.perf_counter()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    jobs = jobs or os.cpu_count() or 1
+    names = names or {}
+
+    pairs = find_sessions(samples_dir, archive_files)
+    # Сначала самые длинные сессии: к концу в пуле остаются короткие задания
+    # и ядра не простаивают в ожидании одного большого графика
+    pairs.sort(key=pair_cost, reverse=True)
+    print(f"Сессий: {len(pairs)}, процессов: {jobs}, формат: {fmt}")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as executor:
+        futures = [executor.submit(render_session, pair, names.get(pair['id']), out_dir, fmt, force)
+                   for pair in pairs]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            if result['error']:
+                print(f"Ошибка сессии {result['id']}: {result['error']}")
+            results.append(result)
+            if done % 100 == 0:
+                print(f"Готово {done}/{len(futures)}")
+
+    ok = [r for r in results if not r['error']]
+    # Рекорды считаются тем же SQL, что и в мониторе, по каталогу в памяти
+    catalog = SessionCatalog(":memory:")
+    catalog.upsert_sessions([r['summary'] for r in ok])
+    records_data = catalog.records()
+    catalog.close()
+
+    records_image = None
+    if records_data:
+        setup_dark_style()
+        records_image = f"records.{fmt}"
+        (out_dir / records_image).write_bytes(figure_bytes(records_figure(records_data), fmt))
+
+    ok.sort(key=lambda r: int(r['id']))
+    report = {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'samples': str(samples_dir),
+        'format': fmt,
+        'jobs': jobs,
+        'elapsed_s': round(time.perf_counter() - started, 3),
+        'rendered': sum(1 for r in ok if not r['skipped']),
+        'skipped': sum(1 for r in ok if r['skipped']),
+        'failed': [{'id': r['id'], 'error': r['error']} for r in results if r['error']],
+        'records_image': records_image,
+        'records': records_data,
+        'sessions': [_session_entry(r) for r in ok],
+    }
+    with open(out_dir / "summary.json", 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Нарисовано: {report['rendered']}, без изменений: {report['skipped']}, "
+          f"с ошибками: {len(report['failed'])}, за {report['elapsed_s']:.1f} с")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', default='samples', help='папка с CSV сессий')
+    parser.add_argument('--archive', action='append', help='месячный архив (можно несколько); по умолчанию samples/archive')
+    parser.add_argument('--out', default='report', help='папка для картинок и summary.json')
+    parser.add_argument('--format', choices=REPORT_FORMATS, default='png')
+    parser.add_argument('--jobs', type=int, default=None, help='число процессов (по умолчанию — все ядра)')
+    parser.add_argument('--names', default='names.json', help='файл имен сессий (журнал рядом, .journal)')
+    parser.add_argument('--force', action='store_true', help='перерисовать и актуальные картинки')
+    args = parser.parse_args()
+
+    names = NamesStore(args.names, str(Path(args.names).with_suffix('.journal')))
+    build_report(args.samples, args.out, args.format, args.jobs, args.archive, names, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+
+# Окна, для которых по умолчанию ведутся текущие и лучшие значения
+DEFAULT_WINDOW_SIZES = (20, 100, 200, 500, 1000, 2000)
+
+# Окно скользящего среднего для линии истории (как в src/export.rs)
+HISTORY_WINDOW = 8
+
+# Сколько последних точек линии истории держать в памяти
+LINE_CAPACITY = 10000
+
+
+def window_stats(n, total, sq_total, z_total):
+    """BPM/UR/ZX окна по суммам — те же формулы, что calc_stats в src/calc.rs
+
+    Среднее целочисленное, сумма квадратов отклонений от него считается точно:
+    sum((d - avg)^2) = sum(d^2) - 2*avg*sum(d) + n*avg^2.
+    """
+    avg = total // n
+    sq_dev = sq_total - 2 * avg * total + n * avg * avg
+    ur = math.sqrt(sq_dev / (n - 1)) * 10.0 if n > 1 else 0.0
+    bpm = 60000.0 / avg / 4.0 if avg > 0 else 0.0
+    zx = (total - z_total) / total - 0.5 if total > 0 else 0.0
+    return bpm, ur, zx
+
+
+class SlidingWindow:
+    """Скользящее окно фиксированного размера с O(1) обновлением
+
+    Хранит суммы, суммы квадратов и суммы интервалов Z, а также монотонные
+    деки для минимума и максимума интервала внутри окна.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.total = 0
+        self.sq_total = 0
+        self.z_total = 0
+        # Деки (номер нажатия, интервал): возрастающий для минимума, убывающий для максимума
+        self._min = deque()
+        self._max = deque()
+        self.best_bpm = None
+        self.best_ur = None
+        self.best_zx = None
+
+    def push(self, index, interval, is_z, leaving):
+        """Нажатие index входит в окно; leaving — (интервал, is_z) выходящего или None"""
+        self.total += interval
+        self.sq_total += interval * interval
+        if is_z:
+            self.z_total += interval
+        if leaving is not None:
+            old_interval, old_is_z = leaving
+            self.total -= old_interval
+            self.sq_total -= old_interval * old_interval
+            if old_is_z:
+                self.z_total -= old_interval
+
+        while self._min and self._min[-1][1] >= interval:
+            self._min.pop()
+        self._min.append((index, interval))
+        while self._max and self._max[-1][1] <= interval:
+            self._max.pop()
+        self._max.append((index, interval))
+        first = index - self.size + 1
+        while self._min[0][0] < first:
+            self._min.popleft()
+        while self._max[0][0] < first:
+            self._max.popleft()
+
+        if index + 1 < self.size:
+            return None
+
+        bpm, ur, zx = window_stats(self.size, self.total, self.sq_total, self.z_total)
+        stats = {'end': index + 1, 'bpm': bpm, 'ur': ur, 'zx': zx * 100.0,
+                 'min_ms': self._min[0][1], 'max_ms': self._max[0][1]}
+        if self.best_bpm is None or bpm > self.best_bpm['bpm']:
+            self.best_bpm = stats
+        if self.best_ur is None or ur < self.best_ur['ur']:
+            self.best_ur = stats
+        if self.best_zx is None or abs(zx * 100.0) < abs(self.best_zx['zx']):
+            self.best_zx = stats
+        return stats
+
+
+class RollingStatsEngine:
+    """Инкрементальная статистика живой сессии
+
+    На каждое нажатие — O(1) амортизированной работы на каждое окно: линия
+    скользящего среднего по HISTORY_WINDOW нажатиям, текущие значения и лучшие
+    BPM/UR/ZX окна для заданных размеров. Полная история не пересчитывается.
+    """
+
+    def __init__(self, window_sizes=DEFAULT_WINDOW_SIZES):
+        self.window_sizes = tuple(sorted(set(window_sizes)))
+        self._lock = threading.Lock()
+        # Версия растет и при сбросе, чтобы клиенты заметили новую сессию
+        self.version = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.total = 0
+            self.sq_total = 0
+            self.z_total = 0
+            self.version += 1
+            # Кольцо последних нажатий — нужно только для выхода из окон
+            self._recent = deque(maxlen=max(self.window_sizes + (HISTORY_WINDOW,)))
+            self._history = SlidingWindow(HISTORY_WINDOW)
+            self._windows = {size: SlidingWindow(size) for size in self.window_sizes}
+            self._current = {}
+            # Точки линии истории: номер нажатия, BPM, UR, ZX
+            self._line = {'press': [], 'bpm': [], 'ur': [], 'zx': []}
+
+    def feed(self, intervals_ms, is_z):
+        """Слушатель LiveSession: пакет нажатий или (None, None) для сброса"""
+        if intervals_ms is None:
+            self.reset()
+            return
+        with self._lock:
+            for interval, z in zip(np.asarray(intervals_ms).tolist(), np.asarray(is_z).tolist()):
+                self._push(interval, z)
+            self.version += 1
+
+    def _push(self, interval, is_z):
+        index = self.count
+        recent = self._recent
+        self.total += interval
+        self.sq_total += interval * interval
+        if is_z:
+            self.z_total += interval
+
+        point = self._history.push(index, interval, is_z, self._leaving(HISTORY_WINDOW))
+        if point is not None:
+            self._line['press'].append(index + 1)
+            self._line['bpm'].append(point['bpm'])
+            self._line['ur'].append(point['ur'])
+            self._line['zx'].append(point['zx'])
+            if len(self._line['press']) > 2 * LINE_CAPACITY:
+                for values in self._line.values():
+                    del values[:LINE_CAPACITY]
+
+        for size, window in self._windows.items():
+            stats = window.push(index, interval, is_z, self._leaving(size))
+            if stats is not None:
+                self._current[size] = stats
+
+        recent.append((interval, is_z))
+        self.count += 1
+
+    def _leaving(self, size):
+        """Нажатие, которое выходит из окна size при добавлении следующего"""
+        if self.count < size:
+            return None
+        return self._recent[-size]
+
+    def snapshot(self, tail=300):
+        """Состояние для панели: итог, текущие и лучшие окна, хвост линии истории"""
+        with self._lock:
+            total = None
+            if self.count > 1:
+                bpm, ur, zx = window_stats(self.count, self.total, self.sq_total, self.z_total)
+                total = {'bpm': bpm, 'ur': ur, 'zx': zx * 100.0}
+            windows = []
+            for size, window in self._windows.items():
+                windows.append({
+                    'window_size': size,
+                    'current': self._current.get(size),
+                    'best_bpm': window.best_bpm,
+                    'best_ur': window.best_ur,
+                    'best_zx': window.best_zx,
+                })
+            return {
+                'version': self.version,
+                'count': self.count,
+                'total': total,
+                'windows': windows,
+                'line': {key: values[-tail:] for key, values in self._line.items()},
+            }
@@ -0,0 +1,135 @@
+"""Разбиение истории сессии на непрерывные серии по паузам
+
+Пауза — интервал длиннее порога: break_factor медиан интервала, но не
+короче min_break_ms. Нажатие после паузы начинает новую серию, а его строка
+истории (с длинным интервалом) ни в одну серию не входит. Для каждой серии
+считаются BPM по среднему интервалу, UR (стандартное отклонение интервалов
+* 10, как в анализаторе) и средний ZX по скользящему среднему истории. Все
+считается через np.add.reduceat за несколько проходов по массиву, без цикла
+по нажатиям.
+"""
+import numpy as np
+
+
+BREAK_FACTOR = 10.0
+MIN_BREAK_MS = 500.0
+# Серии короче этого числа нажатий не считаются игрой (случайные нажатия)
+MIN_STREAM_PRESSES = 8
+
+STREAM_DTYPE = np.dtype([
+    ('start', '<i8'), ('stop', '<i8'), ('presses', '<i8'), ('duration_ms', '<f8'),
+    ('bpm', '<f8'), ('ur', '<f8'), ('zx', '<f8'),
+])
+
+
+def break_threshold(intervals, break_factor=BREAK_FACTOR, min_break_ms=MIN_BREAK_MS):
+    """Порог паузы в мс для интервалов сессии"""
+    if len(intervals) == 0:
+        return float(min_break_ms)
+    return max(float(min_break_ms), float(np.median(intervals)) * break_factor)
+
+
+def segment_history(intervals, zx=None, break_ms=None, break_factor=BREAK_FACTOR, min_break_ms=MIN_BREAK_MS):
+    """Серии нажатий между паузами: (массив STREAM_DTYPE, порог паузы)
+
+    start/stop — индексы строк истории [start, stop). zx — колонка ZX_avg
+    (NaN в начале допустимы) или None.
+    """
+    intervals = np.asarray(intervals, dtype=np.float64)
+    if break_ms is None:
+        break_ms = break_threshold(intervals, break_factor, min_break_ms)
+    count = len(intervals)
+    if count == 0:
+        return np.empty(0, dtype=STREAM_DTYPE), break_ms
+
+    # Серия — строки истории между паузами; строка паузы ни в одну не входит
+    is_break = intervals > break_ms
+    breaks = np.flatnonzero(is_break)
+    starts = np.concatenate(([0], breaks + 1))
+    stops = np.append(breaks, count)
+    valid = stops > starts
+    starts, stops = starts[valid], stops[valid]
+    if len(starts) == 0:
+        return np.empty(0, dtype=STREAM_DTYPE), break_ms
+
+    # Суммы по сериям: паузы обнуляем, а reduceat режет по началам серий
+    # (хвост между stop и следующим start — только пауза, она обнулена)
+    clean = np.where(is_break, 0.0, intervals)
+    sums = np.add.reduceat(clean, starts)
+    sq_sums = np.add.reduceat(clean * clean, starts)
+    lengths = stops - starts
+
+    streams = np.zeros(len(starts), dtype=STREAM_DTYPE)
+    streams['start'] = starts
+    streams['stop'] = stops
+    streams['presses'] = lengths
+    streams['duration_ms'] = sums
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Среднее целочисленное, как calc_stats в src/calc.rs (и rolling.window_stats):
+        # UR серии совпадает с UR анализатора на том же окне
+        mean = np.floor_divide(np.rint(sums).astype(np.int64), lengths).astype(np.float64)
+        streams['bpm'] = np.where(mean > 0, 60000.0 / mean / 4.0, np.nan)
+        variance = (sq_sums - 2 * mean * sums + lengths * mean * mean) / (lengths - 1)
+        streams['ur'] = np.where(lengths > 1, np.sqrt(np.maximum(variance, 0.0)) * 10.0, np.nan)
+        if zx is None:
+            streams['zx'] = np.nan
+        else:
+            zx = np.asarray(zx, dtype=np.float64)
+            zx_valid = ~np.isnan(zx) & ~is_break
+            zx_sums = np.add.reduceat(np.where(zx_valid, zx, 0.0), starts)
+            zx_counts = np.add.reduceat(zx_valid.astype(np.int64), starts)
+            streams['zx'] = np.where(zx_counts > 0, zx_sums / zx_counts, np.nan)
+    return streams, break_ms
+
+
+def distorted_mask(intervals, break_ms, avg_window):
+    """Строки, скользящее среднее которых захватывает паузу
+
+    Это сама строка паузы и avg_window - 1 строк после нее.
+    """
+    count = len(intervals)
+    breaks = np.flatnonzero(np.asarray(intervals) > break_ms)
+    marks = np.zeros(count + avg_window + 1, dtype=np.int64)
+    np.add.at(marks, breaks, 1)
+    np.add.at(marks, breaks + max(1, avg_window), -1)
+    return np.cumsum(marks[:count]) > 0
+
+
+def interval_jitter(intervals, break_ms):
+    """Разброс темпа: |разность соседних интервалов| внутри серий, мс
+
+    Пары, в которые входит пауза, пропускаются.
+    """
+    intervals = np.asarray(intervals, dtype=np.float64)
+    if len(intervals) < 2:
+        return np.empty(0)
+    steady = intervals <= break_ms
+    return np.abs(np.diff(intervals))[steady[1:] & steady[:-1]]
+
+
+def segments_payload(streams, break_ms, min_presses=MIN_STREAM_PRESSES):
+    """Сводка серий для API: нажатия нумеруются с 1, как в истории"""
+    played = streams[streams['presses'] >= min_presses]
+
+    def value(v):
+        return None if v != v else round(float(v), 2)
+
+    return {
+        'break_ms': round(float(break_ms), 1),
+        'streams': [
+            {
+                'from': int(s['start']) + 1,
+                'to': int(s['stop']),
+                'presses': int(s['presses']),
+                'duration_ms': round(float(s['duration_ms']), 1),
+                'bpm': value(s['bpm']),
+                'ur': value(s['ur']),
+                'zx': value(s['zx']),
+            }
+            for s in played
+        ],
+        # Несколько длинных интервалов подряд — одна пауза
+        'pauses': max(0, len(streams) - 1),
+        'short_streams': int(len(streams) - len(played)),
+        'active_ms': round(float(streams['duration_ms'].sum()), 1),
+    }
@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+
+
+def frame_nbytes(df):
+    """Размер DataFrame в памяти (с учетом строк и категорий)"""
+    if df is None:
+        return 0
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def session_nbytes(data):
+    """Оценка занимаемой сессией памяти: история + сводка с таблицами лучших окон"""
+    size = frame_nbytes(data.get('history_data'))
+    summary = data.get('summary')
+    if summary is not None:
+        size += summary.nbytes
+    segments = data.get('segments')
+    if segments is not None:
+        size += segments[0].nbytes
+    return size
+
+
+class SessionStore:
+    """LRU-хранилище загруженных сессий с бюджетом памяти
+
+    Поддерживает интерфейс словаря, которым раньше был file_data. При
+    превышении бюджета вытесняются давно не использованные сессии; последняя
+    добавленная сессия остается в памяти, даже если одна превышает бюджет.
+    """
+
+    def __init__(self, budget_bytes=256 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self.resident_bytes = 0
+        self.evictions = 0
+
+    def get(self, session_id, default=None):
+        with self._lock:
+            data = self._entries.get(session_id)
+            if data is None:
+                return default
+            self._entries.move_to_end(session_id)
+            return data
+
+    def __setitem__(self, session_id, data):
+        size = session_nbytes(data)
+        with self._lock:
+            self._discard(session_id)
+            self._entries[session_id] = data
+            self._sizes[session_id] = size
+            self.resident_bytes += size
+            while self.resident_bytes > self.budget_bytes and len(self._entries) > 1:
+                evicted_id = next(iter(self._entries))
+                self._discard(evicted_id)
+                self.evictions += 1
+
+    def pop(self, session_id, default=None):
+        with self._lock:
+            data = self._entries.get(session_id, default)
+            self._discard(session_id)
+            return data
+
+    def __delitem__(self, session_id):
+        with self._lock:
+            if session_id not in self._entries:
+                raise KeyError(session_id)
+            self._discard(session_id)
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        """Учет занимаемой памяти"""
+        with self._lock:
+            return {
+                'sessions': len(self._entries),
+                'resident_bytes': self.resident_bytes,
+                'budget_bytes': self.budget_bytes,
+                'evictions': self.evictions,
+            }
+
+    def _discard(self, session_id):
+        if session_id in self._entries:
+            del self._entries[session_id]
+            self.resident_bytes -= self._sizes.pop(session_id)
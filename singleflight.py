@@ -0,0 +1,58 @@
+import threading
+
+
+class _Call:
+    """Одно идущее вычисление и его итог"""
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Объединение одновременных одинаковых вычислений
+
+    Если вычисление с тем же ключом уже идет, do() не запускает его второй раз,
+    а ждет и возвращает тот же результат (или поднимает то же исключение).
+    Результат не запоминается: после завершения следующий вызов считает заново,
+    поэтому версия данных должна входить в ключ. Общий результат отдается
+    нескольким потокам — менять его нельзя.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if leader:
+            try:
+                call.value = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    def stats(self):
+        with self._lock:
+            return {'executed': self.executed, 'shared': self.shared, 'in_flight': len(self._calls)}
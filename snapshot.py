@@ -0,0 +1,71 @@
+"""Неизменяемые снимки данных для обработчиков HTTP
+
+Сканер, рендер и синхронизация с пирами меняют каталог и имена из своих
+потоков. Обработчик берет monitor.snapshot один раз на запрос и дальше читает
+только его: новый снимок собирается целиком и подменяется одним
+присваиванием, поэтому блокировки читателям не нужны, а все части ответа
+относятся к одной версии. version снимка растет с каждым изменением и служит
+ETag ответов API.
+
+Версии не повторяются и между перезапусками: старшие биты — номер запуска
+из каталога (BOOT_SHIFT), младшие — счетчик изменений в этом процессе. Часы
+для этого не используются, поэтому перевод времени назад не ломает ETag и
+проверку версии на странице.
+
+Список сессий в снимок не входит (страницы читаются из каталога на ходу),
+поэтому ETag страниц дополняется номером изменения каталога, а сама страница
+собирается заново, если каталог изменился во время сборки (см.
+WebCSVMonitor.consistent_build).
+"""
+import threading
+from collections import namedtuple
+from datetime import datetime
+from types import MappingProxyType
+
+
+# names — {ID: имя}, records — {игрок или None: кортеж строк таблицы рекордов}.
+# Строки рекордов общие для всех читателей снимка — менять их нельзя
+DataSnapshot = namedtuple('DataSnapshot', 'version updated_at names records')
+
+# Младшие биты версии — счетчик изменений процесса; 2**53 (точные целые в JS)
+# вмещает 2**21 запусков по 2**32 изменений
+BOOT_SHIFT = 32
+
+
+def first_version(boot):
+    """Первая версия снимка для номера запуска"""
+    return boot << BOOT_SHIFT
+
+
+class SnapshotPublisher:
+    """Сборка и публикация снимков; вызывается писателями после каждого изменения"""
+
+    def __init__(self, catalog, names, version):
+        self._catalog = catalog
+        self._names = names
+        self._lock = threading.Lock()
+        # Игрок -> (версия каталога, рекорды): неизменившиеся рекорды
+        # переходят в следующий снимок без запроса к каталогу
+        self._records = {}
+        self.current = self._build(version)
+
+    def publish(self):
+        with self._lock:
+            self.current = self._build(self.current.version + 1)
+            return self.current
+
+    def _build(self, version):
+        records = {}
+        for player in (None, *self._catalog.players):
+            catalog_version = self._catalog.version(player)
+            cached = self._records.get(player)
+            if cached is None or cached[0] != catalog_version:
+                cached = (catalog_version, tuple(self._catalog.records(player)))
+            records[player] = cached
+        self._records = records
+        return DataSnapshot(
+            version=version,
+            updated_at=datetime.now().strftime("%H:%M:%S"),
+            names=self._names.snapshot(),
+            records=MappingProxyType({player: rows for player, (_, rows) in records.items()}),
+        )
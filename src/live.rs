@@ -0,0 +1,77 @@
+use std::io::Write;
+use std::os::unix::net::UnixStream;
+use std::sync::atomic::Ordering;
+use std::sync::mpsc::{self, Receiver, Sender};
+use std::thread;
+use std::time::{Duration, Instant};
+use log::{info, warn};
+use crate::TICKS_PER_S;
+
+// Протокол совпадает с live.py: заголовок b"BALV", версия, тики в секунду (u64 LE),
+// затем записи по 9 байт: delta_ticks (u64 LE) и флаги
+const SOCKET_PATH: &str = "live.sock";
+const MAGIC: &[u8; 4] = b"BALV";
+const VERSION: u8 = 1;
+const FLAG_Z: u8 = 0x01;
+const FLAG_RESET: u8 = 0x80;
+// После неудачного подключения следующая попытка не раньше, чем через этот интервал
+const RECONNECT_INTERVAL: Duration = Duration::from_secs(2);
+
+pub enum LiveEvent {
+    Press(u64, bool),
+    Reset,
+}
+
+/// Фоновый поток, пересылающий нажатия в live-сокет gui.py.
+/// Если монитор не запущен, события просто отбрасываются.
+pub fn spawn() -> Sender<LiveEvent> {
+    let (tx, rx) = mpsc::channel();
+    thread::spawn(move || run(rx));
+    tx
+}
+
+fn connect() -> Option<UnixStream> {
+    let mut stream = UnixStream::connect(SOCKET_PATH).ok()?;
+    let mut header = Vec::with_capacity(13);
+    header.extend_from_slice(MAGIC);
+    header.push(VERSION);
+    header.extend_from_slice(&TICKS_PER_S.load(Ordering::Relaxed).to_le_bytes());
+    stream.write_all(&header).ok()?;
+    info!("Connected to live socket {}", SOCKET_PATH);
+    Some(stream)
+}
+
+fn encode(ev: &LiveEvent, buf: &mut Vec<u8>) {
+    let (delta, flags) = match *ev {
+        LiveEvent::Press(delta, is_z) => (delta, if is_z { FLAG_Z } else { 0 }),
+        LiveEvent::Reset => (0, FLAG_RESET),
+    };
+    buf.extend_from_slice(&delta.to_le_bytes());
+    buf.push(flags);
+}
+
+fn run(rx: Receiver<LiveEvent>) {
+    let mut stream: Option<UnixStream> = None;
+    let mut last_attempt: Option<Instant> = None;
+    let mut buf = Vec::new();
+    while let Ok(ev) = rx.recv() {
+        buf.clear();
+        encode(&ev, &mut buf);
+        // Все накопившиеся события отправляем одним пакетом
+        while let Ok(ev) = rx.try_recv() {
+            encode(&ev, &mut buf);
+        }
+
+        // Без монитора не тратим системный вызов на каждый пакет
+        if stream.is_none() && last_attempt.map_or(true, |t| t.elapsed() >= RECONNECT_INTERVAL) {
+            last_attempt = Some(Instant::now());
+            stream = connect();
+        }
+        if let Some(s) = stream.as_mut() {
+            if let Err(e) = s.write_all(&buf) {
+                warn!("Live socket write failed: {}", e);
+                stream = None;
+            }
+        }
+    }
+}
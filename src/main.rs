@@ -1,9 +1,11 @@
 mod calc;
 pub mod export;
+mod live;
 use std::fs::File;
 use std::rc::Rc;
 use std::sync::atomic::{AtomicBool, AtomicU64, Ordering};
 use std::sync::{Arc, Mutex};
+use std::sync::mpsc::Sender;
 use std::thread;
 use std::time::Duration;
 use cpal::{BufferSize, Stream, StreamConfig};
@@ -23,6 +25,7 @@ use rodio::{Decoder, Source};
 use sparkles_core::{Timestamp, TimestampProvider};
 use crate::calc::spawn;
 use crate::export::export_cur_stats;
+use crate::live::LiveEvent;
 
 pub static TICKS_PER_S: AtomicU64 = AtomicU64::new(0);
 struct Shared {
@@ -63,6 +66,7 @@ struct App {
     win: Option<Rc<Window>>,
     surface: Option<Surface<Rc<Window>, Rc<Window>>>,
     shared: Arc<Mutex<Shared>>,
+    live: Sender<LiveEvent>,
     prev_tm: u64,
     ticks_per_s: u64,
 
@@ -131,6 +135,7 @@ impl App {
             win: None,
             surface: None,
             shared,
+            live: live::spawn(),
             prev_tm: 0,
             ticks_per_s: TICKS_PER_S.load(Ordering::Relaxed),
 
@@ -212,6 +217,7 @@ impl winit::application::ApplicationHandler for App {
                         // info!("Elapsed: {}ms", elapsed_s * 1000.0);
                         if elapsed_s > thr {
                             self.shared.lock().unwrap().last_presses.push_overwrite((tm - self.prev_tm, is_z));
+                            let _ = self.live.send(LiveEvent::Press(tm - self.prev_tm, is_z));
                         }
                     }
                     self.prev_tm = tm;
@@ -231,6 +237,7 @@ impl winit::application::ApplicationHandler for App {
                     export_cur_stats(&self.shared);
                     info!("Resetting press data...");
                     self.shared.lock().unwrap().last_presses.clear();
+                    let _ = self.live.send(LiveEvent::Reset);
                     self.prev_tm = 0;
                 }
             }
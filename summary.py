@@ -0,0 +1,102 @@
+"""Компактная сводка сессии: таблицы лучших окон в массивах NumPy
+
+Раньше лучшие окна хранились тремя DataFrame (срезы одного), и каждое
+обращение заново фильтровало их по 'Window Size'. SessionSummary строится
+один раз при загрузке: для каждого типа (BPM, UR, ZX) — структурированный
+массив строк, отсортированный по размеру окна, плюс производные значения.
+Дальше нужны только обращения к атрибутам и searchsorted по окнам.
+"""
+import sys
+
+import numpy as np
+
+from catalog import bpm_bucket_for
+
+
+BEST_TYPES = ('BPM', 'UR', 'ZX')
+BEST_TABLE_DTYPE = np.dtype([('window', '<i4'), ('bpm', '<f4'), ('ur', '<f4'), ('zx', '<f4')])
+
+_EMPTY_TABLE = np.empty(0, dtype=BEST_TABLE_DTYPE)
+_EMPTY_TABLE.flags.writeable = False
+
+
+def best_table(best_df, type_name):
+    """Строки одного типа из таблицы лучших окон, по возрастанию окна (только чтение)"""
+    mask = (best_df['Type'] == type_name).to_numpy()
+    if not mask.any():
+        return _EMPTY_TABLE
+    table = np.empty(int(mask.sum()), dtype=BEST_TABLE_DTYPE)
+    table['window'] = best_df['Window Size'].to_numpy()[mask]
+    table['bpm'] = best_df['BPM'].to_numpy()[mask]
+    table['ur'] = best_df['UR'].to_numpy()[mask]
+    table['zx'] = best_df['ZX'].to_numpy()[mask]
+    table.sort(order='window', kind='stable')
+    table.flags.writeable = False
+    return table
+
+
+class SessionSummary:
+    """Лучшие окна сессии и производные значения, посчитанные при загрузке"""
+
+    __slots__ = ('id', 'mtime', 'press_count', 'best_bpm', 'best_ur', 'best_zx', 'mean_bpm', 'bpm_bucket')
+
+    def __init__(self, session_id, mtime, press_count, best_bpm=_EMPTY_TABLE, best_ur=_EMPTY_TABLE,
+                 best_zx=_EMPTY_TABLE):
+        self.id = session_id
+        self.mtime = mtime
+        self.press_count = press_count
+        self.best_bpm = best_bpm
+        self.best_ur = best_ur
+        self.best_zx = best_zx
+        # Как в каталоге: среднее по лучшим BPM всех окон с точностью CSV
+        self.mean_bpm = float(best_bpm['bpm'].astype(np.float64).round(3).mean()) if len(best_bpm) else None
+        self.bpm_bucket = bpm_bucket_for(self.mean_bpm)
+
+    @classmethod
+    def from_best_df(cls, session_id, mtime, best_df, press_count):
+        """Сводка по DataFrame из ingest.read_best (None — файла лучших окон нет)"""
+        if best_df is None:
+            return cls(session_id, mtime, press_count)
+        return cls(session_id, mtime, press_count, *(best_table(best_df, t) for t in BEST_TYPES))
+
+    @property
+    def has_best(self):
+        return bool(len(self.best_bpm) or len(self.best_ur) or len(self.best_zx))
+
+    def table(self, type_name):
+        return (self.best_bpm, self.best_ur, self.best_zx)[BEST_TYPES.index(type_name)]
+
+    def ur_at(self, window):
+        """Лучший UR для окна window или None"""
+        windows = self.best_ur['window']
+        index = int(np.searchsorted(windows, window))
+        if index < len(windows) and windows[index] == window:
+            return float(self.best_ur['ur'][index])
+        return None
+
+    def ur_at_max_window(self):
+        """Лучший UR самого большого окна или None"""
+        return float(self.best_ur['ur'][-1]) if len(self.best_ur) else None
+
+    @property
+    def nbytes(self):
+        """Память сводки: объект и массивы таблиц"""
+        tables = {id(t): t for t in (self.best_bpm, self.best_ur, self.best_zx) if t is not _EMPTY_TABLE}
+        return sys.getsizeof(self) + sum(sys.getsizeof(t) for t in tables.values())
+
+    def catalog_summary(self, name=None):
+        """Сводка в формате SessionCatalog.upsert_sessions"""
+        best = []
+        for type_name, table in zip(BEST_TYPES, (self.best_bpm, self.best_ur, self.best_zx)):
+            # В CSV три знака после запятой — убираем шум float32
+            for window, bpm, ur, zx in zip(table['window'].tolist(), table['bpm'].tolist(),
+                                           table['ur'].tolist(), table['zx'].tolist()):
+                best.append((type_name, window, round(bpm, 3), round(ur, 3), round(zx, 3)))
+        return {
+            'id': self.id,
+            'mtime': self.mtime,
+            'name': name,
+            'mean_bpm': self.mean_bpm,
+            'press_count': self.press_count,
+            'best': best,
+        }
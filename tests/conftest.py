@@ -0,0 +1,46 @@
+import socket
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Модули монитора лежат в корне репозитория
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def wait_until(condition, timeout=30.0, interval=0.1):
+    """Ожидание условия; False — не дождались"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(interval)
+    return condition()
+
+
+@pytest.fixture
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def make_monitor(tmp_path, monkeypatch, free_port):
+    """Монитор в пустом рабочем каталоге (каталог, кеш и samples/ — в tmp_path)"""
+    import gui
+
+    monkeypatch.chdir(tmp_path)
+    monitors = []
+
+    def make():
+        monitor = gui.WebCSVMonitor(free_port, open_browser=False, peers_file="")
+        monitors.append(monitor)
+        return monitor
+
+    yield make
+    for monitor in monitors:
+        monitor.monitoring = False
+        monitor.live_server.stop()
+        monitor.render_scheduler.stop()
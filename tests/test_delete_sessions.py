@@ -0,0 +1,40 @@
+import time
+
+import numpy as np
+
+from archive import archive_path, month_of, open_archive, pack_csv_pair, write_archive
+from bench import write_synthetic_session
+from conftest import wait_until
+
+
+SESSION_ID = "1700000000"
+OTHER_ID = "1700003600"
+
+
+def test_delete_removes_session_from_csv_and_archive(tmp_path, make_monitor):
+    samples_dir = tmp_path / "samples"
+    samples_dir.mkdir()
+    rng = np.random.default_rng(0)
+    for session_id in (SESSION_ID, OTHER_ID):
+        write_synthetic_session(samples_dir, int(session_id), 300, rng)
+
+    # Та же сессия и в месячном архиве, и в виде CSV (например, архив восстановлен из копии)
+    archive_file = archive_path(samples_dir, month_of(SESSION_ID))
+    packed = {session_id: pack_csv_pair(samples_dir / f"best_bpm_ur_{session_id}.csv",
+                                        samples_dir / f"stats_history_{session_id}.csv")
+              for session_id in (SESSION_ID, OTHER_ID)}
+    write_archive(archive_file, packed)
+
+    monitor = make_monitor()
+    assert wait_until(lambda: monitor.catalog.count_sessions() == 2)
+    assert monitor.session_files[SESSION_ID].get('archive') is None
+
+    assert monitor.delete_sessions([SESSION_ID]) == {SESSION_ID}
+    assert not (samples_dir / f"best_bpm_ur_{SESSION_ID}.csv").exists()
+    assert not (samples_dir / f"stats_history_{SESSION_ID}.csv").exists()
+    assert set(open_archive(archive_file).entries()) == {OTHER_ID}
+
+    # Сессия не возвращается после следующих проходов сканера (раз в 2 с без изменений)
+    time.sleep(5)
+    assert monitor.catalog.list_sessions(ids=[SESSION_ID]) == []
+    assert [s['id'] for s in monitor.catalog.list_sessions()] == [OTHER_ID]
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import Counter
+
+from render_queue import PRIORITY_BACKFILL, PRIORITY_VISIBLE, RenderScheduler
+from singleflight import SingleFlight
+from conftest import wait_until
+
+
+CLIENTS = 10
+SESSIONS = 8
+
+
+def poll_until_rendered(scheduler, versions, render, clients=CLIENTS):
+    """clients потоков одновременно опрашивают, как /api/data: нет результата — ставят рендер"""
+    barrier = threading.Barrier(clients)
+
+    def client():
+        barrier.wait()
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            missing = [key for key, version in versions.items() if scheduler.result(key, version) is None]
+            if not missing:
+                return
+            for key in missing:
+                scheduler.submit(key, versions[key], PRIORITY_VISIBLE, lambda key=key: render(key, versions[key]))
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def counting_render():
+    renders = Counter()
+    lock = threading.Lock()
+
+    def render(key, version):
+        with lock:
+            renders[(key, version)] += 1
+        # Рендер заметно дольше опроса — клиенты успевают попросить ту же версию
+        time.sleep(0.01)
+        return f"{key}@{version}"
+
+    return renders, render
+
+
+def test_concurrent_clients_render_each_version_once():
+    scheduler = RenderScheduler()
+    try:
+        renders, render = counting_render()
+        versions = {str(1_700_000_000 + i * 3600): 1.0 for i in range(SESSIONS)}
+        poll_until_rendered(scheduler, versions, render)
+
+        assert set(renders) == set(versions.items())
+        assert max(renders.values()) == 1
+        assert all(scheduler.result(key, version) == f"{key}@{version}" for key, version in versions.items())
+    finally:
+        scheduler.stop()
+
+
+def test_new_version_renders_once_more():
+    scheduler = RenderScheduler()
+    try:
+        renders, render = counting_render()
+        versions = {"1700000000": 1.0, "1700003600": 1.0}
+        poll_until_rendered(scheduler, versions, render)
+        versions["1700000000"] = 2.0
+        poll_until_rendered(scheduler, versions, render)
+
+        assert renders == Counter({("1700000000", 1.0): 1, ("1700000000", 2.0): 1, ("1700003600", 1.0): 1})
+    finally:
+        scheduler.stop()
+
+
+def test_resubmit_raises_priority_without_duplicate():
+    scheduler = RenderScheduler()
+    try:
+        renders, render = counting_render()
+        gate = threading.Event()
+        # Занимаем рабочий поток, чтобы остальные задания ждали в очереди
+        scheduler.submit("busy", 1, PRIORITY_VISIBLE, gate.wait)
+        order = []
+        for key in ("a", "b"):
+            scheduler.submit(key, 1, PRIORITY_BACKFILL, lambda key=key: order.append(key) or render(key, 1))
+        scheduler.submit("b", 1, PRIORITY_VISIBLE, lambda: order.append("b") or render("b", 1))
+        gate.set()
+
+        assert wait_until(lambda: scheduler.pending() == 0 and scheduler.result("a", 1) is not None)
+        assert order == ["b", "a"]
+        assert max(renders.values()) == 1
+    finally:
+        scheduler.stop()
+
+
+def test_single_flight_shares_one_computation():
+    flights = SingleFlight()
+    barrier = threading.Barrier(CLIENTS)
+    calls = Counter()
+    results = []
+
+    def compute():
+        calls['data'] += 1
+        time.sleep(0.2)
+        return object()
+
+    def client():
+        barrier.wait()
+        results.append(flights.do(('data', 1), compute))
+
+    threads = [threading.Thread(target=client) for _ in range(CLIENTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls['data'] == 1
+    assert len({id(result) for result in results}) == 1
+    assert flights.stats() == {'executed': 1, 'shared': CLIENTS - 1, 'in_flight': 0}
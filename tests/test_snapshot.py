@@ -0,0 +1,29 @@
+import time
+from pathlib import Path
+
+from names_store import NamesStore
+from players import PlayerCatalog
+from snapshot import SnapshotPublisher, first_version
+
+
+def start_publisher():
+    catalog = PlayerCatalog({'local': Path("samples")})
+    names = NamesStore("names.json", "names.journal")
+    return catalog, SnapshotPublisher(catalog, names, first_version(catalog.next_boot()))
+
+
+def test_versions_grow_across_restarts_without_the_clock(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    catalog, publisher = start_publisher()
+    for _ in range(5):
+        publisher.publish()
+    last = publisher.current.version
+    catalog.close()
+
+    # Перезапуск с часами, переведенными на час назад
+    real_time = time.time
+    monkeypatch.setattr(time, 'time', lambda: real_time() - 3600)
+    catalog, publisher = start_publisher()
+    assert publisher.current.version > last
+    assert publisher.publish().version == publisher.current.version > last
+    catalog.close()
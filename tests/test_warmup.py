@@ -0,0 +1,11 @@
+from bench import make_samples
+
+
+def test_first_scan_waits_for_initial_indexing(tmp_path, make_monitor):
+    ids = make_samples(tmp_path / "samples", sessions=4, presses=300)
+    monitor = make_monitor()
+
+    # На свежем запуске все пары сначала ждут стабильности записи
+    assert monitor.wait_first_scan(30)
+    assert monitor.catalog.count_sessions() == len(ids)
+    assert {str(session_id) for session_id in ids} <= set(monitor.session_files)
@@ -0,0 +1,124 @@
+"""Прогрев кешей после запуска монитора по сохраненному каталогу
+
+Каталог, имена и файлы графиков переживают перезапуск, а память — нет:
+первый запрос после старта читал все картинки страницы, сжимал ответ и ждал
+рендеринга графика рекордов. Прогрев в фоне делает это заранее:
+
+1. Графики рекордов берутся из кеша на диске (ключ — хеш таблицы рекордов)
+   и сразу становятся результатами очереди для текущих версий каталога.
+2. Для самых новых сессий проверяются файлы графиков: ключ кеша — хеш сводки
+   сессии из каталога (mtime, число нажатий, имя, версия рисунка), хеш
+   содержимого в файле должен совпасть с самим содержимым (см.
+   cache_files.py), а картинка — быть целым PNG. Поврежденные файлы и файлы
+   старых ключей этих сессий удаляются.
+3. Собирается и сжимается первая страница /api/data по умолчанию — первый
+   запрос получает готовые байты, как обычный повторный опрос.
+4. После первой индексации папок недостающие графики ставятся в очередь:
+   первая страница с высшим приоритетом, остальные — фоном по порядку.
+"""
+import base64
+import binascii
+import os
+import threading
+import time
+
+from cache_files import is_plot_file, read_cache_text
+from http_compress import ENCODERS
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_END = b'IEND\xaeB`\x82'
+
+
+def plot_file_valid(path):
+    """Хеш файла кеша совпадает с содержимым, и это целая картинка PNG в base64"""
+    try:
+        image = base64.b64decode(read_cache_text(path), validate=True)
+    except (OSError, ValueError, binascii.Error):
+        return False
+    return image.startswith(PNG_SIGNATURE) and image.endswith(PNG_END)
+
+
+class CacheWarmup:
+    """Фоновый прогрев кешей монитора (один проход после запуска)"""
+
+    def __init__(self, monitor, scan_timeout=60.0):
+        self.monitor = monitor
+        self.scan_timeout = scan_timeout
+        self._stats = {'state': 'waiting', 'records_from_cache': 0, 'plots_valid': 0, 'plots_invalid': 0,
+                       'plots_stale_removed': 0, 'plots_missing': 0, 'pages_prebuilt': 0, 'seconds': None}
+
+    def start(self):
+        threading.Thread(target=self.run, name="cache-warmup", daemon=True).start()
+
+    def stats(self):
+        return dict(self._stats)
+
+    def run(self):
+        started = time.perf_counter()
+        self._stats['state'] = 'running'
+        try:
+            self.warm_records()
+            self.verify_plots()
+            # Дальше нужны пути к файлам и каталог — ждем, пока сканеры проиндексируют первую пачку
+            self.monitor.wait_first_scan(self.scan_timeout)
+            self.prebuild_pages()
+            self.monitor.schedule_backfill()
+            self._stats['state'] = 'done'
+        except Exception as e:
+            self._stats['state'] = f'error: {e}'
+            print(f"Ошибка прогрева кеша: {e}")
+        self._stats['seconds'] = round(time.perf_counter() - started, 3)
+        print(f"Прогрев кеша: {self._stats}")
+
+    def warm_records(self):
+        """Графики рекордов общего списка и каждого игрока из кеша на диске"""
+        monitor = self.monitor
+        for player in (None, *monitor.players):
+            version = monitor.catalog.version(player)
+            records_data = list(monitor.snapshot.records.get(player, ()))
+            chart = monitor.read_records_chart(records_data)
+            if chart is not None:
+                monitor.render_scheduler.put_result(monitor._records_key(player), version, chart)
+                self._stats['records_from_cache'] += 1
+            else:
+                monitor.schedule_records_chart(player)
+
+    def verify_plots(self):
+        """Проверка файлов графиков самых новых сессий; лишние и поврежденные удаляются"""
+        monitor = self.monitor
+        snapshot = monitor.snapshot
+        files = {}
+        for entry in os.scandir(monitor.cache_dir):
+            if is_plot_file(entry.name):
+                files.setdefault(entry.name.split('_', 1)[0], []).append(entry.name)
+
+        limit = min(monitor.backfill_limit, monitor.cache_max_files // 2)
+        for session in monitor.catalog.list_sessions(limit=limit):
+            session_id = str(session['id'])
+            expected = monitor._plot_cache_file(session, monitor.display_name(session, snapshot.names))
+            for name in files.get(session_id, ()):
+                if name == expected.name:
+                    continue
+                # Файл прошлого ключа (другое имя, mtime или версия рисунка) больше не прочитают
+                (monitor.cache_dir / name).unlink(missing_ok=True)
+                self._stats['plots_stale_removed'] += 1
+            if expected.name not in files.get(session_id, ()):
+                self._stats['plots_missing'] += 1
+            elif plot_file_valid(expected):
+                self._stats['plots_valid'] += 1
+            else:
+                print(f"Поврежденный файл кеша: {expected.name}")
+                expected.unlink(missing_ok=True)
+                self._stats['plots_invalid'] += 1
+                self._stats['plots_missing'] += 1
+
+    def prebuild_pages(self):
+        """Первая страница /api/data по умолчанию: JSON и сжатые варианты"""
+        monitor = self.monitor
+        snapshot = monitor.snapshot
+        _, body = monitor.generate_json_data(0, monitor.max_files, 'newest', None, None, snapshot)
+        body = body.encode()
+        for encoding in ENCODERS:
+            monitor.compression_cache.compress(body, encoding)
+        self._stats['pages_prebuilt'] += 1
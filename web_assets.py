@@ -0,0 +1,45 @@
+import hashlib
+from collections import namedtuple
+
+
+StaticAsset = namedtuple('StaticAsset', 'body content_type etag cache_control')
+
+# Ресурсы с хешем содержимого в имени не меняются — браузер кеширует их на год
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+# Страницу браузер перепроверяет по ETag при каждой загрузке (ответ 304 без тела)
+REVALIDATE_CACHE = 'no-cache'
+
+
+def content_hash(body):
+    return hashlib.sha256(body).hexdigest()[:16]
+
+
+def etag_matches(if_none_match, etag):
+    """Совпадает ли ETag с одним из значений заголовка If-None-Match"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return etag in (tag.strip().removeprefix('W/') for tag in if_none_match.split(','))
+
+
+class WebAssets:
+    """Статические файлы интерфейса в памяти: путь -> тело, тип, ETag, кеширование"""
+
+    def __init__(self):
+        self._assets = {}
+
+    def add(self, path, body, content_type, cache_control=REVALIDATE_CACHE):
+        self._assets[path] = StaticAsset(body, content_type, f'"{content_hash(body)}"', cache_control)
+        return path
+
+    def add_immutable(self, name, suffix, body, content_type):
+        """Ресурс с хешем содержимого в пути; возвращает путь для ссылки на него"""
+        path = f"/static/{name}.{content_hash(body)}{suffix}"
+        return self.add(path, body, content_type, IMMUTABLE_CACHE)
+
+    def alias(self, path, target):
+        self._assets[path] = self._assets[target]
+
+    def get(self, path):
+        return self._assets.get(path)